@@ -42,33 +42,78 @@ app.on('activate', () => {
 // -------------------------
 const PYTHON_PATH = 'python';
 const PYTHON_SCRIPT = path.resolve(__dirname, '..', '..', 'fastapi-backend', 'app', 'api', 'syllabus_processing.py');
-function runPythonScript(scriptPath, args) {
-    return new Promise((resolve, reject) => {
-        const pyProcess = spawn(PYTHON_PATH, [scriptPath, ...args]);
-        pyProcess.stdout.on('data', data => console.log('Python version:', data.toString()));
-        pyProcess.stderr.on('data', data => console.error('Python error:', data.toString()));
-        let stdout = '';
-        let stderr = '';
-        pyProcess.stdout.on('data', (data) => { stdout += data.toString(); });
-        pyProcess.stderr.on('data', (data) => { stderr += data.toString(); });
-        pyProcess.on('close', (code) => {
-            if (code === 0) {
-                try {
-                    resolve(JSON.parse(stdout));
-                }
-                catch (e) {
-                    reject(new Error('Failed to parse Python output: ' + String(e)));
-                }
+class SyllabusWorker {
+    constructor() {
+        this.child = null;
+        this.pending = new Map();
+        this.nextId = 1;
+        this.buffer = '';
+    }
+    ensureStarted() {
+        if (this.child)
+            return this.child;
+        const child = spawn(PYTHON_PATH, [PYTHON_SCRIPT, '--worker']);
+        child.stdout.setEncoding('utf8');
+        child.stdout.on('data', (data) => this.onData(data));
+        child.stderr.on('data', data => console.error('Python worker:', data.toString()));
+        child.on('close', (code) => this.onExit(child, new Error(`Python worker exited (code ${code})`)));
+        child.on('error', (err) => this.onExit(child, new Error('Failed to spawn Python process: ' + err.message)));
+        this.child = child;
+        return child;
+    }
+    analyze(pdfPath) {
+        const child = this.ensureStarted();
+        const id = this.nextId++;
+        return new Promise((resolve, reject) => {
+            this.pending.set(id, { resolve, reject });
+            child.stdin.write(JSON.stringify({ id, path: pdfPath }) + '\n');
+        });
+    }
+    stop() {
+        // EOF lets the worker finish in-flight syllabi and exit
+        this.child?.stdin.end();
+    }
+    onData(data) {
+        this.buffer += data;
+        let newline;
+        while ((newline = this.buffer.indexOf('\n')) >= 0) {
+            const line = this.buffer.slice(0, newline).trim();
+            this.buffer = this.buffer.slice(newline + 1);
+            if (!line)
+                continue;
+            let message;
+            try {
+                message = JSON.parse(line);
             }
-            else {
-                reject(new Error(`Python script failed (code ${code}):\n${stderr}`));
+            catch {
+                console.error('Unparseable Python worker output:', line);
+                continue;
             }
-        });
-        pyProcess.on('error', (err) => {
-            reject(new Error('Failed to spawn Python process: ' + err.message));
-        });
-    });
+            const request = this.pending.get(message.id);
+            if (!request)
+                continue; // e.g. the "ready" event
+            this.pending.delete(message.id);
+            if (message.ok)
+                request.resolve(message.result);
+            else
+                request.reject(new Error(message.error));
+        }
+    }
+    onExit(child, err) {
+        if (this.child !== child)
+            return;
+        // The next request starts a fresh worker
+        this.child = null;
+        this.buffer = '';
+        for (const request of this.pending.values())
+            request.reject(err);
+        this.pending.clear();
+    }
 }
+const syllabusWorker = new SyllabusWorker();
+// Start the worker with the app so the first syllabus does not wait for it
+app.on('ready', () => syllabusWorker.ensureStarted());
+app.on('will-quit', () => syllabusWorker.stop());
 // -------------------------
 // Database helper
 // -------------------------
@@ -128,7 +173,7 @@ ipcMain.handle('process-syllabus', async (event, fileBuffer) => {
     try {
         const buffer = Buffer.from(new Uint8Array(fileBuffer));
         fs.writeFileSync(tempFile, buffer);
-        const result = await runPythonScript(PYTHON_SCRIPT, [tempFile]);
+        const result = await syllabusWorker.analyze(tempFile);
         fs.unlinkSync(tempFile);
         return { status: 'success', message: '✅ Syllabus processed successfully', data: result };
     }
@@ -2,7 +2,7 @@ import { app, BrowserWindow, ipcMain, IpcMainInvokeEvent } from 'electron';
 import * as path from 'path';
 import * as fs from 'fs';
 import * as os from 'os';
-import { spawn } from 'child_process';
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
 import { fileURLToPath } from 'url';
 import sqlite3 from 'sqlite3';
 
@@ -48,37 +48,87 @@ app.on('activate', () => {
 const PYTHON_PATH = 'python';
 const PYTHON_SCRIPT = path.resolve(__dirname, '..', '..', 'fastapi-backend', 'app', 'api', 'syllabus_processing.py');
 
-function runPythonScript(scriptPath: string, args: string[]): Promise<any> {
-    return new Promise((resolve, reject) => {
-        const pyProcess = spawn(PYTHON_PATH, [scriptPath, ...args]);
-
-        pyProcess.stdout.on('data', data => console.log('Python version:', data.toString()));
-        pyProcess.stderr.on('data', data => console.error('Python error:', data.toString()));
-
-        let stdout = '';
-        let stderr = '';
-
-        pyProcess.stdout.on('data', (data: Buffer) => { stdout += data.toString(); });
-        pyProcess.stderr.on('data', (data: Buffer) => { stderr += data.toString(); });
-
-        pyProcess.on('close', (code: number) => {
-            if (code === 0) {
-                try {
-                    resolve(JSON.parse(stdout));
-                } catch (e) {
-                    reject(new Error('Failed to parse Python output: ' + String(e)));
-                }
-            } else {
-                reject(new Error(`Python script failed (code ${code}):\n${stderr}`));
-            }
-        });
+// One long-lived `syllabus_processing.py --worker` process handles every
+// syllabus: requests and results are JSON lines matched by id, so interpreter
+// start, imports and Gemini client setup are paid once, not per syllabus.
+type PendingRequest = { resolve: (value: any) => void; reject: (err: Error) => void };
+
+class SyllabusWorker {
+    private child: ChildProcessWithoutNullStreams | null = null;
+    private pending = new Map<number, PendingRequest>();
+    private nextId = 1;
+    private buffer = '';
+
+    ensureStarted(): ChildProcessWithoutNullStreams {
+        if (this.child) return this.child;
+
+        const child = spawn(PYTHON_PATH, [PYTHON_SCRIPT, '--worker']);
+        child.stdout.setEncoding('utf8');
+        child.stdout.on('data', (data: string) => this.onData(data));
+        child.stderr.on('data', data => console.error('Python worker:', data.toString()));
+        child.on('close', (code: number | null) =>
+            this.onExit(child, new Error(`Python worker exited (code ${code})`)));
+        child.on('error', (err: Error) =>
+            this.onExit(child, new Error('Failed to spawn Python process: ' + err.message)));
 
-        pyProcess.on('error', (err: Error) => {
-            reject(new Error('Failed to spawn Python process: ' + err.message));
+        this.child = child;
+        return child;
+    }
+
+    analyze(pdfPath: string): Promise<any> {
+        const child = this.ensureStarted();
+        const id = this.nextId++;
+        return new Promise((resolve, reject) => {
+            this.pending.set(id, { resolve, reject });
+            child.stdin.write(JSON.stringify({ id, path: pdfPath }) + '\n');
         });
-    });
+    }
+
+    stop() {
+        // EOF lets the worker finish in-flight syllabi and exit
+        this.child?.stdin.end();
+    }
+
+    private onData(data: string) {
+        this.buffer += data;
+        let newline: number;
+        while ((newline = this.buffer.indexOf('\n')) >= 0) {
+            const line = this.buffer.slice(0, newline).trim();
+            this.buffer = this.buffer.slice(newline + 1);
+            if (!line) continue;
+
+            let message: any;
+            try {
+                message = JSON.parse(line);
+            } catch {
+                console.error('Unparseable Python worker output:', line);
+                continue;
+            }
+
+            const request = this.pending.get(message.id);
+            if (!request) continue;  // e.g. the "ready" event
+            this.pending.delete(message.id);
+            if (message.ok) request.resolve(message.result);
+            else request.reject(new Error(message.error));
+        }
+    }
+
+    private onExit(child: ChildProcessWithoutNullStreams, err: Error) {
+        if (this.child !== child) return;
+        // The next request starts a fresh worker
+        this.child = null;
+        this.buffer = '';
+        for (const request of this.pending.values()) request.reject(err);
+        this.pending.clear();
+    }
 }
 
+const syllabusWorker = new SyllabusWorker();
+
+// Start the worker with the app so the first syllabus does not wait for it
+app.on('ready', () => syllabusWorker.ensureStarted());
+app.on('will-quit', () => syllabusWorker.stop());
+
 // -------------------------
 // Database helper
 // -------------------------
@@ -145,7 +195,7 @@ ipcMain.handle('process-syllabus', async (event: IpcMainInvokeEvent, fileBuffer:
         const buffer = Buffer.from(new Uint8Array(fileBuffer));
         fs.writeFileSync(tempFile, buffer);
 
-        const result = await runPythonScript(PYTHON_SCRIPT, [tempFile]);
+        const result = await syllabusWorker.analyze(tempFile);
 
         fs.unlinkSync(tempFile);
         return { status: 'success', message: '✅ Syllabus processed successfully', data: result };
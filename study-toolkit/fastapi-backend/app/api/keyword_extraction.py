@@ -1,13 +1,25 @@
 from fastapi import APIRouter
+from pydantic import BaseModel
 from typing import List
-from sklearn.feature_extraction.text import TfidfVectorizer
+import asyncio
+
+from ..services.keywords import get_keyword_model
 
 router = APIRouter()
 
+
+class KeywordBatchRequest(BaseModel):
+    texts: List[str]
+    top_n: int = 5
+
+
+# IDF comes from the whole question bank, not the single text being scored
 @router.post("/extract_keywords/", response_model=List[str])
 async def extract_keywords(text: str, top_n: int = 5):
-    vectorizer = TfidfVectorizer(stop_words='english')
-    X = vectorizer.fit_transform([text])
-    indices = X[0].argsort()[-top_n:][::-1]
-    keywords = [vectorizer.get_feature_names_out()[i] for i in indices]
-    return keywords
\ No newline at end of file
+    return await asyncio.to_thread(get_keyword_model().extract, text, top_n)
+
+
+@router.post("/extract_keywords/batch/", response_model=List[List[str]])
+async def extract_keywords_batch(request: KeywordBatchRequest):
+    return await asyncio.to_thread(get_keyword_model().extract_many, request.texts, request.top_n)
+
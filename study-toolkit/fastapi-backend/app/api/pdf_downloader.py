@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Query
-import requests
+import httpx
 import os
+from ..services.downloader import get_downloader, CHUNK_SIZE, MAX_PDF_BYTES, DownloadTooLargeError
 
 router = APIRouter()
 
@@ -9,16 +10,27 @@ def download_pdf_file(url: str, file_name: str) -> dict:
     Core function to download a PDF file from a URL
     This can be reused by other modules
     """
+    import requests  # only this synchronous helper needs it
+
     try:
         print(f"Downloading PDF from: {url}")
         
-        # Download the PDF file
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        
-        # Save to file
-        with open(file_name, 'wb') as f:
-            f.write(response.content)
+        # Stream the PDF to disk in chunks so memory use stays constant
+        part_name = file_name + ".part"
+        size = 0
+        try:
+            with requests.get(url, timeout=30, stream=True) as response:
+                response.raise_for_status()
+                with open(part_name, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > MAX_PDF_BYTES:
+                            raise DownloadTooLargeError(f"{url} exceeded {MAX_PDF_BYTES} bytes")
+                        f.write(chunk)
+            os.replace(part_name, file_name)
+        finally:
+            if os.path.exists(part_name):
+                os.remove(part_name)
         
         # Verify file was created
         if os.path.exists(file_name):
@@ -38,7 +50,20 @@ def download_pdf_file(url: str, file_name: str) -> dict:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
+async def download_pdf_file_async(url: str, file_name: str) -> dict:
+    """
+    Non-blocking variant of download_pdf_file backed by the shared async
+    downloader (pooled connections, streamed writes, size cap)
+    """
+    try:
+        return await get_downloader().download(url, file_name)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Download error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
 @router.post("/download-pdf/")
-def download_pdf(url: str = Query(...), file_name: str = Query(...)):
+async def download_pdf(url: str = Query(...), file_name: str = Query(...)):
     """Download a PDF file from a URL (API endpoint)"""
-    return download_pdf_file(url, file_name)
\ No newline at end of file
+    return await download_pdf_file_async(url, file_name)
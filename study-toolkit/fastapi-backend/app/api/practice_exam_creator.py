@@ -1,9 +1,8 @@
-from pathlib import Path
-import sqlite3
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Optional
-import random
+from typing import Dict, List, Optional
+from ..services import database
+from ..services.question_pools import get_question_pools
 
 router = APIRouter()
 
@@ -11,55 +10,44 @@ class PracticeExamRequest(BaseModel):
     course: str
     topics: Optional[List[str]] = []
     num_questions: Optional[int] = 20
+    # e.g. {"hard": 0.3, "easy": 0.2}; unlisted difficulties share the rest
+    difficulty_mix: Optional[Dict[str, float]] = None
+    # Give every topic (requested, or all of the course's) an equal share
+    balance_topics: Optional[bool] = False
 
 @router.post("/create-practice-exam/")
 def create_practice_exam(req: PracticeExamRequest):
     try:
-        # Correct relative path from this file
-        db_path = Path(__file__).parents[3] / "data" / "question_bank.sqlite"
-        print("Connecting to DB at:", db_path.resolve())
-
-        # Convert Path to string for sqlite3
-        conn = sqlite3.connect(str(db_path))
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-
         # Debug: Show what we're searching for
         print(f"Searching for course: '{req.course}'")
         print(f"Searching for topics: {req.topics}")
 
-        # First, check what courses exist
-        c.execute("SELECT DISTINCT course FROM questions")
-        available_courses = [row['course'] for row in c.fetchall()]
-        print(f"Available courses in DB: {available_courses}")
+        # Course names, matches, candidate pools and rows are cached in
+        # memory and dropped only when questions are written
+        pools = get_question_pools()
+        with database.connection() as conn:
+            available_courses = pools.courses(conn)
 
-        # Fetch questions with case-insensitive and partial matching
-        questions = []
-        
-        if not req.topics:
-            # Get all questions for this course (case-insensitive)
-            c.execute(
-                "SELECT * FROM questions WHERE LOWER(course) LIKE LOWER(?)",
-                (f"%{req.course}%",)
-            )
-            questions = c.fetchall()
-            print(f"Found {len(questions)} questions for course '{req.course}'")
-        else:
-            # Get questions matching course and topics
-            for topic in req.topics:
-                c.execute(
-                    """SELECT * FROM questions 
-                       WHERE LOWER(course) LIKE LOWER(?) 
-                       AND LOWER(topics) LIKE LOWER(?)""",
-                    (f"%{req.course}%", f"%{topic}%")
-                )
-                topic_questions = c.fetchall()
-                questions.extend(topic_questions)
-                print(f"Found {len(topic_questions)} questions for topic '{topic}'")
+            # Case-insensitive partial matching on course names
+            matched_courses = pools.match_courses(conn, req.course)
+            print(f"Matched courses: {matched_courses}")
 
-        conn.close()
+            # Topic/difficulty strata and quotas drawn in memory from the
+            # course's precomputed question-id pool (sampling.sample_from_pool),
+            # or in SQLite when the pool would be too big (sampling.sample_questions)
+            try:
+                selected_questions = pools.sample(
+                    conn,
+                    matched_courses,
+                    req.num_questions or 20,
+                    topics=req.topics,
+                    difficulty_mix=req.difficulty_mix,
+                    balance_topics=bool(req.balance_topics),
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
 
-        if not questions:
+        if not selected_questions:
             # Provide helpful error message
             error_msg = f"No questions found for course '{req.course}'"
             if req.topics:
@@ -67,17 +55,6 @@ def create_practice_exam(req: PracticeExamRequest):
             error_msg += f"\n\nAvailable courses: {', '.join(available_courses)}"
             raise HTTPException(status_code=404, detail=error_msg)
 
-        # Remove duplicates by question_text
-        unique_questions = list({q["question_text"]: dict(q) for q in questions}.values())
-        print(f"After deduplication: {len(unique_questions)} unique questions")
-
-        # Shuffle
-        random.shuffle(unique_questions)
-
-        # Limit number of questions
-        num_to_return = min(req.num_questions or 20, len(unique_questions))
-        selected_questions = unique_questions[:num_to_return]
-        
         print(f"Returning {len(selected_questions)} questions")
         return selected_questions
 
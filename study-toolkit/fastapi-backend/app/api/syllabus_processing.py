@@ -8,16 +8,13 @@ if sys.platform.startswith("win"):
 # -----------------------------------
 
 import json
-import PyPDF2
 import os
+from contextlib import redirect_stdout
 from pathlib import Path
 from dotenv import load_dotenv
 import asyncio
-from google import genai
-from google.genai import types
 from fastapi import APIRouter
-import sqlite3
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
@@ -25,23 +22,33 @@ router = APIRouter()
 env_path = Path(__file__).parent.parent.parent.parent / '.env.local'
 load_dotenv(env_path)
 
-# Initialize Gemini API client
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
-# Extract text from a PDF file
-def extract_text_from_pdf(pdf_path: str) -> str:
-    with open(pdf_path, "rb") as f:
-        pdf_reader = PyPDF2.PdfReader(f)
-        text = ""
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        return text.strip()
-
-# Async function to analyze syllabus using Gemini
-async def analyze_syllabus_with_gemini(text: str) -> dict:
-    prompt = f"""
+# All Gemini traffic goes through the shared scheduler
+try:
+    from ..services.chunking import chunk_pages, map_json, merge_unique, normalize_text
+    from ..services.llm_scheduler import get_scheduler
+    from ..services.pdf_text import extract_text, extract_text_limited, shutdown_executor
+    from ..services import database
+except ImportError:  # executed as a script by the Electron app
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from app.services.chunking import chunk_pages, map_json, merge_unique, normalize_text
+    from app.services.llm_scheduler import get_scheduler
+    from app.services.pdf_text import extract_text, extract_text_limited, shutdown_executor
+    from app.services import database
+
+# Only this much syllabus text is read, so stop parsing there; it is sent to
+# Gemini in chunks of about SYLLABUS_CHUNK_TOKENS analyzed concurrently
+SYLLABUS_CHAR_BUDGET = 16000
+SYLLABUS_CHUNK_TOKENS = 1000
+
+# Syllabi analyzed at once in --worker mode (Gemini calls are also limited by the scheduler)
+SYLLABUS_WORKER_CONCURRENCY = int(os.getenv("SYLLABUS_WORKER_CONCURRENCY", "4"))
+
+# Extract text from a PDF file (pass max_chars to stop parsing early)
+def extract_text_from_pdf(pdf_path: str, max_chars: Optional[int] = None) -> str:
+    return extract_text_limited(pdf_path, max_chars)
+
+def build_syllabus_prompt(text: str) -> str:
+    return f"""
 Analyze the following course syllabus and extract:
 
 1. Course name: Provide a clear, descriptive course name WITHOUT the course code.
@@ -59,83 +66,129 @@ Format your response as JSON with this exact structure:
 }}
 
 Syllabus text:
-{text[:4000]}
+{text}
 """
-    response = await client.aio.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            response_mime_type="application/json"
-        )
-    )
-
-    try:
-        analysis = json.loads(response.text)
-
-        if not analysis.get("course_name"):
-            analysis["course_name"] = "Unknown Course"
-
-        if not isinstance(analysis.get("topics"), list):
-            analysis["topics"] = []
-
-        # Fixed: Use stderr for debug output
-        print(f"[Gemini Analysis] Course: {analysis['course_name']}, Topics: {len(analysis['topics'])}", file=sys.stderr)
-
-    except Exception as e:
-        print("Raw Gemini output:", response.text, file=sys.stderr)
-        print(f"Exception occurred: {type(e).__name__} - {e}", file=sys.stderr)
-        analysis = {
-            "course_name": "Unknown Course",
-            "topics": []
-        }
 
+# Async function to analyze syllabus using Gemini
+async def analyze_syllabus_with_gemini(text: str) -> dict:
+    # Map: one call per chunk of the syllabus (a short syllabus is a single call)
+    chunks = chunk_pages([text[:SYLLABUS_CHAR_BUDGET]], SYLLABUS_CHUNK_TOKENS) or [{"text": ""}]
+    answers = await map_json([build_syllabus_prompt(chunk["text"]) for chunk in chunks])
+
+    # Reduce: the first usable course name, and every topic once
+    course_name = None
+    topic_groups = []
+    usable = [answer for answer in answers if isinstance(answer, dict)]
+    if not usable:
+        # Every chunk failed (no API key, quota, API error): fail like a single call would
+        error = next((answer for answer in answers if isinstance(answer, Exception)), None)
+        raise error or ValueError("Gemini returned no usable syllabus analysis")
+    for answer in answers:
+        if not isinstance(answer, dict):
+            # Fixed: Use stderr for debug output
+            print(f"Exception occurred: {type(answer).__name__} - {answer}", file=sys.stderr)
+            continue
+        name = answer.get("course_name")
+        if not course_name and isinstance(name, str) and name.strip() and name != "Unknown Course":
+            course_name = name.strip()
+        if isinstance(answer.get("topics"), list):
+            topic_groups.append(t.strip() for t in answer["topics"] if isinstance(t, str) and t.strip())
+
+    analysis = {
+        "course_name": course_name or "Unknown Course",
+        "topics": merge_unique(topic_groups, key=normalize_text),
+    }
+    print(f"[Gemini Analysis] Course: {analysis['course_name']}, Topics: {len(analysis['topics'])}", file=sys.stderr)
     return analysis
 
 # Insert analysis into SQLite database
 def insert_into_db(analysis: dict):
-    project_root = Path(__file__).resolve().parents[3]
-    db_path = project_root / "data" / "question_bank.sqlite"
-
-    if not db_path.exists():
-        raise FileNotFoundError(f"Database not found at: {db_path}")
-
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-
-    # Ensure courses table exists
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS courses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            course TEXT UNIQUE,
-            topics TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
     course_name = analysis.get("course_name", "Unknown Course")
     topics = analysis.get("topics", [])
     topics_str = ", ".join(topics)
 
-    c.execute("""
-        INSERT OR REPLACE INTO courses (course, topics)
-        VALUES (?, ?)
-    """, (course_name, topics_str))
-
-    conn.commit()
-    conn.close()
+    with database.transaction() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO courses (course, topics)
+            VALUES (?, ?)
+        """, (course_name, topics_str))
 
     print("[OK] Saved to database:", file=sys.stderr)
     print(f"  Course: {course_name}", file=sys.stderr)
     print(f"  Topics: {len(topics)} topics", file=sys.stderr)
 
+# Worker mode: handle one request line and write its response line
+async def handle_worker_request(request: dict, semaphore: asyncio.Semaphore, emit):
+    request_id = request.get("id")
+    async with semaphore:
+        try:
+            text = await extract_text(request["path"], max_chars=SYLLABUS_CHAR_BUDGET)
+            analysis = await analyze_syllabus_with_gemini(text)
+            await asyncio.to_thread(insert_into_db, analysis)
+            emit({"id": request_id, "ok": True, "result": analysis})
+        except Exception as e:
+            emit({"id": request_id, "ok": False, "error": f"{type(e).__name__}: {e}"})
+
+async def run_worker():
+    """
+    Long-lived mode for the desktop app: read one JSON request per line on
+    stdin, {"id": ..., "path": "<syllabus.pdf>"}, and write one JSON line per
+    result on stdout, {"id": ..., "ok": true, "result": {...}} or
+    {"id": ..., "ok": false, "error": "..."}, in completion order. Requests
+    run concurrently; EOF on stdin finishes in-flight work and exits.
+    """
+    protocol_out = sys.stdout
+
+    def emit(message: dict):
+        # Only called on the event loop thread, so lines never interleave
+        protocol_out.write(json.dumps(message) + "\n")
+        protocol_out.flush()
+
+    # Stray prints from shared services must not corrupt the protocol
+    with redirect_stdout(sys.stderr):
+        # Pay the one-time costs before announcing readiness
+        database.get_pool()
+        if os.getenv("GEMINI_API_KEY"):
+            await asyncio.to_thread(lambda: get_scheduler().client)
+        emit({"event": "ready", "pid": os.getpid()})
+
+        semaphore = asyncio.Semaphore(SYLLABUS_WORKER_CONCURRENCY)
+        tasks = set()
+        while True:
+            # A thread read works on every event loop, including the Windows selector loop
+            line = await asyncio.to_thread(sys.stdin.readline)
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict) or "path" not in request:
+                    raise ValueError('expected {"id": ..., "path": ...}')
+            except ValueError as e:
+                emit({"id": None, "ok": False, "error": f"Invalid request: {e}"})
+                continue
+
+            task = asyncio.create_task(handle_worker_request(request, semaphore, emit))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        shutdown_executor()
+
 # Main function
 async def main():
     if len(sys.argv) < 2:
-        print("Usage: python syllabus_processing.py <path_to_pdf>", file=sys.stderr)
+        print("Usage: python syllabus_processing.py <path_to_pdf> | --worker", file=sys.stderr)
         sys.exit(1)
 
+    if sys.argv[1] == "--worker":
+        await run_worker()
+        return
+
     syllabus_file = sys.argv[1]
-    text = extract_text_from_pdf(syllabus_file)
+    text = extract_text_from_pdf(syllabus_file, max_chars=SYLLABUS_CHAR_BUDGET)
     analysis = await analyze_syllabus_with_gemini(text)
 
     output = {**analysis}
@@ -145,4 +198,4 @@ async def main():
     insert_into_db(analysis)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
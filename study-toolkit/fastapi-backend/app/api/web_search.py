@@ -1,16 +1,13 @@
 from fastapi import APIRouter, HTTPException
-import requests
-import os
+import asyncio
 from dotenv import load_dotenv
 
 # Load .env.local
 load_dotenv(".env.local")
 
-router = APIRouter()
+from ..services.search import SearchError, cached_search
 
-SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
-if SERPAPI_API_KEY is None:
-    raise ValueError("SERPAPI_API_KEY not found in environment variables!")
+router = APIRouter()
 
 def build_queries(course_name: str):
     #Return the list of search queries we want to run.
@@ -19,32 +16,31 @@ def build_queries(course_name: str):
         f"{course_name} Notes"
     ]
 
+def extract_pdf_links(organic_results: list) -> list:
+    # Keep PDF links among the first 10 results
+    links = []
+    for item in organic_results[:10]:
+        link = item.get("link")
+        if link and link.lower().endswith(".pdf"):
+            links.append({
+            "title": item.get("title"),
+            "link": item.get("link"),
+            "snippet": item.get("snippet")})
+    return links
+
 @router.get("/search")
-async def web_search(course_name: str):
+async def web_search(course_name: str, refresh: bool = False):
     queries = build_queries(course_name)
-    results = {}
-
-    for query in queries:
-        params = {
-            "q": query,
-            "api_key": SERPAPI_API_KEY,
-            "engine": "google"
-        }
-        response = requests.get("https://serpapi.com/search", params=params)
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=f"Error fetching results for '{query}'")
-
-        data = response.json()
-        # Extract first 10 links
-        links = []
-        for item in data.get("organic_results", [])[:10]:
-            link = item.get("link")
-            if link and link.lower().endswith(".pdf"):
-                links.append({
-                "title": item.get("title"),
-                "link": item.get("link"),
-                "snippet": item.get("snippet")})
-        results[query] = links
-
-    return results
+
+    # All queries are issued concurrently over the shared client
+    try:
+        responses = await asyncio.gather(
+            *(cached_search(query, use_cache=not refresh) for query in queries)
+        )
+    except SearchError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    return {
+        query: extract_pdf_links(organic_results)
+        for query, organic_results in zip(queries, responses)
+    }
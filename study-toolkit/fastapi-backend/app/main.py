@@ -1,16 +1,14 @@
-from fastapi import FastAPI, UploadFile, HTTPException, File
+from fastapi import FastAPI, UploadFile, HTTPException, File, Query, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.datastructures import Headers
 from dotenv import load_dotenv
-import tempfile
-import os
-import requests
 import json
-import random
-from google import genai
-from google.genai import types
-import sqlite3
-from pathlib import Path
-from .api.syllabus_processing import insert_into_db
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager, suppress
+from typing import List
 
 load_dotenv('.env.local')
 
@@ -24,11 +22,74 @@ from .api import (
     practice_exam_creator
 )
 
-# Import helper functions for the pipeline
-from .api.syllabus_processing import extract_text_from_pdf, analyze_syllabus_with_gemini
-from .api.pdf_downloader import download_pdf_file
-
-app = FastAPI()
+# Shared services used by the pipeline and the stats endpoints
+from .services.downloader import get_downloader
+from .services.llm_cache import get_llm_cache
+from .services.llm_scheduler import get_scheduler
+from .services import pdf_text
+from .services.text_cache import get_text_cache
+from .services.keywords import get_keyword_model
+from .services import near_duplicates
+from .services.search import get_search_backend
+from .services import database
+from .services import metrics
+from .services.jobs import (
+    MAX_BATCH_SYLLABI, MAX_UPLOAD_BYTES, MULTIPART_OVERHEAD_BYTES, UploadTooLargeError, discard_upload,
+    get_job_manager, new_job_id, save_upload, upload_path_for,
+)
+from .services.question_pools import get_question_pools
+from .services.vector_index import get_vector_index
+from .services.ingest import ingest_questions, iter_question_stream, reader_for
+
+
+async def warm_up():
+    """Load heavy models and clients once the server is already answering."""
+    steps = [
+        # The keyword model's vocabulary/IDF (imports scikit-learn), caught up with new questions
+        ("keyword model", get_keyword_model().load),
+        # Near-duplicate signatures for questions added outside the API
+        ("near-duplicate index", near_duplicates.backfill),
+        # Semantic topic vectors: fitted on first start, then only new questions are embedded
+        ("vector index", get_vector_index().load),
+    ]
+    if os.getenv("GEMINI_API_KEY"):
+        # Import the Gemini SDK and create the shared client before a pipeline needs it
+        steps.append(("Gemini client", lambda: get_scheduler().client))
+
+    for name, step in steps:
+        try:
+            await asyncio.to_thread(step)
+        except Exception as e:
+            print(f"Startup warm-up of the {name} failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Opens the connection pool and applies any pending schema migrations
+    database.get_pool()
+    # App-lifetime singletons; each creates its network client on first use
+    get_scheduler()
+    get_downloader()
+    get_search_backend()
+    # Pick up pipeline jobs interrupted by a crash or restart
+    await get_job_manager().resume_incomplete()
+    warm_up_task = asyncio.create_task(warm_up())
+
+    yield
+
+    # Let in-flight warm-up threads finish before the pool closes under them
+    with suppress(Exception):
+        await warm_up_task
+    await get_job_manager().shutdown()
+    await get_downloader().aclose()
+    backend = get_search_backend()
+    if hasattr(backend, "aclose"):
+        await backend.aclose()
+    pdf_text.shutdown_executor()
+    database.close_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,6 +99,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Starlette spools a whole multipart body before the endpoint runs, so syllabus
+# uploads are sized from Content-Length before any of the body is read, or
+# (chunked uploads) counted as the body streams in
+UPLOAD_BODY_LIMITS = {
+    "/api/process-syllabus-pipeline/": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+    "/api/process-syllabus-pipeline/batch": MAX_BATCH_SYLLABI * (MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES),
+}
+
+class LimitUploadSize:
+    """ASGI middleware answering 413 once an upload passes its UPLOAD_BODY_LIMITS entry."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        limit = None
+        if scope["type"] == "http" and scope["method"] == "POST":
+            limit = UPLOAD_BODY_LIMITS.get(scope["path"])
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        length = Headers(scope=scope).get("content-length")
+        if length is not None:
+            if not length.isdigit() or int(length) > limit:
+                response = JSONResponse(status_code=413, content={"detail": f"Upload of {length} bytes (limit {limit})"})
+                return await response(scope, receive, send)
+            return await self.app(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside form parsing, before the endpoint runs
+                    raise HTTPException(status_code=413, detail=f"Upload exceeded {limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(LimitUploadSize)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    # Labelled by route template (not raw path) to keep the series count bounded
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        )
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Study Toolkit API"}
@@ -51,218 +174,208 @@ app.include_router(flashcard_generator.router)
 app.include_router(practice_exam_creator.router)
 
 
-# --- HELPER: Insert questions into SQLite database ---
-def insert_questions_into_db(questions: list):
-    project_root = Path(__file__).resolve().parents[2]
-    db_path = project_root / "data" / "question_bank.sqlite"
-
-    if not db_path.exists():
-        raise FileNotFoundError(f"Database not found at {db_path}")
-
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-
-    # Ensure questions table exists
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS questions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            question_text TEXT NOT NULL,
-            course TEXT,
-            topics TEXT,
-            difficulty TEXT,
-            source_pdf TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(question_text, course)
+@app.get("/api/llm-cache/stats")
+def llm_cache_stats():
+    """Hit/miss counters and size of the persistent Gemini response cache"""
+    return get_llm_cache().stats()
+
+
+@app.get("/api/pdf-text-cache/stats")
+def pdf_text_cache_stats():
+    """Size, compression and hit/miss counters of the extracted-text cache"""
+    return get_text_cache().stats()
+
+
+@app.post("/api/questions/import")
+async def import_questions(
+    background_tasks: BackgroundTasks,
+    dump: UploadFile = File(...),
+    course: str = None,
+    near_duplicate_policy: str = Query(near_duplicates.NEAR_DUPLICATE_POLICY, alias="near_duplicates")
+):
+    """Bulk-load a JSONL, CSV or JSON question dump into the question bank"""
+    try:
+        reader_for(dump.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        counts = await asyncio.to_thread(
+            ingest_questions,
+            iter_question_stream(dump.file, dump.filename),
+            course=course,
+            near_duplicates=near_duplicate_policy
         )
-    """)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid question dump: {str(e)}")
+
+    # Embed the new questions (fitting or refitting the index if the bank outgrew it)
+    # after responding, rather than a few per exam request
+    background_tasks.add_task(get_vector_index().load)
+    return {"success": True, **counts}
+
+
+@app.get("/api/question-pools/stats")
+def question_pool_stats():
+    """Pools, cached rows and hit/miss counters of the practice-exam question cache"""
+    return get_question_pools().stats()
+
+
+@app.get("/api/vector-index/stats")
+def vector_index_stats():
+    """Vector count, dimensions and disk size of the semantic topic index"""
+    return get_vector_index().stats()
+
 
-    for q in questions:
-        question_text = q.get("question") or ""
-        course = q.get("course") or ""
-        topics = q.get("topic") or ""
-        difficulty = q.get("difficulty") or ""
-        source_pdf = q.get("source_pdf") or ""
+@app.get("/api/keyword-model/stats")
+def keyword_model_stats():
+    """Document count and vocabulary size of the corpus-level keyword model"""
+    return get_keyword_model().stats()
 
-        c.execute("""
-            INSERT OR IGNORE INTO questions
-            (question_text, course, topics, difficulty, source_pdf)
-            VALUES (?, ?, ?, ?, ?)
-        """, (question_text, course, topics, difficulty, source_pdf))
 
-    conn.commit()
-    conn.close()
-    print(f"✓ {len(questions)} questions inserted into database")
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Request, pipeline-stage, LLM and database timings in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 
 # NEW: Complete Pipeline Endpoint
+# The pipeline runs as a background job; this returns the job id immediately.
+# A syllabus seen before reuses its stored analysis and skips exam sources
+# already mined for its course, unless force_refresh is set.
 @app.post("/api/process-syllabus-pipeline/")
-async def process_syllabus_pipeline(syllabus: UploadFile = File(...)):
-    results = {
-        "course_info": {},
-        "search_results": {},
-        "downloaded_pdfs": [],
-        "practice_exam": {}
-    }
+async def process_syllabus_pipeline(syllabus: UploadFile = File(...), force_refresh: bool = False):
+    job_id = new_job_id()
+    syllabus_path = upload_path_for(job_id)
+    try:
+        # Streamed to the job's upload file in chunks, hashed on the way
+        with metrics.span("upload", job_id=job_id, filename=syllabus.filename):
+            upload = await save_upload(syllabus, syllabus_path)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload error: {str(e)}")
 
     try:
-        # STEP 1: Process the uploaded syllabus
-        print("Step 1: Processing syllabus...")
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            content = await syllabus.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
-
-        syllabus_text = extract_text_from_pdf(temp_path)
-        analysis = await analyze_syllabus_with_gemini(syllabus_text)
-
-        results["course_info"] = analysis
-        
-        # IMPORTANT: Use the course_name from Gemini's analysis
-        # This is what will be stored in the database
-        course_name = analysis.get("course_name", "Unknown Course")
-        topics = analysis.get("topics", [])
-
-        insert_into_db(analysis)
-
-        print(f"✓ Course identified: {course_name}")
-        print(f"✓ Topics found: {len(topics)}")
-
-        os.unlink(temp_path)
-
-        # STEP 2: Search for past exam PDFs
-        print("\nStep 2: Searching for past exam PDFs...")
-        from .api.web_search import web_search as perform_web_search
-        search_results = await perform_web_search(course_name)
-        results["search_results"] = search_results
-        print(f"✓ Search completed: {sum(len(v) for v in search_results.values())} PDFs found")
-
-        # STEP 3: Download the PDFs
-        print("\nStep 3: Downloading PDFs...")
-        os.makedirs("downloaded_exams", exist_ok=True)
-        downloaded_files = []
-        download_count = 0
-        max_downloads = 10
-
-        for query, links in search_results.items():
-            for item in links[:max_downloads]:
-                if download_count >= max_downloads:
-                    break
-                pdf_url = item.get("link")
-                if pdf_url:
-                    try:
-                        safe_name = f"exam_{download_count + 1}.pdf"
-                        file_path = os.path.join("downloaded_exams", safe_name)
-                        download_result = download_pdf_file(pdf_url, file_path)
-                        downloaded_files.append({
-                            "filename": safe_name,
-                            "path": file_path,
-                            "source_url": pdf_url,
-                            "title": item.get("title"),
-                            "size_bytes": download_result.get("size_bytes", 0)
-                        })
-                        download_count += 1
-                        print(f"✓ Downloaded: {safe_name}")
-                    except Exception as e:
-                        print(f"✗ Failed to download {pdf_url}: {str(e)}")
-                        continue
-            if download_count >= max_downloads:
-                break
-
-        results["downloaded_pdfs"] = downloaded_files
-        print(f"\n✓ Total PDFs downloaded: {len(downloaded_files)}")
-
-        # STEP 4: Create practice exam from downloaded PDFs
-        print("\nStep 4: Storing Questions from PDFs into Database...")
-
-        all_questions = []
-
-        if downloaded_files:
-            client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
-            for file_info in downloaded_files:
-                try:
-                    pdf_text = extract_text_from_pdf(file_info["path"])
-                    
-                    # IMPORTANT: Make sure Gemini uses the exact course_name from analysis
-                    prompt = f"""
-Analyze this past exam content for the course "{course_name}" covering topics: {', '.join(topics)}.
-
-Extract practice questions that would help students prepare for this course.
-
-IMPORTANT: You must use EXACTLY this course name in your response: "{course_name}"
-
-Format your response as JSON with this structure:
-{{
-    "questions": [
-        {{
-          "question": "The question text",
-          "course": "{course_name}",
-          "difficulty": "easy" or "medium" or "hard",
-          "topic": "relevant topic from the list"
-        }}
-    ]
-}}
-
-Exam content (first 3000 characters):
-{pdf_text[:3000]}
-"""
-                    response = await client.aio.models.generate_content(
-                        model="gemini-2.0-flash",
-                        contents=prompt,
-                        config=types.GenerateContentConfig(
-                            response_mime_type="application/json"
-                        )
-                    )
-
-                    result = json.loads(response.text)
-                    questions = result.get("questions", [])
-
-                    # DOUBLE CHECK: Ensure every question has the correct course name
-                    for q in questions:
-                        q["course"] = course_name  # Force the correct course name
-                        q["source_pdf"] = file_info["source_url"]
-
-                    all_questions.extend(questions)
-                    print(f"✓ Extracted {len(questions)} questions from {file_info['filename']}")
-                    
-                except Exception as e:
-                    print(f"✗ Error processing {file_info['filename']}: {str(e)}")
-                    continue
-
-            random.shuffle(all_questions)
-
-            results["stored_questions"] = {
-                "course_name": course_name,
-                "topics": topics,
-                "total_questions": len(all_questions),
-                "questions": all_questions[:20],
-                "sources": [f["source_url"] for f in downloaded_files]
-            }
-
-            # --- SAVE QUESTIONS TO DATABASE ---
-            if all_questions:
-                insert_questions_into_db(all_questions)
-                print(f"✓ {len(all_questions)} questions stored to database under course: '{course_name}'")
-            else:
-                print("⚠ No questions extracted from PDFs")
-                
-        else:
-            results["stored_questions"] = {
-                "message": "No PDFs downloaded, cannot find questions"
-            }
-
-        return {
-            "success": True,
-            "message": "Pipeline completed successfully",
-            "course_name": course_name,  # Return this so frontend knows the exact course name
-            "results": results
-        }
+        await get_job_manager().submit(
+            job_id, syllabus_path, syllabus.filename, force_refresh, upload["sha256"]
+        )
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        discard_upload(syllabus_path)
+        raise HTTPException(status_code=500, detail=f"Pipeline error: {str(e)}")
 
+    return {
+        "success": True,
+        "message": "Pipeline job started",
+        "job_id": job_id,
+        "status_url": f"/api/jobs/{job_id}",
+        "events_url": f"/api/jobs/{job_id}/events"
+    }
+
+
+# Batch pipeline: one job per distinct syllabus, all run concurrently through
+# the shared job, Gemini, download and PDF parsing pools. Results stream
+# back as NDJSON, one line per job as it finishes.
+@app.post("/api/process-syllabus-pipeline/batch")
+async def process_syllabus_pipeline_batch(syllabi: List[UploadFile] = File(...), force_refresh: bool = False):
+    if len(syllabi) > MAX_BATCH_SYLLABI:
+        raise HTTPException(
+            status_code=400, detail=f"{len(syllabi)} syllabi sent (limit {MAX_BATCH_SYLLABI} per batch)"
+        )
+
+    # Save every upload before starting anything, so a rejected file fails the whole batch
+    saved = []
+    try:
+        for syllabus in syllabi:
+            job_id = new_job_id()
+            syllabus_path = upload_path_for(job_id)
+            with metrics.span("upload", job_id=job_id, filename=syllabus.filename):
+                upload = await save_upload(syllabus, syllabus_path)
+            saved.append((job_id, syllabus_path, syllabus.filename, upload["sha256"]))
+    except Exception as e:
+        for _, syllabus_path, _, _ in saved:
+            discard_upload(syllabus_path)
+        if isinstance(e, UploadTooLargeError):
+            raise HTTPException(status_code=413, detail=str(e))
+        raise HTTPException(status_code=500, detail=f"Upload error: {str(e)}")
+
+    # Identical files share one job
+    manager = get_job_manager()
+    jobs = {}
+    by_hash = {}
+    try:
+        for job_id, syllabus_path, filename, sha256 in saved:
+            if sha256 in by_hash:
+                discard_upload(syllabus_path)
+                jobs[by_hash[sha256]].append(filename)
+                continue
+            await manager.submit(job_id, syllabus_path, filename, force_refresh, sha256)
+            by_hash[sha256] = job_id
+            jobs[job_id] = [filename]
     except Exception as e:
         import traceback
         traceback.print_exc()
+        for job_id, syllabus_path, _, _ in saved:
+            if job_id not in jobs:
+                discard_upload(syllabus_path)
         raise HTTPException(status_code=500, detail=f"Pipeline error: {str(e)}")
 
+    async def result_stream():
+        started = time.perf_counter()
+        yield json.dumps({
+            "event": "batch_started",
+            "jobs": [{"job_id": job_id, "filenames": filenames} for job_id, filenames in jobs.items()],
+        }) + "\n"
+        statuses = []
+        async for job in manager.as_completed(list(jobs)):
+            statuses.append(job["status"])
+            yield json.dumps({
+                "event": "job_failed" if job["status"] == "failed" else "job_completed",
+                "filenames": jobs[job["job_id"]],
+                "course_name": (job["result"] or {}).get("course_name"),
+                **job,
+            }) + "\n"
+        yield json.dumps({
+            "event": "batch_completed",
+            "completed": statuses.count("completed"),
+            "failed": statuses.count("failed"),
+            "seconds": round(time.perf_counter() - started, 3),
+        }) + "\n"
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+
+@app.get("/api/jobs/{job_id}")
+def get_pipeline_job(job_id: str):
+    """Status, completed stages and (once finished) result of a pipeline job"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_pipeline_job(job_id: str):
+    """Server-sent events with the progress of a pipeline job"""
+    manager = get_job_manager()
+    if await asyncio.to_thread(manager.get, job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+
+    async def event_stream():
+        async for event in manager.events(job_id):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
 
 if __name__ == "__main__":
     import uvicorn
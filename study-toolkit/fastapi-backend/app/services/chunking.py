@@ -0,0 +1,186 @@
+import asyncio
+import json
+import os
+import re
+from typing import Callable, Iterable, List
+
+from . import metrics
+from .llm_scheduler import get_scheduler
+
+# Rough size of a Gemini token in English text; used for every estimate here
+CHARS_PER_TOKEN = 4
+
+# Ceiling on estimated Gemini tokens (prompts plus answers) one pipeline job may spend
+JOB_TOKEN_BUDGET = int(os.getenv("JOB_TOKEN_BUDGET", "300000"))
+
+# Lines that usually open a new question: "Q3", "Question 3", "Problem 3", "3.", "3)", "(b)"
+QUESTION_START = re.compile(
+    r"^[ \t]*(?:(?:Q|Question|Problem)\s*\d+|\d{1,3}\s*[.)]|\([a-z]\))",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+CHUNKS_SENT = metrics.counter(
+    "learnio_llm_chunks_total",
+    "Document chunks and question batches sent to Gemini or skipped by the job token budget.",
+    ("outcome",),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class TokenBudget:
+    """
+    Estimated-token allowance shared by the Gemini calls of one job. Calls
+    reserve their prompt plus an allowance for the answer before they are
+    sent; a call that would overrun the limit is skipped instead.
+    """
+
+    def __init__(self, limit: int = JOB_TOKEN_BUDGET, used: int = 0):
+        self.limit = limit
+        self.used = used
+        self.skipped = 0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.limit - self.used)
+
+    def reserve(self, tokens: int) -> bool:
+        if tokens > self.remaining:
+            self.skipped += 1
+            return False
+        self.used += tokens
+        return True
+
+
+def _split_at(text: str, positions: Iterable[int]) -> List[str]:
+    bounds = sorted({0, *positions, len(text)})
+    return [text[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+# Finer and finer places to cut a page that does not fit in one chunk
+_SPLITTERS = (
+    lambda text: _split_at(text, (m.start() for m in QUESTION_START.finditer(text))),
+    lambda text: _split_at(text, (m.end() for m in re.finditer(r"\n\s*\n", text))),
+    lambda text: _split_at(text, (m.end() for m in re.finditer(r"\n", text))),
+    lambda text: _split_at(text, (m.end() for m in re.finditer(r"[.?!]\s+", text))),
+    lambda text: _split_at(text, (m.end() for m in re.finditer(r"\s+", text))),
+)
+
+
+def split_units(text: str, max_chars: int) -> List[str]:
+    """
+    Cut text into pieces of at most max_chars, preferring question starts,
+    then paragraph, line, sentence and word breaks, and only then hard cuts.
+    The pieces concatenate back to the original text.
+    """
+    if len(text) <= max_chars:
+        return [text]
+    for splitter in _SPLITTERS:
+        parts = [part for part in splitter(text) if part.strip()]
+        if len(parts) > 1:
+            return [unit for part in parts for unit in split_units(part, max_chars)]
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def chunk_pages(pages: List[str], max_tokens: int) -> List[dict]:
+    """
+    Pack page texts into chunks of at most max_tokens estimated tokens.
+    Chunks break between pages where they can; a page too large for one
+    chunk is split with split_units. Each chunk is {"text", "first_page",
+    "last_page"} with 1-based page numbers.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    units = []
+    size = 0
+
+    def flush():
+        if units:
+            # Pieces of one page join back seamlessly; pages are separated by a newline
+            text = "".join(
+                ("\n" if i and units[i - 1][0] != page_number else "") + unit
+                for i, (page_number, unit) in enumerate(units)
+            )
+            chunks.append({"text": text.strip(), "first_page": units[0][0], "last_page": units[-1][0]})
+
+    for page_number, page in enumerate(pages, 1):
+        for unit in split_units(page.strip(), max_chars):
+            if units and size + len(unit) + 1 > max_chars:
+                flush()
+                units, size = [], 0
+            units.append((page_number, unit))
+            size += len(unit) + 1
+    flush()
+    return [chunk for chunk in chunks if chunk["text"]]
+
+
+def pack_by_tokens(items: List[dict], max_tokens: int, text_key: str = "text") -> List[List[dict]]:
+    """Group items, in order, into batches whose texts total at most max_tokens (estimated)."""
+    batches = []
+    batch = []
+    size = 0
+    for item in items:
+        tokens = estimate_tokens(item[text_key]) + 1
+        if batch and size + tokens > max_tokens:
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(item)
+        size += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def admit_round_robin(requests_per_document: List[List[dict]], budget: TokenBudget) -> List[List[dict]]:
+    """
+    Keep the requests ({"prompt", "answer_tokens", ...}) the budget allows,
+    admitting the first request of every document before the second of any,
+    so a tight budget trims the tail of long documents rather than dropping
+    whole documents.
+    """
+    admitted = [[] for _ in requests_per_document]
+    longest = max((len(requests) for requests in requests_per_document), default=0)
+    for position in range(longest):
+        for document, requests in enumerate(requests_per_document):
+            if position >= len(requests):
+                continue
+            request = requests[position]
+            if budget.reserve(estimate_tokens(request["prompt"]) + request["answer_tokens"]):
+                admitted[document].append(request)
+                CHUNKS_SENT.inc(outcome="sent")
+            else:
+                CHUNKS_SENT.inc(outcome="over_budget")
+    return admitted
+
+
+async def map_json(prompts: List[str]) -> list:
+    """
+    Map step: send every prompt concurrently (the scheduler bounds what is
+    actually in flight) and parse each answer as JSON. Returns one entry per
+    prompt, in order: the parsed object, or the exception that call raised.
+    """
+    async def one(prompt: str):
+        return json.loads(await get_scheduler().generate(prompt))
+
+    return await asyncio.gather(*(one(prompt) for prompt in prompts), return_exceptions=True)
+
+
+def merge_unique(groups: Iterable[Iterable], key: Callable) -> list:
+    """Reduce step: concatenate groups in order, keeping the first item per key."""
+    seen = set()
+    merged = []
+    for group in groups:
+        for item in group:
+            k = key(item)
+            if k in seen:
+                continue
+            seen.add(k)
+            merged.append(item)
+    return merged
+
+
+def normalize_text(text) -> str:
+    """Case-, punctuation- and whitespace-insensitive form used as a dedupe key."""
+    return " ".join(re.sub(r"[^\w\s]", " ", str(text or "").lower()).split())
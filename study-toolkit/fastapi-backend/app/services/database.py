@@ -0,0 +1,470 @@
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import metrics
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parents[3] / "data" / "question_bank.sqlite"
+DB_PATH = Path(os.getenv("QUESTION_BANK_DB", str(DEFAULT_DB_PATH)))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -20000",      # ~20 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",    # 256 MB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Append new entries; never edit one that has already shipped.
+MIGRATIONS = [
+    # 1: tables that used to be created ad hoc by each module
+    """
+    CREATE TABLE IF NOT EXISTS questions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        question_text TEXT NOT NULL,
+        course TEXT,
+        topics TEXT,
+        difficulty TEXT,
+        source_pdf TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(question_text, course)
+    );
+    CREATE TABLE IF NOT EXISTS courses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        course TEXT UNIQUE,
+        topics TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS flashcards (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        front TEXT NOT NULL,
+        back TEXT NOT NULL,
+        course TEXT,
+        topic TEXT
+    );
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        key TEXT PRIMARY KEY,
+        model TEXT,
+        response TEXT NOT NULL,
+        size_bytes INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_accessed REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed ON llm_cache(last_accessed);
+    CREATE TABLE IF NOT EXISTS pdf_text_documents (
+        sha256 TEXT PRIMARY KEY,
+        page_count INTEGER NOT NULL DEFAULT 0,
+        complete INTEGER NOT NULL DEFAULT 0,
+        raw_bytes INTEGER NOT NULL DEFAULT 0,
+        compressed_bytes INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        last_accessed REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS pdf_text_pages (
+        sha256 TEXT NOT NULL,
+        page_no INTEGER NOT NULL,
+        text BLOB NOT NULL,
+        PRIMARY KEY (sha256, page_no)
+    );
+    CREATE TABLE IF NOT EXISTS search_cache (
+        backend TEXT NOT NULL,
+        query TEXT NOT NULL,
+        results TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (backend, query)
+    );
+    """,
+    # 2: full-text index over questions plus normalized course/topic indexes,
+    #    all kept in sync with the questions table by triggers
+    """
+    CREATE INDEX IF NOT EXISTS idx_questions_course ON questions(course);
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+        question_text, course, topics,
+        content='questions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+
+    CREATE TABLE IF NOT EXISTS course_index (
+        course TEXT PRIMARY KEY,
+        question_count INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS topic_index (
+        course TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        question_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (course, topic)
+    );
+
+    CREATE TABLE IF NOT EXISTS question_topics (
+        course TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        question_id INTEGER NOT NULL,
+        PRIMARY KEY (course, topic, question_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_question_topics_question ON question_topics(question_id);
+
+    -- `topics` is a comma-separated string; json_quote + replace turns it into
+    -- a JSON array so json_each can split it inside a trigger.
+    CREATE TRIGGER IF NOT EXISTS questions_index_ai AFTER INSERT ON questions BEGIN
+        INSERT INTO questions_fts(rowid, question_text, course, topics)
+        VALUES (new.id, new.question_text, new.course, new.topics);
+
+        INSERT OR IGNORE INTO question_topics(course, topic, question_id)
+        SELECT COALESCE(new.course, ''), trim(value), new.id
+        FROM json_each('[' || replace(json_quote(COALESCE(new.topics, '')), ',', '","') || ']')
+        WHERE trim(value) <> '';
+
+        INSERT INTO topic_index(course, topic, question_count)
+        SELECT course, topic, 1 FROM question_topics WHERE question_id = new.id
+        ON CONFLICT(course, topic) DO UPDATE SET question_count = question_count + 1;
+
+        INSERT INTO course_index(course, question_count)
+        VALUES (COALESCE(new.course, ''), 1)
+        ON CONFLICT(course) DO UPDATE SET question_count = question_count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS questions_index_ad AFTER DELETE ON questions BEGIN
+        INSERT INTO questions_fts(questions_fts, rowid, question_text, course, topics)
+        VALUES ('delete', old.id, old.question_text, old.course, old.topics);
+
+        UPDATE topic_index SET question_count = question_count - 1
+        WHERE (course, topic) IN (
+            SELECT course, topic FROM question_topics WHERE question_id = old.id
+        );
+        DELETE FROM topic_index WHERE question_count <= 0;
+        DELETE FROM question_topics WHERE question_id = old.id;
+
+        UPDATE course_index SET question_count = question_count - 1
+        WHERE course = COALESCE(old.course, '');
+        DELETE FROM course_index WHERE course = COALESCE(old.course, '') AND question_count <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS questions_index_au
+    AFTER UPDATE OF question_text, course, topics ON questions BEGIN
+        INSERT INTO questions_fts(questions_fts, rowid, question_text, course, topics)
+        VALUES ('delete', old.id, old.question_text, old.course, old.topics);
+        INSERT INTO questions_fts(rowid, question_text, course, topics)
+        VALUES (new.id, new.question_text, new.course, new.topics);
+
+        UPDATE topic_index SET question_count = question_count - 1
+        WHERE (course, topic) IN (
+            SELECT course, topic FROM question_topics WHERE question_id = old.id
+        );
+        DELETE FROM topic_index WHERE question_count <= 0;
+        DELETE FROM question_topics WHERE question_id = old.id;
+
+        UPDATE course_index SET question_count = question_count - 1
+        WHERE course = COALESCE(old.course, '');
+        DELETE FROM course_index WHERE course = COALESCE(old.course, '') AND question_count <= 0;
+
+        INSERT OR IGNORE INTO question_topics(course, topic, question_id)
+        SELECT COALESCE(new.course, ''), trim(value), new.id
+        FROM json_each('[' || replace(json_quote(COALESCE(new.topics, '')), ',', '","') || ']')
+        WHERE trim(value) <> '';
+
+        INSERT INTO topic_index(course, topic, question_count)
+        SELECT course, topic, 1 FROM question_topics WHERE question_id = new.id
+        ON CONFLICT(course, topic) DO UPDATE SET question_count = question_count + 1;
+
+        INSERT INTO course_index(course, question_count)
+        VALUES (COALESCE(new.course, ''), 1)
+        ON CONFLICT(course) DO UPDATE SET question_count = question_count + 1;
+    END;
+
+    -- Backfill from the existing bank
+    INSERT INTO questions_fts(questions_fts) VALUES ('rebuild');
+
+    INSERT OR IGNORE INTO question_topics(course, topic, question_id)
+    SELECT COALESCE(q.course, ''), trim(t.value), q.id
+    FROM questions q,
+         json_each('[' || replace(json_quote(COALESCE(q.topics, '')), ',', '","') || ']') t
+    WHERE trim(t.value) <> '';
+
+    INSERT OR REPLACE INTO topic_index(course, topic, question_count)
+    SELECT course, topic, COUNT(*) FROM question_topics GROUP BY course, topic;
+
+    INSERT OR REPLACE INTO course_index(course, question_count)
+    SELECT COALESCE(course, ''), COUNT(*) FROM questions GROUP BY COALESCE(course, '');
+    """,
+    # 3: background pipeline jobs, persisted so they can resume after a crash
+    """
+    CREATE TABLE IF NOT EXISTS pipeline_jobs (
+        id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        stage TEXT,
+        filename TEXT,
+        state TEXT NOT NULL,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_pipeline_jobs_status ON pipeline_jobs(status);
+    """,
+    # 4: URL -> content hash index for the content-addressed exam store
+    """
+    CREATE TABLE IF NOT EXISTS exam_sources (
+        url TEXT PRIMARY KEY,
+        sha256 TEXT NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        size_bytes INTEGER,
+        fetched_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_exam_sources_sha256 ON exam_sources(sha256);
+    """,
+    # 5: corpus-level keyword model (document frequency per term). Inserts are
+    #    picked up by question id; deletes and edits are logged by triggers.
+    """
+    CREATE TABLE IF NOT EXISTS keyword_terms (
+        term TEXT PRIMARY KEY,
+        df INTEGER NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS keyword_model_state (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS keyword_model_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        question_id INTEGER NOT NULL,
+        question_text TEXT NOT NULL,
+        delta INTEGER NOT NULL
+    );
+
+    CREATE TRIGGER IF NOT EXISTS keyword_model_ad AFTER DELETE ON questions BEGIN
+        INSERT INTO keyword_model_changes(question_id, question_text, delta)
+        VALUES (old.id, old.question_text, -1);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS keyword_model_au AFTER UPDATE OF question_text ON questions BEGIN
+        INSERT INTO keyword_model_changes(question_id, question_text, delta)
+        VALUES (old.id, old.question_text, -1), (new.id, new.question_text, 1);
+    END;
+    """,
+    # 6: MinHash signatures and LSH buckets for near-duplicate detection.
+    #    Signatures are computed in Python; triggers only drop stale ones.
+    """
+    CREATE TABLE IF NOT EXISTS question_minhash (
+        question_id INTEGER PRIMARY KEY,
+        signature BLOB NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS question_lsh (
+        bucket INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        PRIMARY KEY (bucket, question_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_question_lsh_question ON question_lsh(question_id);
+
+    CREATE TABLE IF NOT EXISTS question_near_duplicates (
+        question_id INTEGER PRIMARY KEY,
+        duplicate_of INTEGER NOT NULL,
+        similarity REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_question_near_duplicates_of ON question_near_duplicates(duplicate_of);
+
+    CREATE TRIGGER IF NOT EXISTS near_duplicate_index_ad AFTER DELETE ON questions BEGIN
+        DELETE FROM question_minhash WHERE question_id = old.id;
+        DELETE FROM question_lsh WHERE question_id = old.id;
+        DELETE FROM question_near_duplicates WHERE question_id = old.id OR duplicate_of = old.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS near_duplicate_index_au
+    AFTER UPDATE OF question_text, course ON questions BEGIN
+        DELETE FROM question_minhash WHERE question_id = old.id;
+        DELETE FROM question_lsh WHERE question_id = old.id;
+    END;
+    """,
+    # 7: fingerprints for incremental pipeline runs: the analysis of each
+    #    syllabus PDF, and which exam sources were already mined per course
+    #    (backfilled from questions.source_pdf)
+    """
+    CREATE TABLE IF NOT EXISTS syllabus_analyses (
+        sha256 TEXT PRIMARY KEY,
+        course TEXT NOT NULL,
+        analysis TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS course_sources (
+        course TEXT NOT NULL,
+        source_url TEXT NOT NULL,
+        sha256 TEXT,
+        question_count INTEGER NOT NULL DEFAULT 0,
+        ingested_at REAL NOT NULL,
+        PRIMARY KEY (course, source_url)
+    );
+    CREATE INDEX IF NOT EXISTS idx_course_sources_sha256 ON course_sources(course, sha256);
+
+    INSERT OR IGNORE INTO course_sources(course, source_url, sha256, question_count, ingested_at)
+    SELECT COALESCE(q.course, ''), q.source_pdf,
+           (SELECT s.sha256 FROM exam_sources s WHERE s.url = q.source_pdf),
+           COUNT(*), CAST(strftime('%s', 'now') AS REAL)
+    FROM questions q
+    WHERE COALESCE(q.source_pdf, '') <> ''
+    GROUP BY COALESCE(q.course, ''), q.source_pdf;
+    """,
+    # 8: a version per course, moved to the next bank-wide number whenever a
+    #    question of that course is written by any process, so in-memory caches
+    #    can tell which courses changed under them
+    """
+    CREATE TABLE IF NOT EXISTS course_versions (
+        course TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_course_versions_version ON course_versions(version);
+
+    CREATE TRIGGER IF NOT EXISTS course_versions_ai AFTER INSERT ON questions BEGIN
+        INSERT INTO course_versions(course, version)
+        VALUES (COALESCE(new.course, ''), (SELECT COALESCE(MAX(version), 0) + 1 FROM course_versions))
+        ON CONFLICT(course) DO UPDATE SET version = excluded.version;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS course_versions_ad AFTER DELETE ON questions BEGIN
+        INSERT INTO course_versions(course, version)
+        VALUES (COALESCE(old.course, ''), (SELECT COALESCE(MAX(version), 0) + 1 FROM course_versions))
+        ON CONFLICT(course) DO UPDATE SET version = excluded.version;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS course_versions_au AFTER UPDATE ON questions BEGIN
+        INSERT INTO course_versions(course, version)
+        VALUES (COALESCE(old.course, ''), (SELECT COALESCE(MAX(version), 0) + 1 FROM course_versions))
+        ON CONFLICT(course) DO UPDATE SET version = excluded.version;
+        INSERT INTO course_versions(course, version)
+        VALUES (COALESCE(new.course, ''), (SELECT COALESCE(MAX(version), 0) + 1 FROM course_versions))
+        ON CONFLICT(course) DO UPDATE SET version = excluded.version;
+    END;
+    """,
+]
+
+
+def _open_connection(db_path: Path) -> sqlite3.Connection:
+    # isolation_level=None: reads autocommit, writes use transaction() below
+    conn = sqlite3.connect(
+        str(db_path),
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Bring the schema up to date. Returns the resulting schema version."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target in range(version + 1, len(MIGRATIONS) + 1):
+        conn.executescript(
+            f"BEGIN IMMEDIATE;\n{MIGRATIONS[target - 1]}\nPRAGMA user_version = {target};\nCOMMIT;"
+        )
+        print(f"[DB] Applied schema migration {target}", file=sys.stderr)
+    return max(version, len(MIGRATIONS))
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of long-lived connections to the question bank.
+
+    Connections keep their prepared-statement caches warm between calls, the
+    database runs in WAL mode so the Electron app can read while the pipeline
+    writes, and the schema is migrated once when the pool is created.
+    """
+
+    def __init__(self, db_path: Path = DB_PATH, size: int = DB_POOL_SIZE):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._all = []
+
+        for _ in range(size):
+            conn = _open_connection(self.db_path)
+            self._all.append(conn)
+            self._idle.put(conn)
+
+        with self.connection() as conn:
+            self.schema_version = migrate(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; statements outside transaction() autocommit."""
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=DB_POOL_TIMEOUT)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection free after {DB_POOL_TIMEOUT}s")
+        finally:
+            metrics.DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection inside BEGIN IMMEDIATE ... COMMIT (rolled back on error)."""
+        with self.connection() as conn:
+            started = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                metrics.DB_TRANSACTION_SECONDS.observe(time.perf_counter() - started, outcome="rollback")
+                raise
+            conn.commit()
+            metrics.DB_TRANSACTION_SECONDS.observe(time.perf_counter() - started, outcome="commit")
+
+    def close(self):
+        for conn in self._all:
+            conn.close()
+        self._all = []
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating and migrating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def connection():
+    return get_pool().connection()
+
+
+def transaction():
+    return get_pool().transaction()
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
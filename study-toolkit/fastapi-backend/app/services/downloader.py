@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+from . import metrics
+
+# Tunables for the download stage (overridable from .env.local)
+MAX_CONCURRENT_DOWNLOADS = int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "8"))
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("MAX_CONNECTIONS_PER_HOST", "2"))
+MAX_PDF_BYTES = int(os.getenv("MAX_PDF_BYTES", str(25 * 1024 * 1024)))
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "30"))
+CHUNK_SIZE = 64 * 1024
+
+
+class DownloadTooLargeError(Exception):
+    """Raised when a response exceeds the per-file size cap."""
+
+
+class PDFDownloader:
+    """
+    Async download engine shared by the pipeline and the /download-pdf/ endpoint.
+
+    Concurrency is bounded globally and per host (a download waits for its
+    host's slot before taking a global one, so a busy host cannot hold up
+    others), connections are pooled by a single httpx.AsyncClient, and bodies are streamed to disk in chunks so a
+    download never holds more than CHUNK_SIZE bytes in memory.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENT_DOWNLOADS,
+        max_per_host: int = MAX_CONNECTIONS_PER_HOST,
+        max_bytes: int = MAX_PDF_BYTES,
+        timeout: float = DOWNLOAD_TIMEOUT,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._client = None
+        self._loop = None
+        self._semaphore = None
+        self._host_semaphores = {}
+
+    def _ensure_loop_state(self):
+        # The client and semaphores belong to the loop that created them, so
+        # rebuild them if we are now running on a different one (e.g. CLI runs).
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._host_semaphores = {}
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str):
+        # One [semaphore, users] entry per host, dropped once nobody holds or
+        # waits on it so the map only covers hosts with downloads in flight
+        host = urlsplit(url).netloc.lower()
+        entry = self._host_semaphores.get(host)
+        if entry is None:
+            entry = self._host_semaphores[host] = [asyncio.Semaphore(self.max_per_host), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._host_semaphores.get(host) is entry:
+                del self._host_semaphores[host]
+
+    async def _stream_to_file(self, url: str, file_name: str, headers: dict = None) -> dict:
+        part_path = file_name + ".part"
+        size = 0
+        digest = hashlib.sha256()
+        try:
+            async with self._client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304:
+                    return {
+                        "message": "PDF not modified",
+                        "file_name": file_name,
+                        "not_modified": True,
+                    }
+                response.raise_for_status()
+
+                declared = response.headers.get("Content-Length")
+                if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                    raise DownloadTooLargeError(
+                        f"{url} is {declared} bytes (limit {self.max_bytes})"
+                    )
+
+                with open(part_path, "wb") as f:
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise DownloadTooLargeError(
+                                f"{url} exceeded {self.max_bytes} bytes"
+                            )
+                        digest.update(chunk)
+                        f.write(chunk)
+
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+
+            os.replace(part_path, file_name)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+        return {
+            "message": "PDF downloaded successfully",
+            "file_name": file_name,
+            "size_bytes": size,
+            "sha256": digest.hexdigest(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "not_modified": False,
+        }
+
+    async def _download(self, url: str, file_name: str, headers: dict = None) -> dict:
+        print(f"Downloading PDF from: {url}")
+        with metrics.span("download.pdf", url=url):
+            result = await self._stream_to_file(url, file_name, headers)
+        metrics.DOWNLOAD_BYTES.inc(result.get("size_bytes") or 0)
+        if result["not_modified"]:
+            print(f"✓ PDF not modified: {url}")
+        else:
+            print(f"✓ PDF saved: {file_name} ({result['size_bytes']} bytes)")
+        return result
+
+    async def download(self, url: str, file_name: str, headers: dict = None) -> dict:
+        """
+        Download a single URL to file_name, respecting all limits. Pass
+        conditional headers (If-None-Match / If-Modified-Since) to revalidate;
+        a 304 answer returns {"not_modified": True} and writes nothing.
+        """
+        self._ensure_loop_state()
+        async with self._host_slot(url):
+            async with self._semaphore:
+                return await self._download(url, file_name, headers)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+
+_downloader = None
+
+
+def get_downloader() -> PDFDownloader:
+    """Return the process-wide downloader instance."""
+    global _downloader
+    if _downloader is None:
+        _downloader = PDFDownloader()
+    return _downloader
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import time
+import uuid
+
+from . import database
+from .downloader import get_downloader
+
+EXAM_STORE_DIR = os.getenv("EXAM_STORE_DIR", "downloaded_exams")
+# Within this window a known URL is served from the store without a request;
+# after it, the URL is revalidated with ETag / Last-Modified
+EXAM_REVALIDATE_SECONDS = float(os.getenv("EXAM_REVALIDATE_SECONDS", str(24 * 3600)))
+
+
+class ExamStore:
+    """
+    Content-addressed store for downloaded exam PDFs.
+
+    Files are named `<sha256>.pdf`, so mirrored copies of the same PDF are
+    stored once, and the `exam_sources` table maps every URL to the hash it
+    last served. Concurrent fetches of the same URL share one download.
+    """
+
+    def __init__(self, root: str = EXAM_STORE_DIR, revalidate_after: float = EXAM_REVALIDATE_SECONDS):
+        self.root = root
+        self.revalidate_after = revalidate_after
+        self._inflight = {}
+
+    def path_for(self, sha256: str) -> str:
+        return os.path.join(self.root, f"{sha256}.pdf")
+
+    # --- URL index ---
+
+    def lookup(self, url: str):
+        with database.connection() as conn:
+            row = conn.execute("SELECT * FROM exam_sources WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def _record(self, url: str, result: dict):
+        with database.transaction() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO exam_sources
+                (url, sha256, etag, last_modified, size_bytes, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                url,
+                result["sha256"],
+                result.get("etag"),
+                result.get("last_modified"),
+                result["size_bytes"],
+                time.time(),
+            ))
+
+    def _touch(self, url: str):
+        with database.transaction() as conn:
+            conn.execute("UPDATE exam_sources SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    def _entry(self, url: str, sha256: str, size_bytes: int, cached: bool) -> dict:
+        return {
+            "source_url": url,
+            "sha256": sha256,
+            "path": self.path_for(sha256),
+            "size_bytes": size_bytes,
+            "cached": cached,
+        }
+
+    # --- fetching ---
+
+    async def fetch(self, url: str) -> dict:
+        """Return the stored copy of url, downloading or revalidating it if needed."""
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, url: str) -> dict:
+        known = await asyncio.to_thread(self.lookup, url)
+        headers = None
+
+        if known and os.path.exists(self.path_for(known["sha256"])):
+            if time.time() - known["fetched_at"] < self.revalidate_after:
+                return self._entry(url, known["sha256"], known["size_bytes"], cached=True)
+
+            headers = {}
+            if known.get("etag"):
+                headers["If-None-Match"] = known["etag"]
+            if known.get("last_modified"):
+                headers["If-Modified-Since"] = known["last_modified"]
+
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = os.path.join(self.root, f".{uuid.uuid4().hex}.download")
+        result = await get_downloader().download(url, temp_path, headers=headers or None)
+
+        if result["not_modified"]:
+            if not known:
+                raise RuntimeError(f"{url} answered 304 to an unconditional request")
+            await asyncio.to_thread(self._touch, url)
+            return self._entry(url, known["sha256"], known["size_bytes"], cached=True)
+
+        final_path = self.path_for(result["sha256"])
+        if os.path.exists(final_path):
+            # Same bytes already stored (mirror or unchanged re-download)
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, final_path)
+
+        await asyncio.to_thread(self._record, url, result)
+        return self._entry(url, result["sha256"], result["size_bytes"], cached=False)
+
+    async def fetch_many(self, urls: list, max_successes: int = None, is_new=None) -> list:
+        """
+        Fetch URLs concurrently. Returns one entry per URL, in order: the
+        store entry, the raised exception, or None if skipped because
+        max_successes had already been reached. With is_new(entry), only
+        entries it accepts count toward max_successes (e.g. not content the
+        caller already has), so repeats do not use up the cap.
+        """
+        results = [None] * len(urls)
+        successes = 0
+        slots = asyncio.Semaphore(get_downloader().max_concurrency)
+
+        async def run(index: int, url: str):
+            nonlocal successes
+            async with slots:
+                # Checked once a slot is free so queued URLs see earlier results
+                if max_successes is not None and successes >= max_successes:
+                    return
+                try:
+                    results[index] = await self.fetch(url)
+                except Exception as e:
+                    results[index] = e
+                    return
+                if is_new is None or is_new(results[index]):
+                    successes += 1
+
+        await asyncio.gather(*(run(i, url) for i, url in enumerate(urls)))
+        return results
+
+
+_store = None
+
+
+def get_exam_store() -> ExamStore:
+    """Return the process-wide exam store."""
+    global _store
+    if _store is None:
+        _store = ExamStore()
+    return _store
@@ -0,0 +1,45 @@
+import json
+import time
+from typing import Optional
+
+from . import database
+
+
+# --- Syllabus analyses, keyed by the SHA-256 of the uploaded PDF ---
+
+def lookup_analysis(sha256: str) -> Optional[dict]:
+    with database.connection() as conn:
+        row = conn.execute("SELECT analysis FROM syllabus_analyses WHERE sha256 = ?", (sha256,)).fetchone()
+    return json.loads(row["analysis"]) if row else None
+
+
+def record_analysis(sha256: str, analysis: dict):
+    with database.transaction() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO syllabus_analyses (sha256, course, analysis, created_at)
+            VALUES (?, ?, ?, ?)
+        """, (sha256, analysis.get("course_name", "Unknown Course"), json.dumps(analysis), time.time()))
+
+
+# --- Exam sources already mined for a course ---
+
+def ingested_sources(course: str) -> dict:
+    """{"urls": set, "hashes": set} of the exam sources already mined for course."""
+    with database.connection() as conn:
+        rows = conn.execute(
+            "SELECT source_url, sha256 FROM course_sources WHERE course = ?", (course,)
+        ).fetchall()
+    return {
+        "urls": {row["source_url"] for row in rows},
+        "hashes": {row["sha256"] for row in rows if row["sha256"]},
+    }
+
+
+def record_sources(course: str, sources: list):
+    """Mark sources ({"source_url", "sha256", "question_count"}) as mined for course."""
+    now = time.time()
+    with database.transaction() as conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO course_sources (course, source_url, sha256, question_count, ingested_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(course, s["source_url"], s["sha256"], s["question_count"], now) for s in sources])
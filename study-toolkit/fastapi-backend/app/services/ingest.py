@@ -0,0 +1,196 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+try:
+    from . import database, metrics
+    from .near_duplicates import NEAR_DUPLICATE_POLICY, POLICIES, insert_deduplicated
+    from .question_pools import get_question_pools
+except ImportError:  # executed as a script
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from app.services import database, metrics
+    from app.services.near_duplicates import NEAR_DUPLICATE_POLICY, POLICIES, insert_deduplicated
+    from app.services.question_pools import get_question_pools
+
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "2000"))
+
+INSERT_QUESTION_SQL = """
+    INSERT OR IGNORE INTO questions
+    (question_text, course, topics, difficulty, source_pdf)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+
+def question_row(q: dict) -> Optional[tuple]:
+    """
+    Column values for one question dict, or None if it has no text.
+    Accepts both the pipeline's keys (question, topic) and the table's
+    (question_text, topics); a list of topics is joined with commas.
+    """
+    question_text = (q.get("question") or q.get("question_text") or "").strip()
+    if not question_text:
+        return None
+
+    topics = q.get("topic") or q.get("topics") or ""
+    if isinstance(topics, list):
+        topics = ", ".join(str(t) for t in topics)
+
+    return (
+        question_text,
+        q.get("course") or "",
+        topics,
+        q.get("difficulty") or "",
+        q.get("source_pdf") or "",
+    )
+
+
+def ingest_questions(
+    questions: Iterable[dict],
+    chunk_size: int = INGEST_CHUNK_SIZE,
+    course: Optional[str] = None,
+    progress=None,
+    near_duplicates: str = NEAR_DUPLICATE_POLICY,
+) -> dict:
+    """
+    Insert questions from any iterable (a list, a generator over a file, ...)
+    with one `executemany` transaction per chunk, so memory stays bounded and
+    large dumps load without a commit per row.
+
+    Questions already in the bank (same text and course) are counted as
+    duplicates, questions without text as skipped. Paraphrases of a stored
+    question are found through the MinHash/LSH index and skipped or flagged
+    according to `near_duplicates` ("skip", "flag" or "off"). `course`, if given,
+    overrides each question's course. `progress`, if given, is called with
+    the running counts after every chunk.
+    """
+    counts = {"received": 0, "inserted": 0, "duplicates": 0, "near_duplicates": 0, "skipped": 0}
+    questions = iter(questions)
+
+    while True:
+        chunk = list(islice(questions, chunk_size))
+        if not chunk:
+            break
+        counts["received"] += len(chunk)
+
+        rows = []
+        for q in chunk:
+            if course is not None:
+                q = {**q, "course": course}
+            row = question_row(q)
+            if row is None:
+                counts["skipped"] += 1
+            else:
+                rows.append(row)
+
+        if rows:
+            with metrics.span("db.insert_questions", rows=len(rows)), database.transaction() as conn:
+                chunk_counts = insert_deduplicated(conn, rows, INSERT_QUESTION_SQL, near_duplicates)
+            for key, value in chunk_counts.items():
+                counts[key] += value
+            if chunk_counts["inserted"]:
+                # Practice-exam pools of these courses no longer hold every question
+                get_question_pools().invalidate({row[1] for row in rows})
+
+        if progress:
+            progress(dict(counts))
+
+    return counts
+
+
+# --- Dump readers ---
+# Each yields question dicts lazily so a dump is never fully held in memory.
+
+def iter_jsonl(lines: Iterable[str]) -> Iterator[dict]:
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_no}: {e}")
+
+
+def iter_csv(lines: Iterable[str]) -> Iterator[dict]:
+    yield from csv.DictReader(lines)
+
+
+def iter_json(text_stream) -> Iterator[dict]:
+    # A JSON array, or an object with a "questions" array (pipeline output)
+    data = json.load(text_stream)
+    if isinstance(data, dict):
+        data = data.get("questions", [])
+    yield from data
+
+
+READERS = {
+    ".jsonl": iter_jsonl,
+    ".ndjson": iter_jsonl,
+    ".csv": iter_csv,
+    ".json": iter_json,
+}
+
+
+def reader_for(filename: str):
+    suffix = Path(filename).suffix.lower()
+    if suffix not in READERS:
+        raise ValueError(
+            f"Unsupported question dump '{filename}' (expected one of {', '.join(sorted(READERS))})"
+        )
+    return READERS[suffix]
+
+
+def iter_question_stream(binary_stream, filename: str) -> Iterator[dict]:
+    """Question dicts from an open binary file whose format is given by `filename`."""
+    reader = reader_for(filename)
+    text_stream = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    try:
+        yield from reader(text_stream)
+    finally:
+        text_stream.detach()
+
+
+def ingest_file(path: str, chunk_size: int = INGEST_CHUNK_SIZE, course: Optional[str] = None, progress=None,
+                near_duplicates: str = NEAR_DUPLICATE_POLICY) -> dict:
+    with open(path, "rb") as f:
+        return ingest_questions(iter_question_stream(f, path), chunk_size, course, progress, near_duplicates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load questions (JSONL, CSV or JSON) into the question bank.")
+    parser.add_argument("paths", nargs="+", help="question dump files")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE, help="rows per transaction")
+    parser.add_argument("--course", help="store every question under this course")
+    parser.add_argument("--near-duplicates", choices=POLICIES, default=NEAR_DUPLICATE_POLICY,
+                        help="skip, flag or ignore paraphrases of stored questions")
+    args = parser.parse_args()
+
+    def progress(counts):
+        print(f"  {counts['received']} read, {counts['inserted']} inserted", file=sys.stderr)
+
+    totals = {}
+    for path in args.paths:
+        print(f"Importing {path}...", file=sys.stderr)
+        start = time.perf_counter()
+        counts = ingest_file(path, args.chunk_size, args.course, progress, args.near_duplicates)
+        counts["seconds"] = round(time.perf_counter() - start, 3)
+        totals[path] = counts
+        print(
+            f"✓ {path}: {counts['inserted']} inserted, {counts['duplicates']} duplicates, "
+            f"{counts['near_duplicates']} near-duplicates, {counts['skipped']} skipped in {counts['seconds']}s",
+            file=sys.stderr,
+        )
+
+    # Only JSON output goes to stdout
+    print(json.dumps(totals, indent=4))
+
+
+if __name__ == "__main__":
+    main()
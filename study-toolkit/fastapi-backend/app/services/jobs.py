@@ -0,0 +1,293 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import traceback
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from . import database
+from .pipeline import new_pipeline_state, pipeline_response, run_pipeline
+
+PIPELINE_MAX_CONCURRENT_JOBS = int(os.getenv("PIPELINE_MAX_CONCURRENT_JOBS", "4"))
+JOB_UPLOAD_DIR = database.DB_PATH.parent / "job_uploads"
+KEEPALIVE_SECONDS = 15
+
+# Uploaded syllabi are streamed to disk in chunks and rejected past this size
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Most syllabi accepted by one batch request
+MAX_BATCH_SYLLABI = int(os.getenv("MAX_BATCH_SYLLABI", "50"))
+# Allowance per file for multipart boundaries, headers and form fields
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def upload_path_for(job_id: str) -> Path:
+    """Where a job's syllabus is kept until the job finishes (survives restarts)."""
+    JOB_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    return JOB_UPLOAD_DIR / f"{job_id}.pdf"
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an uploaded file exceeds the size cap."""
+
+
+async def save_upload(upload, path: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """
+    Stream an UploadFile to path in UPLOAD_CHUNK_SIZE pieces, hashing it on
+    the way, so no more than one chunk is held in memory. Returns
+    {"sha256", "size_bytes"}; nothing is left behind if the upload is too
+    large or the copy fails.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise UploadTooLargeError(f"{upload.filename} is {upload.size} bytes (limit {max_bytes})")
+
+    part_path = path.with_name(path.name + ".part")
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        with open(part_path, "wb") as f:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"{upload.filename} exceeded {max_bytes} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+        os.replace(part_path, path)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+    finally:
+        await upload.close()
+
+    return {"sha256": digest.hexdigest(), "size_bytes": size}
+
+
+def discard_upload(path) -> None:
+    Path(path).unlink(missing_ok=True)
+
+
+class JobManager:
+    """
+    Runs syllabus pipelines as background jobs.
+
+    Job state is persisted to `pipeline_jobs` after every stage, so jobs left
+    queued or running by a crash are resumed from their last completed stage
+    by resume_incomplete(). Progress events are fanned out to subscribers
+    (the SSE endpoint) through per-subscriber queues.
+    """
+
+    def __init__(self, max_concurrent_jobs: int = PIPELINE_MAX_CONCURRENT_JOBS):
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self._tasks = {}
+        self._subscribers = {}
+        self._loop = None
+        self._semaphore = None
+
+    def _ensure_loop_state(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+
+    # --- persistence ---
+
+    def _insert(self, job_id: str, filename: str, state: dict):
+        now = time.time()
+        with database.transaction() as conn:
+            conn.execute("""
+                INSERT INTO pipeline_jobs (id, status, filename, state, created_at, updated_at)
+                VALUES (?, 'queued', ?, ?, ?, ?)
+            """, (job_id, filename, json.dumps(state), now, now))
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with database.transaction() as conn:
+            conn.execute(
+                f"UPDATE pipeline_jobs SET {assignments} WHERE id = ?",
+                list(fields.values()) + [job_id],
+            )
+
+    def _load_state(self, job_id: str) -> dict:
+        with database.connection() as conn:
+            row = conn.execute("SELECT state FROM pipeline_jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["state"])
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Public view of a job, or None if it does not exist."""
+        with database.connection() as conn:
+            row = conn.execute("SELECT * FROM pipeline_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        state = json.loads(row["state"])
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "stage": row["stage"],
+            "completed_stages": state.get("completed_stages", []),
+            "stage_seconds": state.get("stage_seconds", {}),
+            "filename": row["filename"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+        }
+
+    # --- execution ---
+
+    async def submit(
+        self, job_id: str, syllabus_path: str, filename: str,
+        force_refresh: bool = False, syllabus_sha256: str = None,
+    ) -> str:
+        """Persist a new job for an already-saved syllabus and start it."""
+        state = new_pipeline_state(str(syllabus_path), force_refresh, syllabus_sha256)
+        await asyncio.to_thread(self._insert, job_id, filename, state)
+        self._start(job_id)
+        return job_id
+
+    def _start(self, job_id: str):
+        self._ensure_loop_state()
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str):
+        async with self._semaphore:
+            state = await asyncio.to_thread(self._load_state, job_id)
+            await asyncio.to_thread(self._update, job_id, status="running")
+            await self._publish(job_id, "job_started", "running")
+
+            async def on_stage(stage: str, phase: str, state: dict):
+                await asyncio.to_thread(self._update, job_id, stage=stage, state=json.dumps(state))
+                await self._publish(job_id, f"stage_{phase}", "running", stage=stage)
+
+            try:
+                await run_pipeline(state, on_stage=on_stage)
+            except asyncio.CancelledError:
+                # Left as "running", upload included, so the next startup resumes it
+                raise
+            except Exception as e:
+                traceback.print_exc()
+                discard_upload(state["syllabus_path"])
+                await asyncio.to_thread(self._update, job_id, status="failed", error=f"Pipeline error: {str(e)}")
+                await self._publish(job_id, "job_failed", "failed", error=str(e))
+                return
+
+            discard_upload(state["syllabus_path"])
+
+            result = pipeline_response(state)
+            await asyncio.to_thread(
+                self._update, job_id, status="completed", result=json.dumps(result)
+            )
+            await self._publish(job_id, "job_completed", "completed")
+
+    async def wait(self, job_id: str) -> Optional[dict]:
+        """Wait until a job is no longer running in this process, then return its public view."""
+        task = self._tasks.get(job_id)
+        if task is not None:
+            # asyncio.wait neither raises the job's errors nor cancels it if we are cancelled
+            await asyncio.wait([task])
+        return await asyncio.to_thread(self.get, job_id)
+
+    async def as_completed(self, job_ids: list):
+        """Async generator of job views, each yielded as soon as that job finishes."""
+        waiters = [asyncio.ensure_future(self.wait(job_id)) for job_id in job_ids]
+        try:
+            for waiter in asyncio.as_completed(waiters):
+                yield await waiter
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    async def resume_incomplete(self) -> int:
+        """Restart jobs that were queued or running when the server stopped."""
+        def incomplete_ids():
+            with database.connection() as conn:
+                return [row["id"] for row in conn.execute(
+                    "SELECT id FROM pipeline_jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+                )]
+
+        def sweep_uploads(keep: set):
+            # Uploads of finished jobs and partial copies left by a crash
+            if JOB_UPLOAD_DIR.exists():
+                for path in JOB_UPLOAD_DIR.iterdir():
+                    if path.suffix != ".pdf" or path.stem not in keep:
+                        path.unlink(missing_ok=True)
+
+        job_ids = await asyncio.to_thread(incomplete_ids)
+        await asyncio.to_thread(sweep_uploads, set(job_ids))
+        for job_id in job_ids:
+            if job_id not in self._tasks:
+                print(f"Resuming pipeline job {job_id}")
+                self._start(job_id)
+        return len(job_ids)
+
+    async def shutdown(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # --- progress streaming ---
+
+    async def _publish(self, job_id: str, event: str, status: str, **detail):
+        payload = {
+            "event": event,
+            "job_id": job_id,
+            "status": status,
+            "timestamp": time.time(),
+            **detail,
+        }
+        for queue in list(self._subscribers.get(job_id, ())):
+            queue.put_nowait(payload)
+
+    async def events(self, job_id: str):
+        """
+        Async generator of progress events for one job: a snapshot of the
+        current state first, then live events until the job finishes. Yields
+        None every KEEPALIVE_SECONDS while idle.
+        """
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            job = await asyncio.to_thread(self.get, job_id)
+            yield {"event": "snapshot", **job}
+            if job["status"] in TERMINAL_STATUSES:
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield event
+                if event["status"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[job_id]
+
+
+_manager = None
+
+
+def get_job_manager() -> JobManager:
+    """Return the process-wide job manager."""
+    global _manager
+    if _manager is None:
+        _manager = JobManager()
+    return _manager
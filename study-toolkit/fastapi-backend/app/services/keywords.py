@@ -0,0 +1,242 @@
+import threading
+from collections import Counter
+from typing import List
+
+import numpy as np
+
+from . import database
+
+REFRESH_BATCH_SIZE = 5000
+
+
+class KeywordModel:
+    """
+    TF-IDF keyword extractor whose IDF comes from the whole question bank.
+
+    Document frequencies live in `keyword_terms` and are loaded once; each
+    extraction first folds in questions inserted since the last refresh (by
+    id) and deletes/edits logged by triggers, so the model stays current
+    without refitting. Tokenization matches TfidfVectorizer(stop_words="english")
+    and IDF uses its smoothed formula. scikit-learn and SciPy are only
+    imported on first use, keeping them out of the backend's startup path.
+    """
+
+    def __init__(self):
+        self._analyzer = None
+        self._lock = threading.RLock()
+        self.vocabulary = {}
+        self.terms = []
+        self._df = np.zeros(0, dtype=np.int64)
+        self.n_docs = 0
+        self.last_question_id = 0
+        self.last_change_seq = 0
+        self._idf = None
+        self._loaded = False
+
+    @property
+    def analyzer(self):
+        if self._analyzer is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            self._analyzer = TfidfVectorizer(stop_words="english").build_analyzer()
+        return self._analyzer
+
+    # --- persistence ---
+
+    def load(self):
+        """Read vocabulary and document frequencies, then catch up with the bank."""
+        with self._lock:
+            with database.connection() as conn:
+                state = dict(conn.execute("SELECT key, value FROM keyword_model_state").fetchall())
+                rows = conn.execute("SELECT term, df FROM keyword_terms").fetchall()
+
+            self.terms = [row[0] for row in rows]
+            self.vocabulary = {term: i for i, term in enumerate(self.terms)}
+            self._df = np.array([row[1] for row in rows], dtype=np.int64)
+            self.n_docs = state.get("n_docs", 0)
+            self.last_question_id = state.get("last_question_id", 0)
+            self.last_change_seq = state.get("last_change_seq", 0)
+            self._idf = None
+            self._loaded = True
+            self.refresh()
+
+    def rebuild(self):
+        """Drop the stored model and refit it over the whole bank."""
+        with self._lock:
+            with database.transaction() as conn:
+                conn.execute("DELETE FROM keyword_terms")
+                conn.execute("DELETE FROM keyword_model_state")
+                conn.execute("DELETE FROM keyword_model_changes")
+            self.load()
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    # --- incremental updates ---
+
+    def refresh(self) -> int:
+        """Apply questions changed since the last refresh. Returns how many were applied."""
+        with self._lock:
+            with database.connection() as conn:
+                # MAX(id) can drop after deletes; never move the watermark back
+                max_id = max(
+                    conn.execute("SELECT COALESCE(MAX(id), 0) FROM questions").fetchone()[0],
+                    self.last_question_id,
+                )
+                max_seq = conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM keyword_model_changes"
+                ).fetchone()[0]
+            if max_id <= self.last_question_id and max_seq <= self.last_change_seq:
+                return 0
+
+            deltas = Counter()
+            doc_delta = 0
+            applied = 0
+
+            with database.connection() as conn:
+                # Logged deletes/edits only matter for questions already counted;
+                # newer ones are read with their current text below
+                for question_text, delta in conn.execute("""
+                    SELECT question_text, delta FROM keyword_model_changes
+                    WHERE seq > ? AND seq <= ? AND question_id <= ?
+                """, (self.last_change_seq, max_seq, self.last_question_id)):
+                    for term in set(self.analyzer(question_text)):
+                        deltas[term] += delta
+                    doc_delta += delta
+                    applied += 1
+
+                last_id = self.last_question_id
+                while last_id < max_id:
+                    rows = conn.execute("""
+                        SELECT id, question_text FROM questions
+                        WHERE id > ? AND id <= ? ORDER BY id LIMIT ?
+                    """, (last_id, max_id, REFRESH_BATCH_SIZE)).fetchall()
+                    if not rows:
+                        break
+                    for row in rows:
+                        for term in set(self.analyzer(row[1])):
+                            deltas[term] += 1
+                    doc_delta += len(rows)
+                    applied += len(rows)
+                    last_id = rows[-1][0]
+
+            deltas = {term: d for term, d in deltas.items() if d}
+            with database.transaction() as conn:
+                conn.executemany("""
+                    INSERT INTO keyword_terms (term, df) VALUES (?, ?)
+                    ON CONFLICT(term) DO UPDATE SET df = df + excluded.df
+                """, deltas.items())
+                conn.execute("DELETE FROM keyword_terms WHERE df <= 0")
+                conn.execute("DELETE FROM keyword_model_changes WHERE seq <= ?", (max_seq,))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO keyword_model_state (key, value) VALUES (?, ?)",
+                    [
+                        ("n_docs", self.n_docs + doc_delta),
+                        ("last_question_id", max_id),
+                        ("last_change_seq", max_seq),
+                    ],
+                )
+
+            new_terms = [term for term in deltas if term not in self.vocabulary]
+            for term in new_terms:
+                self.vocabulary[term] = len(self.terms)
+                self.terms.append(term)
+            df = np.concatenate([self._df, np.zeros(len(new_terms), dtype=np.int64)])
+            for term, d in deltas.items():
+                df[self.vocabulary[term]] += d
+            np.maximum(df, 0, out=df)
+
+            self._df = df
+            self.n_docs += doc_delta
+            self.last_question_id = max_id
+            self.last_change_seq = max_seq
+            self._idf = None
+            return applied
+
+    # --- extraction ---
+
+    def _idf_for(self, df: np.ndarray) -> np.ndarray:
+        return np.log((1 + self.n_docs) / (1 + df)) + 1.0
+
+    @property
+    def idf(self) -> np.ndarray:
+        if self._idf is None:
+            self._idf = self._idf_for(self._df)
+        return self._idf
+
+    def transform(self, texts: List[str]):
+        """
+        L2-normalized TF-IDF rows for `texts` as a CSR matrix, plus the term
+        for every column. Terms the bank has never seen get the maximum IDF.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            self.refresh()
+
+            n_known = len(self.terms)
+            unseen = {}
+            indptr = [0]
+            indices = []
+            counts = []
+            for text in texts:
+                for term, count in Counter(self.analyzer(text or "")).items():
+                    column = self.vocabulary.get(term)
+                    if column is None:
+                        column = unseen.setdefault(term, n_known + len(unseen))
+                    indices.append(column)
+                    counts.append(count)
+                indptr.append(len(indices))
+
+            idf = np.concatenate([self.idf, np.full(len(unseen), self._idf_for(0))])
+            terms = self.terms + list(unseen)
+
+        from scipy.sparse import csr_matrix
+        from sklearn.preprocessing import normalize
+
+        matrix = csr_matrix(
+            (np.array(counts, dtype=np.float64), np.array(indices, dtype=np.int64), np.array(indptr)),
+            shape=(len(texts), len(terms)),
+        )
+        matrix.data *= idf[matrix.indices]
+
+        normalize(matrix, copy=False)
+        return matrix, terms
+
+    def extract_many(self, texts: List[str], top_n: int = 5) -> List[List[str]]:
+        """Top `top_n` keywords of every text, scored in one sparse TF-IDF pass."""
+        matrix, terms = self.transform(texts)
+        keywords = []
+        for i in range(matrix.shape[0]):
+            start, end = matrix.indptr[i], matrix.indptr[i + 1]
+            scores = matrix.data[start:end]
+            columns = matrix.indices[start:end]
+            # Highest score first; ties keep first-occurrence order
+            order = np.argsort(-scores, kind="stable")[:top_n]
+            keywords.append([terms[columns[j]] for j in order])
+        return keywords
+
+    def extract(self, text: str, top_n: int = 5) -> List[str]:
+        return self.extract_many([text], top_n)[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                "documents": self.n_docs,
+                "vocabulary_size": int(np.count_nonzero(self._df)),
+                "last_question_id": self.last_question_id,
+            }
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_keyword_model() -> KeywordModel:
+    """Return the process-wide keyword model (loaded lazily on first use)."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = KeywordModel()
+    return _model
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from . import database
+
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Share of the TTL a hit may leave last_accessed stale before it is rewritten
+LLM_CACHE_TOUCH_FRACTION = 0.1
+
+
+def make_cache_key(model: str, prompt: str, config: dict) -> str:
+    """Content address for one LLM call: sha256 of model + prompt + config."""
+    payload = json.dumps(
+        {"model": model, "prompt": prompt, "config": config},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Persistent LLM response cache in the `llm_cache` table.
+
+    Entries expire after `ttl_seconds`, and once the stored responses exceed
+    `max_bytes` the least recently used ones are evicted. A hit only rewrites
+    `last_accessed` once it is a tenth of the TTL old, so concurrent reads
+    rarely take the write lock; LRU order is that coarse.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        """Return the cached response text for key, or None on a miss."""
+        now = time.time()
+        with database.connection() as conn:
+            row = conn.execute(
+                "SELECT response, created_at, last_accessed FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            response, created_at, last_accessed = row
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.misses += 1
+                self.evictions += 1
+                return None
+
+            if now - last_accessed > self.ttl_seconds * LLM_CACHE_TOUCH_FRACTION:
+                conn.execute("UPDATE llm_cache SET last_accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return response
+
+    def put(self, key: str, model: str, response: str):
+        now = time.time()
+        with database.transaction() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO llm_cache
+                (key, model, response, size_bytes, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (key, model, response, len(response.encode("utf-8")), now, now))
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        expired = conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+
+        # Keep the most recently used entries whose running size fits the cap
+        over_limit = conn.execute("""
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size_bytes) OVER (
+                        ORDER BY last_accessed DESC, key
+                    ) AS running_bytes
+                    FROM llm_cache
+                )
+                WHERE running_bytes > ?
+            )
+        """, (self.max_bytes,)).rowcount
+
+        self.evictions += expired + over_limit
+
+    def clear(self):
+        with database.connection() as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        with database.connection() as conn:
+            entries, total_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_cache"
+            ).fetchone()
+
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "size_bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_cache = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Return the process-wide LLM response cache."""
+    global _cache
+    if _cache is None:
+        _cache = LLMResponseCache()
+    return _cache
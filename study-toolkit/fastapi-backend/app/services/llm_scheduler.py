@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import httpx
+
+from . import metrics
+from .llm_cache import get_llm_cache, make_cache_key
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+# Point GEMINI_BASE_URL at a local stand-in server for tests and benchmarks
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+
+# Tunables for Gemini traffic (overridable from .env.local)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "5"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_BURST = int(os.getenv("LLM_BURST", str(LLM_MAX_CONCURRENCY)))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+
+# HTTP codes Gemini uses for quota exhaustion / overload
+RETRYABLE_STATUS_CODES = {429, 500, 503, 504}
+
+
+class TokenBucket:
+    """Simple async token bucket: `rate` tokens per second, up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        # No await between the check and the decrement, so this is safe
+        # without a lock on a single event loop.
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    from google.genai import errors
+
+    if isinstance(exc, errors.APIError):
+        return exc.code in RETRYABLE_STATUS_CODES
+    # The genai client raises httpx's own errors for network failures;
+    # TransportError covers TimeoutException, connect and read errors
+    return isinstance(exc, (asyncio.TimeoutError, ConnectionError, httpx.TransportError))
+
+
+def _is_cacheable(text: str, json_output: bool) -> bool:
+    # Never pin a malformed JSON answer in the cache; a retry should re-ask
+    if not text:
+        return False
+    if json_output:
+        try:
+            json.loads(text)
+        except ValueError:
+            return False
+    return True
+
+
+class LLMScheduler:
+    """
+    Single entry point for every Gemini call made by the backend.
+
+    Calls are limited by a concurrency cap and a token-bucket request rate,
+    and throttling errors are retried with exponential backoff and jitter.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        burst: int = LLM_BURST,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff_base: float = LLM_BACKOFF_BASE,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._loop = None
+        self._semaphore = None
+
+    def _ensure_loop_state(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @property
+    def client(self):
+        """The Gemini client, created (and the SDK imported) on first use."""
+        if self._client is None:
+            # May be first touched from the startup warm-up thread
+            with self._client_lock:
+                if self._client is None:
+                    from google import genai
+                    from google.genai import types
+
+                    http_options = types.HttpOptions(base_url=GEMINI_BASE_URL) if GEMINI_BASE_URL else None
+                    self._client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"), http_options=http_options)
+        return self._client
+
+    async def _call(self, prompt: str, model: str, json_output: bool) -> str:
+        client = self.client
+        from google.genai import types
+
+        config = None
+        if json_output:
+            config = types.GenerateContentConfig(response_mime_type="application/json")
+        with metrics.LLM_REQUEST_SECONDS.time(model=model):
+            response = await client.aio.models.generate_content(
+                model=model,
+                contents=prompt,
+                config=config,
+            )
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            metrics.LLM_TOKENS.inc(usage.prompt_token_count or 0, model=model, kind="prompt")
+            metrics.LLM_TOKENS.inc(usage.candidates_token_count or 0, model=model, kind="completion")
+        return response.text
+
+    async def generate(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        json_output: bool = True,
+        use_cache: bool = True,
+    ) -> str:
+        """Run one prompt through the scheduler and return the response text."""
+        if not use_cache:
+            return await self._generate_uncached(prompt, model, json_output)
+
+        cache = get_llm_cache()
+        key = make_cache_key(model, prompt, {"json_output": json_output})
+        cached = await asyncio.to_thread(cache.get, key)
+        metrics.LLM_CACHE_LOOKUPS.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+
+        text = await self._generate_uncached(prompt, model, json_output)
+        if _is_cacheable(text, json_output):
+            await asyncio.to_thread(cache.put, key, model, text)
+        return text
+
+    async def _generate_uncached(self, prompt: str, model: str, json_output: bool) -> str:
+        self._ensure_loop_state()
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                await self._bucket.acquire()
+                try:
+                    with metrics.span("llm.generate", model=model, attempt=attempt):
+                        text = await self._call(prompt, model, json_output)
+                    metrics.LLM_REQUESTS.inc(model=model, outcome="ok")
+                    return text
+                except Exception as e:
+                    if attempt >= self.max_retries or not _is_retryable(e):
+                        metrics.LLM_REQUESTS.inc(model=model, outcome="error")
+                        raise
+                    metrics.LLM_REQUESTS.inc(model=model, outcome="retry")
+                    error = e
+
+            # Back off outside the semaphore so other calls can proceed
+            delay = self.backoff_base * (2 ** attempt) * (1 + random.random())
+            attempt += 1
+            print(
+                f"[LLM] {type(error).__name__}: retry {attempt}/{self.max_retries} in {delay:.1f}s",
+                file=sys.stderr,
+            )
+            await asyncio.sleep(delay)
+
+
+_scheduler = None
+
+
+def get_scheduler() -> LLMScheduler:
+    """Return the process-wide LLM scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler()
+    return _scheduler
@@ -0,0 +1,222 @@
+import json
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Log every finished span as a JSON line on stderr
+TRACE_SPANS = os.getenv("TRACE_SPANS", "0").lower() in ("1", "true", "yes")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic counter, one series per label combination."""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list:
+        if not self.labelnames and not self._values:
+            self.inc(0)  # expose unlabelled counters from zero
+        return super().render()
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_series(self, key, series):
+        lines = []
+        for bound, count in zip(self.buckets, series["counts"]):
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+        lines.append(f"{self.name}_count{labels} {series['counts'][-1]}")
+        return lines
+
+
+class Registry:
+    """Holds every metric and renders them as Prometheus text."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                return self._metrics[metric.name]
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name: str, help_text: str, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labelnames))
+
+
+def histogram(name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labelnames, buckets))
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# --- Shared metrics ---
+
+SPAN_SECONDS = histogram(
+    "learnio_span_duration_seconds",
+    "Duration of timed spans (pipeline stages, uploads, extraction, LLM calls, searches, downloads, inserts).",
+    ("span", "outcome"),
+)
+HTTP_REQUEST_SECONDS = histogram(
+    "learnio_http_request_duration_seconds",
+    "HTTP request latency by route (time to response headers).",
+    ("method", "route", "status"),
+)
+LLM_REQUESTS = counter(
+    "learnio_llm_requests_total", "Gemini calls by outcome (ok, error, retry).", ("model", "outcome")
+)
+LLM_REQUEST_SECONDS = histogram(
+    "learnio_llm_request_duration_seconds", "Latency of individual Gemini calls.", ("model",)
+)
+LLM_TOKENS = counter(
+    "learnio_llm_tokens_total", "Tokens reported by Gemini usage metadata.", ("model", "kind")
+)
+LLM_CACHE_LOOKUPS = counter(
+    "learnio_llm_cache_lookups_total", "LLM response cache lookups.", ("result",)
+)
+SEARCH_CACHE_LOOKUPS = counter(
+    "learnio_search_cache_lookups_total", "Search result cache lookups.", ("backend", "result")
+)
+DOWNLOAD_BYTES = counter(
+    "learnio_download_bytes_total", "PDF bytes downloaded.", ()
+)
+DB_POOL_WAIT_SECONDS = histogram(
+    "learnio_db_pool_wait_seconds",
+    "Time spent waiting for a pooled SQLite connection.",
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+DB_TRANSACTION_SECONDS = histogram(
+    "learnio_db_transaction_duration_seconds",
+    "Duration of write transactions, BEGIN IMMEDIATE to COMMIT.",
+    ("outcome",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+DB_QUERY_SECONDS = histogram(
+    "learnio_db_query_duration_seconds",
+    "Duration of read queries, results fetched, by query (practice-exam courses, pools, samples, rows).",
+    ("query",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as a named span: recorded in learnio_span_duration_seconds
+    and, with TRACE_SPANS=1, logged to stderr with its attributes. Works
+    around synchronous and awaited code alike.
+    """
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        SPAN_SECONDS.observe(seconds, span=name, outcome=outcome)
+        if TRACE_SPANS:
+            record = {"span": name, "seconds": round(seconds, 6), "outcome": outcome, **attributes}
+            print(json.dumps(record, default=str), file=sys.stderr)
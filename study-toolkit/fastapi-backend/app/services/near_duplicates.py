@@ -0,0 +1,355 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    from . import database
+    from .question_pools import get_question_pools
+except ImportError:  # executed as a script
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from app.services import database
+    from app.services.question_pools import get_question_pools
+
+# Estimated Jaccard similarity of word 3-gram sets above which two questions
+# of the same course count as the same item
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+# What insert_questions_into_db does with a near-duplicate: "skip" it (keep
+# the stored copy), "flag" it (insert and record the pair) or "off"
+NEAR_DUPLICATE_POLICY = os.getenv("NEAR_DUPLICATE_POLICY", "skip")
+POLICIES = ("skip", "flag", "off")
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+# 12 bands of 5 rows: pairs at 0.8 similarity share a bucket >99% of the
+# time, pairs at 0.3 only ~3% of the time
+BANDS = 12
+ROWS_PER_BAND = 5
+BACKFILL_BATCH_SIZE = 2000
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(20240601)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_BAND_MULT = _rng.randint(1, 1 << 62, size=ROWS_PER_BAND, dtype=np.uint64) | np.uint64(1)
+_BAND_SALT = _rng.randint(1, 1 << 62, size=BANDS, dtype=np.uint64)
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text: str) -> set:
+    """crc32 hashes of the word 3-grams of `text` (lowercased, punctuation ignored)."""
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode())
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def signature(text: str) -> Optional[np.ndarray]:
+    """NUM_PERM-value MinHash signature of `text`, or None if it has no words."""
+    hashes = shingles(text)
+    if not hashes:
+        return None
+    values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    permuted = (values[:, None] * _PERM_A + _PERM_B) % _MERSENNE_PRIME
+    return (permuted.min(axis=0) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+@lru_cache(maxsize=1024)
+def _course_hash(course: str) -> np.uint64:
+    return np.uint64(int.from_bytes(hashlib.blake2b((course or "").encode(), digest_size=8).digest(), "big"))
+
+
+def band_buckets(course: str, sig: np.ndarray) -> List[int]:
+    """
+    One LSH bucket per band. The course is part of the key, so only
+    questions of the same course ever share a bucket.
+    """
+    rows = sig[:BANDS * ROWS_PER_BAND].reshape(BANDS, ROWS_PER_BAND).astype(np.uint64)
+    mixed = (rows * _BAND_MULT).sum(axis=1, dtype=np.uint64) + _BAND_SALT
+    return (mixed ^ _course_hash(course)).view(np.int64).tolist()
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def _best_match(sig: np.ndarray, candidates: np.ndarray):
+    # (index, similarity) of the closest row of a signature matrix
+    scores = np.count_nonzero(candidates == sig, axis=1)
+    best = int(scores.argmax())
+    return best, float(scores[best]) / NUM_PERM
+
+
+def _placeholders(values: list) -> str:
+    return ", ".join("?" * len(values))
+
+
+def find_near_duplicate(conn, buckets: List[int], sig: np.ndarray, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+    """
+    Most similar indexed question sharing an LSH bucket with `sig`, as
+    (question_id, question_text, similarity), or None below `threshold`.
+    Only the handful of questions in the same buckets are compared.
+    """
+    rows = conn.execute(f"""
+        SELECT m.question_id, m.signature, q.question_text
+        FROM question_minhash m JOIN questions q ON q.id = m.question_id
+        WHERE m.question_id IN (
+            SELECT question_id FROM question_lsh WHERE bucket IN ({_placeholders(buckets)})
+        )
+    """, buckets).fetchall()
+    if not rows:
+        return None
+
+    candidates = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.uint32).reshape(-1, NUM_PERM)
+    best, score = _best_match(sig, candidates)
+    if score < threshold:
+        return None
+    return rows[best][0], rows[best][2], score
+
+
+def index_questions(conn, entries):
+    """Store signatures and LSH buckets for (question_id, signature, buckets) entries."""
+    minhash_rows = []
+    lsh_rows = []
+    for question_id, sig, buckets in entries:
+        if sig is None:
+            continue
+        minhash_rows.append((question_id, sig.tobytes()))
+        lsh_rows.extend((bucket, question_id) for bucket in buckets)
+    conn.executemany(
+        "INSERT OR REPLACE INTO question_minhash (question_id, signature) VALUES (?, ?)", minhash_rows
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO question_lsh (bucket, question_id) VALUES (?, ?)", lsh_rows
+    )
+
+
+def insert_deduplicated(conn, rows: list, insert_sql: str, policy: str = NEAR_DUPLICATE_POLICY,
+                        threshold: float = NEAR_DUPLICATE_THRESHOLD) -> dict:
+    """
+    Insert question rows (question_text, course, ...) inside the caller's
+    transaction, checking each against the LSH index and the rows accepted
+    earlier in the same batch. Returns inserted / duplicates / near_duplicates
+    counts; with policy "flag" near-duplicates are inserted and recorded in
+    `question_near_duplicates` (and also counted as inserted).
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown near-duplicate policy '{policy}' (expected one of {', '.join(POLICIES)})")
+
+    counts = {"inserted": 0, "duplicates": 0, "near_duplicates": 0}
+    if policy == "off":
+        counts["inserted"] = conn.executemany(insert_sql, rows).rowcount
+        counts["duplicates"] = len(rows) - counts["inserted"]
+        return counts
+
+    accepted = []
+    signatures = {}
+    flags = []
+    # Rows accepted earlier in this batch are not in the index yet
+    pending_keys = []
+    pending_sigs = []
+    pending_buckets = defaultdict(list)
+
+    for row in rows:
+        question_text, course = row[0], row[1]
+        key = (question_text, course)
+        if key in signatures:
+            counts["duplicates"] += 1
+            continue
+
+        sig = signature(question_text)
+        buckets = []
+        match = None
+        if sig is not None:
+            buckets = band_buckets(course, sig)
+            match = find_near_duplicate(conn, buckets, sig, threshold)
+
+            nearby = sorted({i for bucket in buckets for i in pending_buckets[bucket]})
+            if nearby:
+                best, score = _best_match(sig, np.stack([pending_sigs[i] for i in nearby]))
+                if score >= threshold and (match is None or score > match[2]):
+                    other_key = pending_keys[nearby[best]]
+                    match = (other_key, other_key[0], score)
+
+        if match is not None and match[1] == question_text:
+            counts["duplicates"] += 1
+            continue
+        if match is not None:
+            counts["near_duplicates"] += 1
+            if policy == "skip":
+                continue
+            flags.append((key, match[0], match[2]))
+
+        accepted.append(row)
+        signatures[key] = (sig, buckets)
+        if sig is not None:
+            for bucket in buckets:
+                pending_buckets[bucket].append(len(pending_keys))
+            pending_keys.append(key)
+            pending_sigs.append(sig)
+
+    before = conn.execute("SELECT COALESCE(MAX(id), 0) FROM questions").fetchone()[0]
+    inserted = conn.executemany(insert_sql, accepted).rowcount
+    counts["inserted"] = inserted
+    counts["duplicates"] += len(accepted) - inserted
+
+    # AUTOINCREMENT ids only grow and the transaction holds the write lock,
+    # so everything above `before` was inserted just now
+    ids = {
+        (r[1], r[2]): r[0]
+        for r in conn.execute(
+            "SELECT id, question_text, course FROM questions WHERE id > ?", (before,)
+        )
+    }
+    index_questions(conn, [
+        (ids[key], sig, buckets) for key, (sig, buckets) in signatures.items() if key in ids
+    ])
+
+    flag_rows = []
+    for key, duplicate_of, score in flags:
+        if isinstance(duplicate_of, tuple):
+            duplicate_of = ids.get(duplicate_of)
+        if key in ids and duplicate_of is not None:
+            flag_rows.append((ids[key], duplicate_of, score))
+    conn.executemany("""
+        INSERT OR REPLACE INTO question_near_duplicates (question_id, duplicate_of, similarity)
+        VALUES (?, ?, ?)
+    """, flag_rows)
+    return counts
+
+
+def backfill(batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Index questions that have no signature yet (older rows, edited rows)."""
+    indexed = 0
+    while True:
+        with database.connection() as conn:
+            rows = conn.execute("""
+                SELECT q.id, q.course, q.question_text FROM questions q
+                WHERE NOT EXISTS (SELECT 1 FROM question_minhash m WHERE m.question_id = q.id)
+                ORDER BY q.id LIMIT ?
+            """, (batch_size,)).fetchall()
+        if not rows:
+            return indexed
+
+        entries = []
+        for question_id, course, question_text in rows:
+            sig = signature(question_text)
+            entries.append((question_id, sig, band_buckets(course, sig) if sig is not None else []))
+        with database.transaction() as conn:
+            index_questions(conn, entries)
+            # Rows without words get an empty marker so they are not rescanned
+            conn.executemany(
+                "INSERT OR IGNORE INTO question_minhash (question_id, signature) VALUES (?, X'')",
+                [(question_id,) for question_id, sig, _ in entries if sig is None],
+            )
+        indexed += len(rows)
+
+
+def find_clusters(threshold: float = NEAR_DUPLICATE_THRESHOLD) -> List[List[int]]:
+    """
+    Groups of near-duplicate question ids (oldest first) across the bank.
+    Each bucket's members are compared with its oldest member only, so the
+    pass is linear in the index size.
+    """
+    parent = {}
+
+    def find(x):
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        if root != x:
+            parent[x] = root
+        return root
+
+    with database.connection() as conn:
+        groups = conn.execute("""
+            SELECT group_concat(question_id) FROM question_lsh
+            GROUP BY bucket HAVING COUNT(*) > 1
+        """).fetchall()
+
+        signatures = {}
+
+        def sig_for(question_id):
+            if question_id not in signatures:
+                row = conn.execute(
+                    "SELECT signature FROM question_minhash WHERE question_id = ?", (question_id,)
+                ).fetchone()
+                signatures[question_id] = np.frombuffer(row[0], dtype=np.uint32)
+            return signatures[question_id]
+
+        for (members,) in groups:
+            ids = sorted(int(x) for x in members.split(","))
+            head = ids[0]
+            for other in ids[1:]:
+                if find(other) == find(head):
+                    continue
+                if similarity(sig_for(head), sig_for(other)) >= threshold:
+                    a, b = find(head), find(other)
+                    parent[max(a, b)] = min(a, b)
+
+    clusters = defaultdict(set)
+    for question_id in list(parent):
+        root = find(question_id)
+        clusters[root].update((root, question_id))
+    return sorted(sorted(members) for members in clusters.values())
+
+
+def dedupe_bank(threshold: float = NEAR_DUPLICATE_THRESHOLD, apply: bool = False) -> dict:
+    """
+    Offline pass over the whole bank: index anything missing, find
+    near-duplicate clusters and, with `apply`, delete every question but the
+    oldest of each cluster (the index triggers update FTS and counts).
+    """
+    indexed = backfill()
+    clusters = find_clusters(threshold)
+    redundant = [question_id for cluster in clusters for question_id in cluster[1:]]
+
+    if apply and redundant:
+        with database.transaction() as conn:
+            conn.executemany("DELETE FROM questions WHERE id = ?", [(i,) for i in redundant])
+        get_question_pools().invalidate()
+
+    return {
+        "indexed": indexed,
+        "clusters": len(clusters),
+        "redundant_questions": len(redundant),
+        "deleted": len(redundant) if apply else 0,
+        "examples": clusters[:20],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find (and optionally remove) near-duplicate questions.")
+    parser.add_argument("--threshold", type=float, default=NEAR_DUPLICATE_THRESHOLD)
+    parser.add_argument("--apply", action="store_true", help="delete all but the oldest question of each cluster")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = dedupe_bank(args.threshold, args.apply)
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    print(
+        f"✓ {report['clusters']} clusters, {report['redundant_questions']} redundant questions"
+        f"{'' if args.apply else ' (dry run, pass --apply to delete)'}",
+        file=sys.stderr,
+    )
+    # Only JSON output goes to stdout
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from . import metrics
+from .text_cache import file_sha256, get_text_cache
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))
+
+
+def iter_pdf_pages(pdf_path: str, start_page: int = 0) -> Iterator[str]:
+    """
+    Yield the text of each page lazily (an empty string for pages without
+    text); pages are only parsed when consumed.
+    """
+    import PyPDF2  # imported on first parse, off the startup path
+
+    with open(pdf_path, "rb") as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        for index in range(start_page, len(pdf_reader.pages)):
+            yield pdf_reader.pages[index].extract_text() or ""
+
+
+def _text_length(pages: List[str]) -> int:
+    return sum(len(page) + 1 for page in pages if page)
+
+
+def _join_pages(pages: List[str], max_chars: Optional[int]) -> str:
+    text = "\n".join(page for page in pages if page).strip()
+    if max_chars is not None:
+        text = text[:max_chars]
+    return text
+
+
+def _has_enough(pages: List[str], complete: bool, max_chars: Optional[int]) -> bool:
+    if complete:
+        return True
+    return max_chars is not None and _text_length(pages) >= max_chars
+
+
+def parse_pages(pdf_path: str, start_page: int = 0, max_chars: Optional[int] = None) -> Tuple[List[str], bool]:
+    """
+    Parse pages from start_page until max_chars characters of text have been
+    collected. Returns (pages, reached_end_of_document).
+    """
+    pages = []
+    collected = 0
+    for page_text in iter_pdf_pages(pdf_path, start_page):
+        pages.append(page_text)
+        if page_text:
+            collected += len(page_text) + 1
+        if max_chars is not None and collected >= max_chars:
+            return pages, False
+    return pages, True
+
+
+def extract_text_limited(pdf_path: str, max_chars: Optional[int] = None, use_cache: bool = True) -> str:
+    """
+    Extract text page by page, stopping once max_chars characters have been
+    collected. With max_chars=None every page is read. Pages already in the
+    extracted-text cache are not parsed again.
+    """
+    if not use_cache:
+        pages, _ = parse_pages(pdf_path, 0, max_chars)
+        return _join_pages(pages, max_chars)
+
+    cache = get_text_cache()
+    sha256 = file_sha256(pdf_path)
+    pages, complete = cache.get_pages(sha256)
+    cached_count = len(pages)
+
+    new_pages = []
+    if not _has_enough(pages, complete, max_chars):
+        remaining = None if max_chars is None else max_chars - _text_length(pages)
+        new_pages, complete = parse_pages(pdf_path, cached_count, remaining)
+        cache.put_pages(sha256, cached_count, new_pages, complete)
+
+    cache.record_lookup(len(new_pages), cached_count)
+    return _join_pages(pages + new_pages, max_chars)
+
+
+_executor = None
+
+# Parses in progress, shared by concurrent callers reading the same document
+# (e.g. an exam found for several courses of one batch)
+_inflight = {}
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Process pool shared by all PDF parsing, so it stays off the event loop."""
+    global _executor
+    if _executor is None:
+        # Spawned, not forked: the pool starts after the server's threads, and a
+        # forked child could inherit a lock one of them was holding
+        _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+async def extract_text(pdf_path: str, max_chars: Optional[int] = None, use_cache: bool = True) -> str:
+    """
+    Extract text from one PDF. Hashing and cache lookups run in a thread,
+    and any parsing still needed runs in the process pool.
+    """
+    with metrics.span("pdf.extract_text", path=pdf_path):
+        return _join_pages(await _extract_pages(pdf_path, max_chars, use_cache), max_chars)
+
+
+async def extract_pages(pdf_path: str, max_chars: Optional[int] = None, use_cache: bool = True) -> List[str]:
+    """
+    Like extract_text, but returns the text of each page (in order, empty
+    pages dropped), cut off once max_chars characters have been collected.
+    """
+    with metrics.span("pdf.extract_pages", path=pdf_path):
+        pages = await _extract_pages(pdf_path, max_chars, use_cache)
+
+    kept = []
+    remaining = max_chars
+    for page in pages:
+        page = page.strip()
+        if not page:
+            continue
+        if remaining is not None:
+            if remaining <= 0:
+                break
+            page = page[:remaining]
+            remaining -= len(page) + 1
+        kept.append(page)
+    return kept
+
+
+async def _extract_pages(pdf_path: str, max_chars: Optional[int], use_cache: bool) -> List[str]:
+    loop = asyncio.get_running_loop()
+    if not use_cache:
+        pages, _ = await loop.run_in_executor(get_executor(), parse_pages, pdf_path, 0, max_chars)
+        return pages
+
+    sha256 = await asyncio.to_thread(file_sha256, pdf_path)
+    key = (sha256, max_chars)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_extract_cached_pages(pdf_path, sha256, max_chars))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return list(await asyncio.shield(task))
+
+
+async def _extract_cached_pages(pdf_path: str, sha256: str, max_chars: Optional[int]) -> List[str]:
+    loop = asyncio.get_running_loop()
+    cache = get_text_cache()
+    pages, complete = await asyncio.to_thread(cache.get_pages, sha256)
+    cached_count = len(pages)
+
+    new_pages = []
+    if not _has_enough(pages, complete, max_chars):
+        remaining = None if max_chars is None else max_chars - _text_length(pages)
+        new_pages, complete = await loop.run_in_executor(
+            get_executor(), parse_pages, pdf_path, cached_count, remaining
+        )
+        await asyncio.to_thread(cache.put_pages, sha256, cached_count, new_pages, complete)
+
+    cache.record_lookup(len(new_pages), cached_count)
+    return pages + new_pages
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
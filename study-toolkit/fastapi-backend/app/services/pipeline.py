@@ -0,0 +1,465 @@
+import asyncio
+import os
+import random
+import time
+
+from ..api.syllabus_processing import insert_into_db, analyze_syllabus_with_gemini, SYLLABUS_CHAR_BUDGET
+from . import fingerprints, metrics, pdf_text
+from .chunking import (
+    TokenBudget, admit_round_robin, chunk_pages, map_json, merge_unique, normalize_text, pack_by_tokens,
+)
+from .exam_store import get_exam_store
+from .ingest import ingest_questions
+from .segmenter import QUESTION_SEGMENTER, segment_pages
+from .text_cache import file_sha256
+
+MAX_DOWNLOADS = 10
+
+# Whole exams are read, split into chunks of about this many tokens
+EXAM_CHUNK_TOKENS = int(os.getenv("EXAM_CHUNK_TOKENS", "4000"))
+# Allowance reserved from the job's token budget for each chunk's answer
+EXTRACTION_ANSWER_TOKENS = int(os.getenv("EXTRACTION_ANSWER_TOKENS", "2000"))
+# Safety cap on text parsed per exam; the token budget normally binds first
+EXAM_CHAR_LIMIT = int(os.getenv("EXAM_CHAR_LIMIT", "400000"))
+# Locally segmented questions are sent for classification in batches of this many tokens
+CLASSIFY_BATCH_TOKENS = int(os.getenv("CLASSIFY_BATCH_TOKENS", "3000"))
+# A classification answer is an id, a topic and a difficulty per question
+CLASSIFY_ANSWER_TOKENS_PER_QUESTION = 30
+
+
+# --- HELPER: Insert questions into SQLite database ---
+def insert_questions_into_db(questions: list) -> dict:
+    counts = ingest_questions(questions)
+    print(
+        f"✓ {counts['inserted']} questions inserted into database "
+        f"({counts['duplicates']} already stored, {counts['near_duplicates']} near-duplicates)"
+    )
+    return counts
+
+
+# --- HELPER: Ask Gemini for practice questions from one chunk of a downloaded PDF ---
+def build_extraction_prompt(course_name: str, topics: list, chunk: dict) -> str:
+    # IMPORTANT: Make sure Gemini uses the exact course_name from analysis
+    return f"""
+Analyze this past exam content for the course "{course_name}" covering topics: {', '.join(topics)}.
+
+Extract practice questions that would help students prepare for this course.
+The content is one part of a longer exam; extract every question in it, and
+skip fragments of questions cut off at the start or end.
+
+IMPORTANT: You must use EXACTLY this course name in your response: "{course_name}"
+
+Format your response as JSON with this structure:
+{{
+    "questions": [
+        {{
+          "question": "The question text",
+          "course": "{course_name}",
+          "difficulty": "easy" or "medium" or "hard",
+          "topic": "relevant topic from the list"
+        }}
+    ]
+}}
+
+Exam content (pages {chunk["first_page"]}-{chunk["last_page"]}):
+{chunk["text"]}
+"""
+
+
+def build_classification_prompt(course_name: str, topics: list, spans: list) -> str:
+    candidates = "\n".join(f"[{span['id']}] {span['text']}" for span in spans)
+    return f"""
+Classify these candidate questions from a past exam for the course "{course_name}" covering topics: {', '.join(topics)}.
+
+Some candidates may be instructions, headings or answer text rather than
+questions; list their ids under "not_questions" instead.
+
+Format your response as JSON with one entry per real question, in this structure:
+{{
+    "questions": [
+        {{"id": 1, "difficulty": "easy" or "medium" or "hard", "topic": "relevant topic from the list"}}
+    ],
+    "not_questions": [2]
+}}
+
+Candidates:
+{candidates}
+"""
+
+
+def plan_extraction(pages: list, course_name: str, topics: list) -> list:
+    """
+    Gemini requests for one exam. Questions the local segmenter finds
+    cleanly are only classified (their text is never sent back); exams it
+    cannot segment, and spans it cannot trust, get full chunked extraction.
+    """
+    def extraction_requests(texts: list) -> list:
+        return [
+            {
+                "kind": "extract",
+                "prompt": build_extraction_prompt(course_name, topics, chunk),
+                "answer_tokens": EXTRACTION_ANSWER_TOKENS,
+            }
+            for chunk in chunk_pages(texts, EXAM_CHUNK_TOKENS)
+        ]
+
+    if not QUESTION_SEGMENTER:
+        return extraction_requests(pages)
+    segmentation = segment_pages(pages)
+    if not segmentation["confident"]:
+        return extraction_requests(pages)
+
+    clear = [span for span in segmentation["spans"] if not span["ambiguous"]]
+    requests = [
+        {
+            "kind": "classify",
+            "prompt": build_classification_prompt(course_name, topics, batch),
+            "answer_tokens": CLASSIFY_ANSWER_TOKENS_PER_QUESTION * len(batch),
+            "spans": batch,
+        }
+        for batch in pack_by_tokens(clear, CLASSIFY_BATCH_TOKENS)
+    ]
+
+    # Ambiguous spans keep their page numbers for the extraction prompt
+    unclear_pages = [""] * len(pages)
+    for span in segmentation["spans"]:
+        if span["ambiguous"]:
+            unclear_pages[span["first_page"] - 1] += span["text"] + "\n"
+    return requests + extraction_requests(unclear_pages)
+
+
+def merge_questions(requests: list, answers: list, course_name: str, source_url: str) -> list:
+    """Reduce the answers to one PDF's requests into one deduplicated question list."""
+    groups = []
+    for request, answer in zip(requests, answers):
+        if isinstance(answer, Exception):
+            print(f"✗ Request failed for {source_url}: {answer}")
+            continue
+        entries = answer.get("questions") if isinstance(answer, dict) else None
+        if not isinstance(entries, list):
+            continue
+        entries = [entry for entry in entries if isinstance(entry, dict)]
+
+        if request["kind"] == "classify":
+            # Ids may come back as strings; the question text is always the local span
+            spans = {str(span["id"]): span for span in request["spans"]}
+            rejected = answer.get("not_questions")
+            rejected = {str(i) for i in rejected} if isinstance(rejected, list) else set()
+            groups.append([
+                {
+                    "question": spans[str(entry.get("id"))]["text"],
+                    "difficulty": entry.get("difficulty"),
+                    "topic": entry.get("topic"),
+                }
+                for entry in entries
+                if str(entry.get("id")) in spans and str(entry.get("id")) not in rejected
+            ])
+        else:
+            groups.append([entry for entry in entries if entry.get("question")])
+
+    questions = merge_unique(groups, key=lambda q: normalize_text(q["question"]))
+    # DOUBLE CHECK: Ensure every question has the correct course name
+    for q in questions:
+        q["course"] = course_name  # Force the correct course name
+        q["source_pdf"] = source_url
+    return questions
+
+
+async def extract_questions_from_pdfs(files: list, course_name: str, topics: list, budget: TokenBudget) -> list:
+    """
+    Map-reduce extraction over whole PDFs: every exam is planned into
+    classification batches and token-sized extraction chunks, the requests
+    the budget admits are sent concurrently, and each PDF's answers are
+    merged. Returns one entry per file: {"questions", "complete"}, where
+    complete is False if the budget cut some of its requests, or the
+    exception that prevented reading it.
+    """
+    texts = await asyncio.gather(
+        *(pdf_text.extract_pages(f["path"], max_chars=EXAM_CHAR_LIMIT) for f in files),
+        return_exceptions=True,
+    )
+    planned = [
+        [] if isinstance(pages, Exception) else plan_extraction(pages, course_name, topics)
+        for pages in texts
+    ]
+    admitted = admit_round_robin(planned, budget)
+
+    answers = await map_json([request["prompt"] for group in admitted for request in group])
+    results = []
+    offset = 0
+    for file_info, pages, group, plan in zip(files, texts, admitted, planned):
+        file_answers = answers[offset:offset + len(group)]
+        offset += len(group)
+        if isinstance(pages, Exception):
+            results.append(pages)
+            continue
+        if len(group) < len(plan):
+            print(f"⚠ Token budget covered {len(group)} of {len(plan)} requests for {file_info['filename']}")
+        results.append({
+            "questions": merge_questions(group, file_answers, course_name, file_info["source_url"]),
+            "complete": len(group) == len(plan),
+        })
+    return results
+
+
+# --- Pipeline stages ---
+# Each stage reads and extends a JSON-serializable `state` dict, so a job can
+# persist it after every stage and resume from the last completed one.
+
+def new_pipeline_state(syllabus_path: str, force_refresh: bool = False, syllabus_sha256: str = None) -> dict:
+    return {
+        "syllabus_path": syllabus_path,
+        # Hashed while the upload streamed in, if known
+        "syllabus_sha256": syllabus_sha256,
+        # Re-analyze the syllabus and re-mine sources even if they are already stored
+        "force_refresh": force_refresh,
+        "completed_stages": [],
+        "course_name": None,
+        "topics": [],
+        "questions": [],
+        "results": {
+            "course_info": {},
+            "search_results": {},
+            "downloaded_pdfs": [],
+            "practice_exam": {}
+        }
+    }
+
+
+async def stage_analyze(state: dict):
+    # STEP 1: Process the uploaded syllabus
+    print("Step 1: Processing syllabus...")
+    sha256 = state.get("syllabus_sha256") or await asyncio.to_thread(file_sha256, state["syllabus_path"])
+    state["syllabus_sha256"] = sha256
+
+    analysis = None
+    if not state.get("force_refresh"):
+        analysis = await asyncio.to_thread(fingerprints.lookup_analysis, sha256)
+    state["results"]["analysis_reused"] = analysis is not None
+
+    if analysis is not None:
+        print("✓ Syllabus already analyzed, reusing the stored analysis")
+    else:
+        syllabus_text = await pdf_text.extract_text(state["syllabus_path"], max_chars=SYLLABUS_CHAR_BUDGET)
+        analysis = await analyze_syllabus_with_gemini(syllabus_text)
+        # A failed analysis is not remembered, so the next upload tries again
+        if analysis.get("course_name", "Unknown Course") != "Unknown Course":
+            await asyncio.to_thread(fingerprints.record_analysis, sha256, analysis)
+
+    state["results"]["course_info"] = analysis
+
+    # IMPORTANT: Use the course_name from Gemini's analysis
+    # This is what will be stored in the database
+    state["course_name"] = analysis.get("course_name", "Unknown Course")
+    state["topics"] = analysis.get("topics", [])
+
+    await asyncio.to_thread(insert_into_db, analysis)
+
+    print(f"✓ Course identified: {state['course_name']}")
+    print(f"✓ Topics found: {len(state['topics'])}")
+
+
+async def stage_search(state: dict):
+    # STEP 2: Search for past exam PDFs
+    print("\nStep 2: Searching for past exam PDFs...")
+    from ..api.web_search import web_search as perform_web_search
+    search_results = await perform_web_search(state["course_name"])
+    state["results"]["search_results"] = search_results
+    print(f"✓ Search completed: {sum(len(v) for v in search_results.values())} PDFs found")
+
+
+async def stage_download(state: dict):
+    # STEP 3: Download the PDFs into the content-addressed exam store
+    print("\nStep 3: Downloading PDFs...")
+
+    # Collect candidate links in search order, skipping repeated URLs
+    candidates = []
+    seen_urls = set()
+    for query, links in state["results"]["search_results"].items():
+        for item in links[:MAX_DOWNLOADS]:
+            pdf_url = item.get("link")
+            if pdf_url and pdf_url not in seen_urls:
+                seen_urls.add(pdf_url)
+                candidates.append(item)
+
+    # Sources already mined for this course are neither downloaded nor extracted
+    # again, and count toward MAX_DOWNLOADS so a repeat run does no new work
+    known = {"urls": set(), "hashes": set()}
+    if not state.get("force_refresh"):
+        known = await asyncio.to_thread(fingerprints.ingested_sources, state["course_name"])
+    skipped_sources = [item["link"] for item in candidates if item["link"] in known["urls"]]
+    candidates = [item for item in candidates if item["link"] not in known["urls"]]
+    max_downloads = max(0, MAX_DOWNLOADS - len(skipped_sources))
+
+    # Only content not mined for this course and not fetched earlier in this run
+    # uses up a download slot; mirrors and already-ingested copies do not
+    new_hashes = set()
+
+    def is_new(entry: dict) -> bool:
+        if entry["sha256"] in known["hashes"] or entry["sha256"] in new_hashes:
+            return False
+        new_hashes.add(entry["sha256"])
+        return True
+
+    fetch_results = await get_exam_store().fetch_many(
+        [item["link"] for item in candidates], max_successes=max_downloads, is_new=is_new
+    )
+
+    downloaded_files = []
+    seen_hashes = set()
+    for item, entry in zip(candidates, fetch_results):
+        pdf_url = item["link"]
+        if entry is None:
+            continue
+        if isinstance(entry, Exception):
+            print(f"✗ Failed to download {pdf_url}: {str(entry)}")
+            continue
+        if entry["sha256"] in seen_hashes:
+            print(f"= Duplicate of an earlier PDF: {pdf_url}")
+            continue
+        if entry["sha256"] in known["hashes"]:
+            # Same content as a mined source under another URL; remember this URL too
+            print(f"= Already ingested for this course: {pdf_url}")
+            skipped_sources.append(pdf_url)
+            await asyncio.to_thread(fingerprints.record_sources, state["course_name"], [
+                {"source_url": pdf_url, "sha256": entry["sha256"], "question_count": 0}
+            ])
+            continue
+        if len(downloaded_files) >= max_downloads:
+            break
+        seen_hashes.add(entry["sha256"])
+        downloaded_files.append({
+            "filename": os.path.basename(entry["path"]),
+            "path": entry["path"],
+            "sha256": entry["sha256"],
+            "source_url": pdf_url,
+            "title": item.get("title"),
+            "size_bytes": entry["size_bytes"],
+            "cached": entry["cached"]
+        })
+        print(f"✓ {'Reused' if entry['cached'] else 'Downloaded'}: {pdf_url}")
+
+    state["results"]["downloaded_pdfs"] = downloaded_files
+    state["results"]["skipped_sources"] = skipped_sources
+    if skipped_sources:
+        print(f"✓ Skipped {len(skipped_sources)} sources already ingested for this course")
+    print(f"\n✓ Total PDFs downloaded: {len(downloaded_files)}")
+
+
+async def stage_extract(state: dict):
+    # STEP 4: Extract questions from downloaded PDFs
+    print("\nStep 4: Extracting Questions from PDFs...")
+    downloaded_files = state["results"]["downloaded_pdfs"]
+    course_name = state["course_name"]
+    topics = state["topics"]
+
+    all_questions = []
+    mined_sources = []
+    if downloaded_files:
+        # All chunks of all PDFs run concurrently; the scheduler bounds
+        # how many Gemini calls are actually in flight.
+        budget = TokenBudget(used=state.get("tokens_used", 0))
+        extraction_results = await extract_questions_from_pdfs(downloaded_files, course_name, topics, budget)
+        state["tokens_used"] = budget.used
+
+        for file_info, extraction in zip(downloaded_files, extraction_results):
+            if isinstance(extraction, Exception):
+                print(f"✗ Error processing {file_info['filename']}: {str(extraction)}")
+                continue
+            questions = extraction["questions"]
+            all_questions.extend(questions)
+            print(f"✓ Extracted {len(questions)} questions from {file_info['filename']}")
+            # Only fully read sources count as mined; a budget-cut one is retried next run
+            if extraction["complete"]:
+                mined_sources.append({
+                    "source_url": file_info["source_url"],
+                    "sha256": file_info["sha256"],
+                    "question_count": len(questions),
+                })
+
+        print(f"✓ Estimated tokens used by this job: {budget.used} of {budget.limit}")
+        random.shuffle(all_questions)
+
+    state["questions"] = all_questions
+    state["mined_sources"] = mined_sources
+
+
+async def stage_store(state: dict):
+    # STEP 5: Store extracted questions into the database
+    print("\nStep 5: Storing Questions into Database...")
+    downloaded_files = state["results"]["downloaded_pdfs"]
+    all_questions = state["questions"]
+    course_name = state["course_name"]
+
+    if not downloaded_files:
+        skipped = state["results"].get("skipped_sources", [])
+        state["results"]["stored_questions"] = {
+            "message": (
+                "All sources found were already ingested for this course" if skipped
+                else "No PDFs downloaded, cannot find questions"
+            ),
+            "skipped_sources": len(skipped),
+        }
+        return
+
+    state["results"]["stored_questions"] = {
+        "course_name": course_name,
+        "topics": state["topics"],
+        "total_questions": len(all_questions),
+        "questions": all_questions[:20],
+        "sources": [f["source_url"] for f in downloaded_files],
+        "skipped_sources": len(state["results"].get("skipped_sources", [])),
+    }
+
+    # --- SAVE QUESTIONS TO DATABASE ---
+    if all_questions:
+        counts = await asyncio.to_thread(insert_questions_into_db, all_questions)
+        state["results"]["stored_questions"]["inserted"] = counts["inserted"]
+        state["results"]["stored_questions"]["duplicates"] = counts["duplicates"]
+        state["results"]["stored_questions"]["near_duplicates"] = counts["near_duplicates"]
+        print(f"✓ {counts['inserted']} questions stored to database under course: '{course_name}'")
+    else:
+        print("⚠ No questions extracted from PDFs")
+
+    # Recorded only after the questions are stored, so a crash in between re-mines them
+    if state.get("mined_sources"):
+        await asyncio.to_thread(fingerprints.record_sources, course_name, state["mined_sources"])
+
+
+PIPELINE_STAGES = [
+    ("analyze", stage_analyze),
+    ("search", stage_search),
+    ("download", stage_download),
+    ("extract", stage_extract),
+    ("store", stage_store),
+]
+
+
+async def run_pipeline(state: dict, on_stage=None) -> dict:
+    """
+    Run every stage not yet in state["completed_stages"], recording each
+    stage's wall time in state["stage_seconds"]. `on_stage`, if given, is
+    awaited as on_stage(stage_name, "started" | "completed", state).
+    """
+    for name, stage in PIPELINE_STAGES:
+        if name in state["completed_stages"]:
+            continue
+        if on_stage:
+            await on_stage(name, "started", state)
+        started = time.perf_counter()
+        with metrics.span(f"pipeline.{name}", syllabus=state["syllabus_path"]):
+            await stage(state)
+        state.setdefault("stage_seconds", {})[name] = round(time.perf_counter() - started, 4)
+        state["completed_stages"].append(name)
+        if on_stage:
+            await on_stage(name, "completed", state)
+    return state
+
+
+def pipeline_response(state: dict) -> dict:
+    return {
+        "success": True,
+        "message": "Pipeline completed successfully",
+        "course_name": state["course_name"],  # Return this so frontend knows the exact course name
+        "results": state["results"]
+    }
@@ -0,0 +1,249 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import metrics
+from .sampling import QuestionPool, build_pool, fetch_question_rows, pool_size, sample_from_pool, sample_questions
+from .vector_index import get_vector_index
+
+# Candidate pools (one per course/topic request shape) and question rows kept in memory
+QUESTION_POOL_CACHE_SIZE = int(os.getenv("QUESTION_POOL_CACHE_SIZE", "256"))
+# Candidate ids held across all pools (8 bytes each); least recently used pools go first
+QUESTION_POOL_MAX_IDS = int(os.getenv("QUESTION_POOL_MAX_IDS", "4000000"))
+QUESTION_ROW_CACHE_SIZE = int(os.getenv("QUESTION_ROW_CACHE_SIZE", "20000"))
+# Widen topic filters with semantically close topics and questions from the vector index
+SEMANTIC_TOPICS = os.getenv("SEMANTIC_TOPICS", "1") != "0"
+
+
+class QuestionPoolCache:
+    """
+    In-process cache behind /create-practice-exam/: the course list, course
+    name matches, candidate-id pools per (courses, topics, balance_topics)
+    and the rows of questions already served. Pools hold every candidate
+    id, so they are bounded by count and by QUESTION_POOL_MAX_IDS in total.
+    Shapes whose pool would not fit that budget (counted in SQLite first),
+    and shapes whose pool would not be kept, are sampled in SQLite by
+    sample_questions() instead, which reads about twice the exam size.
+
+    Writers call invalidate() with the courses they added questions to:
+    only pools involving those courses are dropped, and the course lists
+    only when a course is new. invalidate() without courses (deletes)
+    drops everything. Pools built while an invalidation ran are not kept.
+    Topic shapes requested while a vector index fit is pending are sampled
+    in SQLite with substring matches only, and get their pool afterwards.
+
+    Writes from other processes (the desktop app, the ingest and dedupe
+    CLIs) are caught by comparing the bank-wide `course_versions` counter on
+    every lookup: courses written since the last look lose their pools and
+    cached rows.
+    """
+
+    def __init__(
+        self, max_pools: int = QUESTION_POOL_CACHE_SIZE, max_rows: int = QUESTION_ROW_CACHE_SIZE,
+        max_ids: int = QUESTION_POOL_MAX_IDS,
+    ):
+        self.max_pools = max_pools
+        self.max_ids = max_ids
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._version = None
+        self._courses = None
+        self._matches = {}
+        self._pools = OrderedDict()
+        # Shapes known to be over the id budget, so they skip the count
+        self._oversized = OrderedDict()
+        self._rows = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.sql_samples = 0
+        self.invalidations = 0
+
+    # --- changes made elsewhere ---
+
+    def _sync(self, conn):
+        version = conn.execute("SELECT COALESCE(MAX(version), 0) FROM course_versions").fetchone()[0]
+        with self._lock:
+            seen = self._version
+            if seen is not None and version <= seen:
+                return
+            self._version = version
+        if seen is None:
+            return  # nothing cached yet that could predate the first look
+
+        changed = {row[0] for row in conn.execute(
+            "SELECT course FROM course_versions WHERE version > ? AND version <= ?", (seen, version)
+        )}
+        # The row cache may hold edited or deleted questions of those courses
+        self.invalidate(changed, rows=True)
+
+    # --- course names ---
+
+    def courses(self, conn) -> List[str]:
+        self._sync(conn)
+        with self._lock:
+            if self._courses is not None:
+                return self._courses
+            generation = self._generation
+        with metrics.DB_QUERY_SECONDS.time(query="courses"):
+            courses = [row["course"] for row in conn.execute("SELECT course FROM course_index ORDER BY course")]
+        with self._lock:
+            if generation == self._generation:
+                self._courses = courses
+        return courses
+
+    def match_courses(self, conn, pattern: str) -> List[str]:
+        """Courses whose name contains pattern, with SQLite LIKE semantics."""
+        self._sync(conn)
+        with self._lock:
+            if pattern in self._matches:
+                return self._matches[pattern]
+            generation = self._generation
+        with metrics.DB_QUERY_SECONDS.time(query="match_courses"):
+            matched = [row["course"] for row in conn.execute(
+                "SELECT course FROM course_index WHERE course LIKE ?", (f"%{pattern}%",)
+            )]
+        with self._lock:
+            if generation == self._generation:
+                self._matches[pattern] = matched
+        return matched
+
+    # --- pools and rows ---
+
+    def pool(
+        self, conn, courses: List[str], topics: Optional[List[str]], balance_topics: bool
+    ) -> Tuple[Optional[QuestionPool], Optional[Dict[str, dict]]]:
+        """
+        The cached (or newly built and cached) pool of a request shape, and
+        the semantic matches it was built with. The pool is None when it
+        would be over the id budget or could not be kept; sample those in SQL.
+        """
+        self._sync(conn)
+        key = (tuple(sorted(courses)), tuple(topics or ()), bool(balance_topics))
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is not None:
+                self._pools.move_to_end(key)
+                self.hits += 1
+                return pool, None
+            self.misses += 1
+            generation = self._generation
+            oversized = key in self._oversized
+
+        related = None
+        if topics and SEMANTIC_TOPICS:
+            related = get_vector_index().related(conn, courses, topics)
+        # Without semantic matches yet (fit pending) the pool would not be kept
+        if oversized or (related is None and topics and SEMANTIC_TOPICS):
+            return None, related
+
+        with metrics.DB_QUERY_SECONDS.time(query="pool_size"):
+            size = pool_size(conn, courses, topics, balance_topics, related)
+        if size > self.max_ids:
+            with self._lock:
+                if generation == self._generation:
+                    self._oversized[key] = True
+                    while len(self._oversized) > self.max_pools:
+                        self._oversized.popitem(last=False)
+            return None, related
+
+        with metrics.DB_QUERY_SECONDS.time(query="pool"):
+            pool = build_pool(conn, courses, topics, balance_topics, related)
+        with self._lock:
+            if generation == self._generation and pool.stored_ids <= self.max_ids:
+                self._pools[key] = pool
+                pooled_ids = sum(p.stored_ids for p in self._pools.values())
+                while len(self._pools) > self.max_pools or pooled_ids > self.max_ids:
+                    pooled_ids -= self._pools.popitem(last=False)[1].stored_ids
+        return pool, related
+
+    def rows(self, conn, ids: List[int]) -> Dict[int, dict]:
+        self._sync(conn)
+        with self._lock:
+            found = {i: self._rows[i] for i in ids if i in self._rows}
+            for i in found:
+                self._rows.move_to_end(i)
+        missing = [i for i in ids if i not in found]
+        if missing:
+            with metrics.DB_QUERY_SECONDS.time(query="rows"):
+                fetched = fetch_question_rows(conn, missing)
+            found.update(fetched)
+            with self._lock:
+                self._rows.update(fetched)
+                while len(self._rows) > self.max_rows:
+                    self._rows.popitem(last=False)
+        return found
+
+    def sample(
+        self, conn, courses: List[str], num_questions: int, topics: Optional[List[str]] = None,
+        difficulty_mix: Optional[Dict[str, float]] = None, balance_topics: bool = False,
+    ) -> List[dict]:
+        """sample_from_pool() over the cached pool and rows, or sample_questions() when there is no pool."""
+        if not courses or num_questions <= 0:
+            return []
+        pool, related = self.pool(conn, courses, topics, balance_topics)
+        if pool is None:
+            with self._lock:
+                self.sql_samples += 1
+            with metrics.DB_QUERY_SECONDS.time(query="sample"):
+                return sample_questions(
+                    conn, courses, num_questions, topics, difficulty_mix, balance_topics, related
+                )
+        return sample_from_pool(conn, pool, num_questions, difficulty_mix, lambda ids: self.rows(conn, ids))
+
+    # --- invalidation ---
+
+    def invalidate(self, courses: Optional[Iterable[str]] = None, rows: bool = False):
+        """Drop what depends on courses (everything if None); rows=True also drops their cached rows."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if courses is None:
+                self._courses = None
+                self._matches.clear()
+                self._pools.clear()
+                self._oversized.clear()
+                self._rows.clear()
+                return
+
+            courses = set(courses)
+            # Name matches can only change when a course appears (or is not known yet)
+            if self._courses is None or not courses <= set(self._courses):
+                self._courses = None
+                self._matches.clear()
+            for cached in (self._pools, self._oversized):
+                for key in [key for key in cached if courses.intersection(key[0])]:
+                    del cached[key]
+            if rows:
+                for question_id in [i for i, row in self._rows.items() if (row["course"] or "") in courses]:
+                    del self._rows[question_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "pools": len(self._pools),
+                "pooled_ids": sum(pool.stored_ids for pool in self._pools.values()),
+                "cached_rows": len(self._rows),
+                "max_pools": self.max_pools,
+                "max_pooled_ids": self.max_ids,
+                "max_rows": self.max_rows,
+                "oversized_shapes": len(self._oversized),
+                "hits": self.hits,
+                "misses": self.misses,
+                "sql_samples": self.sql_samples,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_cache = None
+
+
+def get_question_pools() -> QuestionPoolCache:
+    """Return the process-wide question pool cache."""
+    global _cache
+    if _cache is None:
+        _cache = QuestionPoolCache()
+    return _cache
@@ -0,0 +1,399 @@
+import json
+import math
+import random
+import re
+import sqlite3
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Label for questions whose difficulty is not named in a difficulty mix
+OTHER_DIFFICULTY = None
+
+
+def _fts_phrase(text: str) -> str:
+    # Quoted FTS5 phrase with a prefix match on its last word
+    return '"' + text.replace('"', '""') + '"*'
+
+
+def _placeholders(values: list) -> str:
+    return ", ".join("?" * len(values))
+
+
+def topic_id_subquery(
+    topics: List[str], courses: List[str], related: Optional[Dict[str, dict]] = None
+) -> Tuple[str, list]:
+    """
+    `SELECT question_id` subquery (and params) for questions in `courses`
+    tagged with a topic containing any of `topics`, or whose text/topics
+    contain the topic words according to the full-text index. `related`
+    (from VectorIndex.related()) adds, per topic, the semantically close
+    topic names and question ids.
+    """
+    queries = []
+    params = []
+    for topic in topics:
+        queries.append(f"""
+            SELECT qt.question_id FROM topic_index ti
+            JOIN question_topics qt ON qt.course = ti.course AND qt.topic = ti.topic
+            WHERE ti.course IN ({_placeholders(courses)}) AND ti.topic LIKE ?
+        """)
+        params.extend(courses + [f"%{topic}%"])
+
+        if re.search(r"\w", topic):
+            queries.append("SELECT rowid FROM questions_fts WHERE questions_fts MATCH ?")
+            params.append("{question_text topics} : " + _fts_phrase(topic))
+
+        close = (related or {}).get(topic)
+        if close and close["topics"]:
+            queries.append(f"""
+                SELECT question_id FROM question_topics
+                WHERE course IN ({_placeholders(courses)}) AND topic IN ({_placeholders(close["topics"])})
+            """)
+            params.extend(courses + close["topics"])
+        if close and close["ids"]:
+            queries.append("SELECT value FROM json_each(?)")
+            params.append(json.dumps(close["ids"]))
+    return " UNION ".join(queries), params
+
+
+def allocate(total: int, weights: Dict[object, float]) -> Dict[object, int]:
+    """
+    Split `total` items across keys proportionally to `weights` using the
+    largest-remainder method (ties broken randomly so small quotas rotate).
+    """
+    weight_sum = sum(weights.values())
+    if total <= 0 or weight_sum <= 0:
+        return {key: 0 for key in weights}
+
+    exact = {key: total * w / weight_sum for key, w in weights.items()}
+    counts = {key: math.floor(value) for key, value in exact.items()}
+
+    keys = list(weights)
+    random.shuffle(keys)
+    keys.sort(key=lambda k: exact[k] - counts[k], reverse=True)
+    for key in keys[: total - sum(counts.values())]:
+        counts[key] += 1
+    return counts
+
+
+def _difficulty_weights(difficulty_mix: Optional[Dict[str, float]]) -> Dict[Optional[str], float]:
+    if not difficulty_mix:
+        return {OTHER_DIFFICULTY: 1.0}
+
+    weights = {}
+    for difficulty, share in difficulty_mix.items():
+        if share < 0:
+            raise ValueError(f"Difficulty share for '{difficulty}' must not be negative")
+        weights[difficulty.strip().lower()] = share
+
+    specified = sum(weights.values())
+    if specified > 1.0 + 1e-9:
+        raise ValueError("Difficulty shares must add up to at most 1.0")
+    if specified < 1.0 - 1e-9:
+        weights[OTHER_DIFFICULTY] = 1.0 - specified
+    return weights
+
+
+def _base_filter(
+    courses: List[str], topics: Optional[List[str]], related: Optional[Dict[str, dict]] = None
+) -> Tuple[str, list]:
+    base_where = f"q.course IN ({_placeholders(courses)})"
+    base_params = list(courses)
+    if topics:
+        topic_sql, topic_params = topic_id_subquery(topics, courses, related)
+        base_where += f" AND q.id IN ({topic_sql})"
+        base_params += topic_params
+    return base_where, base_params
+
+
+def sample_questions(
+    conn: sqlite3.Connection,
+    courses: List[str],
+    num_questions: int,
+    topics: Optional[List[str]] = None,
+    difficulty_mix: Optional[Dict[str, float]] = None,
+    balance_topics: bool = False,
+    related: Optional[Dict[str, dict]] = None,
+) -> List[dict]:
+    """
+    Pick `num_questions` random questions from `courses` inside SQLite.
+
+    The exam is split into strata (topic x difficulty) with quotas from
+    `difficulty_mix` (e.g. {"hard": 0.3}) and, when `balance_topics` is set,
+    equal shares per topic. Every stratum is one `ORDER BY random() LIMIT k`
+    branch of a single UNION ALL query, so SQLite only keeps k rows per branch
+    and Python never sees more than about twice the exam size. A final branch
+    draws from the whole candidate set to fill strata that come up short.
+    `related` widens each topic as in topic_id_subquery().
+    """
+    if not courses or num_questions <= 0:
+        return []
+
+    base_where, base_params = _base_filter(courses, topics, related)
+
+    # Topic strata: each requested topic, or every topic of the course(s)
+    topic_strata = {None: ("", [])}
+    if balance_topics:
+        if topics:
+            topic_strata = {
+                topic: (f" AND q.id IN ({sql})", params)
+                for topic in topics
+                for sql, params in [topic_id_subquery([topic], courses, related)]
+            }
+        else:
+            course_topics = [row[0] for row in conn.execute(
+                f"SELECT DISTINCT topic FROM topic_index WHERE course IN ({_placeholders(courses)})",
+                courses,
+            )]
+            if course_topics:
+                topic_strata = {
+                    topic: (
+                        f""" AND q.id IN (
+                            SELECT question_id FROM question_topics
+                            WHERE course IN ({_placeholders(courses)}) AND topic = ?
+                        )""",
+                        courses + [topic],
+                    )
+                    for topic in course_topics
+                }
+
+    difficulty_weights = _difficulty_weights(difficulty_mix)
+    named_difficulties = [d for d in difficulty_weights if d is not OTHER_DIFFICULTY]
+
+    weights = {
+        (topic, difficulty): share / len(topic_strata)
+        for topic in topic_strata
+        for difficulty, share in difficulty_weights.items()
+    }
+    quotas = allocate(num_questions, weights)
+
+    branches = []
+    params = []
+    for (topic, difficulty), quota in quotas.items():
+        if quota <= 0:
+            continue
+        topic_sql, topic_params = topic_strata[topic]
+        where = base_where + topic_sql
+        stratum_params = base_params + topic_params
+
+        if difficulty is not OTHER_DIFFICULTY:
+            where += " AND LOWER(TRIM(q.difficulty)) = ?"
+            stratum_params.append(difficulty)
+        elif named_difficulties:
+            where += f" AND LOWER(TRIM(COALESCE(q.difficulty, ''))) NOT IN ({_placeholders(named_difficulties)})"
+            stratum_params += named_difficulties
+
+        branches.append(
+            f"SELECT * FROM (SELECT q.*, 0 AS _fill FROM questions q WHERE {where} ORDER BY random() LIMIT ?)"
+        )
+        params += stratum_params + [quota]
+
+    # Fill branch for strata with too few candidates
+    branches.append(
+        f"SELECT * FROM (SELECT q.*, 1 AS _fill FROM questions q WHERE {base_where} ORDER BY random() LIMIT ?)"
+    )
+    params += base_params + [num_questions]
+
+    rows = conn.execute(" UNION ALL ".join(branches), params).fetchall()
+
+    # Stratum picks first, then fill rows; skip repeats (a question can match
+    # several topics, and the same text can exist under several courses)
+    selected = []
+    seen_ids = set()
+    seen_texts = set()
+    for row in sorted(rows, key=lambda r: r["_fill"]):
+        if len(selected) >= num_questions:
+            break
+        if row["id"] in seen_ids or row["question_text"] in seen_texts:
+            continue
+        seen_ids.add(row["id"])
+        seen_texts.add(row["question_text"])
+        question = dict(row)
+        del question["_fill"]
+        selected.append(question)
+
+    random.shuffle(selected)
+    return selected
+
+
+# --- In-memory sampling over precomputed candidate pools ---
+
+# Difficulty as compared by sample_questions: lowercased, trimmed, '' for NULL
+_DIFFICULTY_SQL = "LOWER(TRIM(COALESCE(q.difficulty, '')))"
+
+
+class QuestionPool:
+    """
+    Candidate question ids for one (courses, topics, balance_topics) request
+    shape: `everything` maps normalized difficulty to ids, and `strata` does
+    the same per topic stratum (a single None stratum when not balancing).
+    """
+
+    def __init__(self, everything: Dict[str, array], strata: Dict[Optional[str], Dict[str, array]]):
+        self.everything = everything
+        self.strata = strata
+
+    @property
+    def size(self) -> int:
+        return sum(len(ids) for ids in self.everything.values())
+
+    @property
+    def stored_ids(self) -> int:
+        held = self.size
+        if list(self.strata) != [None]:
+            held += sum(len(ids) for groups in self.strata.values() for ids in groups.values())
+        return held
+
+
+def _group_by_difficulty(rows) -> Dict[str, array]:
+    groups = {}
+    for question_id, difficulty in rows:
+        groups.setdefault(difficulty, array("q")).append(question_id)
+    return groups
+
+
+def build_pool(
+    conn: sqlite3.Connection,
+    courses: List[str],
+    topics: Optional[List[str]] = None,
+    balance_topics: bool = False,
+    related: Optional[Dict[str, dict]] = None,
+) -> QuestionPool:
+    """
+    Every candidate question of `courses` (limited to `topics` if given) as
+    ids grouped by difficulty, plus the same per topic stratum when
+    `balance_topics` is set. `related` widens each topic as in
+    topic_id_subquery(). The whole candidate set is materialized (8 bytes
+    per id per stratum), so check pool_size() first on large banks.
+    """
+    base_where, base_params = _base_filter(courses, topics, related)
+    everything = _group_by_difficulty(conn.execute(
+        f"SELECT q.id, {_DIFFICULTY_SQL} FROM questions q WHERE {base_where}", base_params
+    ))
+
+    strata = {None: everything}
+    if balance_topics and topics:
+        strata = {}
+        for topic in topics:
+            topic_sql, topic_params = topic_id_subquery([topic], courses, related)
+            strata[topic] = _group_by_difficulty(conn.execute(
+                f"SELECT q.id, {_DIFFICULTY_SQL} FROM questions q WHERE {base_where} AND q.id IN ({topic_sql})",
+                base_params + topic_params,
+            ))
+    elif balance_topics:
+        by_topic = {}
+        for topic, question_id, difficulty in conn.execute(f"""
+            SELECT qt.topic, q.id, {_DIFFICULTY_SQL}
+            FROM question_topics qt JOIN questions q ON q.id = qt.question_id
+            WHERE qt.course IN ({_placeholders(courses)})
+        """, courses):
+            by_topic.setdefault(topic, []).append((question_id, difficulty))
+        if by_topic:
+            strata = {topic: _group_by_difficulty(rows) for topic, rows in by_topic.items()}
+    return QuestionPool(everything, strata)
+
+
+def pool_size(
+    conn: sqlite3.Connection,
+    courses: List[str],
+    topics: Optional[List[str]] = None,
+    balance_topics: bool = False,
+    related: Optional[Dict[str, dict]] = None,
+) -> int:
+    """QuestionPool.stored_ids of the pool build_pool() would return, counted in SQLite."""
+    base_where, base_params = _base_filter(courses, topics, related)
+    size = conn.execute(f"SELECT COUNT(*) FROM questions q WHERE {base_where}", base_params).fetchone()[0]
+
+    if balance_topics and topics:
+        for topic in topics:
+            topic_sql, topic_params = topic_id_subquery([topic], courses, related)
+            size += conn.execute(
+                f"SELECT COUNT(*) FROM questions q WHERE {base_where} AND q.id IN ({topic_sql})",
+                base_params + topic_params,
+            ).fetchone()[0]
+    elif balance_topics:
+        size += conn.execute(f"""
+            SELECT COUNT(*) FROM question_topics qt JOIN questions q ON q.id = qt.question_id
+            WHERE qt.course IN ({_placeholders(courses)})
+        """, courses).fetchone()[0]
+    return size
+
+
+def _sample_ids(groups: Dict[str, array], difficulty, named: List[str], k: int) -> List[int]:
+    # k distinct ids from the difficulty groups a stratum draws on, without
+    # concatenating them: sample positions, then map each to its group
+    if difficulty is not OTHER_DIFFICULTY:
+        lists = [groups.get(difficulty, ())]
+    else:
+        lists = [ids for d, ids in groups.items() if d not in named]
+    ends = list(accumulate(len(ids) for ids in lists))
+    total = ends[-1] if ends else 0
+
+    picked = []
+    for position in random.sample(range(total), min(k, total)):
+        index = bisect_right(ends, position)
+        start = ends[index - 1] if index else 0
+        picked.append(lists[index][position - start])
+    return picked
+
+
+def fetch_question_rows(conn: sqlite3.Connection, ids: List[int]) -> Dict[int, dict]:
+    rows = conn.execute(f"SELECT * FROM questions WHERE id IN ({_placeholders(ids)})", ids)
+    return {row["id"]: dict(row) for row in rows}
+
+
+def sample_from_pool(
+    conn: sqlite3.Connection,
+    pool: QuestionPool,
+    num_questions: int,
+    difficulty_mix: Optional[Dict[str, float]] = None,
+    fetch_rows: Optional[Callable[[List[int]], Dict[int, dict]]] = None,
+) -> List[dict]:
+    """
+    Same strata, quotas and fill as sample_questions, drawn from a prebuilt
+    pool in memory. Only the picked rows are read: by `fetch_rows(ids)` if
+    given (e.g. from a row cache), otherwise from `conn`.
+    """
+    if num_questions <= 0:
+        return []
+
+    difficulty_weights = _difficulty_weights(difficulty_mix)
+    named_difficulties = [d for d in difficulty_weights if d is not OTHER_DIFFICULTY]
+
+    weights = {
+        (topic, difficulty): share / len(pool.strata)
+        for topic in pool.strata
+        for difficulty, share in difficulty_weights.items()
+    }
+    quotas = allocate(num_questions, weights)
+
+    # Stratum picks first, then the fill set for strata that came up short
+    picks = []
+    for (topic, difficulty), quota in quotas.items():
+        if quota > 0:
+            picks += _sample_ids(pool.strata[topic], difficulty, named_difficulties, quota)
+    picks += _sample_ids(pool.everything, OTHER_DIFFICULTY, [], num_questions)
+    picks = list(dict.fromkeys(picks))
+    if not picks:
+        return []
+
+    if fetch_rows is None:
+        rows_by_id = fetch_question_rows(conn, picks)
+    else:
+        rows_by_id = fetch_rows(picks)
+
+    selected = []
+    seen_texts = set()
+    for question_id in picks:
+        if len(selected) >= num_questions:
+            break
+        row = rows_by_id.get(question_id)
+        if row is None or row["question_text"] in seen_texts:
+            continue
+        seen_texts.add(row["question_text"])
+        selected.append(dict(row))
+
+    random.shuffle(selected)
+    return selected
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+from . import database, metrics
+
+# Point SERPAPI_URL at a local stand-in server for tests and benchmarks
+SERPAPI_URL = os.getenv("SERPAPI_URL", "https://serpapi.com/search")
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "20"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+
+class SearchError(Exception):
+    """A search backend returned an error for a query."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class SerpAPIBackend:
+    """
+    SerpAPI (or anything speaking its JSON shape) over a pooled async client.
+    `search` returns the raw `organic_results` list for a query.
+    """
+
+    name = "serpapi"
+
+    def __init__(self, api_key: str = None, base_url: str = SERPAPI_URL, timeout: float = SEARCH_TIMEOUT):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self._client = None
+        self._loop = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def search(self, query: str) -> list:
+        # Checked per call rather than at import so the backend starts without a key
+        if not self.api_key:
+            raise SearchError(500, "SERPAPI_API_KEY not found in environment variables!")
+        params = {
+            "q": query,
+            "api_key": self.api_key,
+            "engine": "google"
+        }
+        try:
+            response = await self._get_client().get(self.base_url, params=params)
+        except httpx.HTTPError as e:
+            raise SearchError(502, f"Error fetching results for '{query}': {e}")
+
+        if response.status_code != 200:
+            raise SearchError(response.status_code, f"Error fetching results for '{query}'")
+
+        return response.json().get("organic_results", [])
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+
+class SearchResultCache:
+    """Persistent per-query result cache in the `search_cache` table."""
+
+    def __init__(self, ttl_seconds: float = SEARCH_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, backend: str, query: str):
+        """Return the cached results list, or None if missing or expired."""
+        with database.connection() as conn:
+            row = conn.execute(
+                "SELECT results, created_at FROM search_cache WHERE backend = ? AND query = ?",
+                (backend, query),
+            ).fetchone()
+
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, backend: str, query: str, results: list):
+        now = time.time()
+        with database.transaction() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO search_cache (backend, query, results, created_at)
+                VALUES (?, ?, ?, ?)
+            """, (backend, query, json.dumps(results), now))
+            conn.execute("DELETE FROM search_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+
+
+_backend = None
+_cache = None
+# Backend calls in progress, shared by concurrent callers with the same query
+_inflight = {}
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        _backend = SerpAPIBackend(api_key=os.getenv("SERPAPI_API_KEY"))
+    return _backend
+
+
+def set_search_backend(backend):
+    """
+    Swap the search backend (any object with a `name` attribute and an
+    async `search(query) -> list` method), e.g. for a local stand-in.
+    """
+    global _backend
+    _backend = backend
+
+
+def get_search_cache() -> SearchResultCache:
+    global _cache
+    if _cache is None:
+        _cache = SearchResultCache()
+    return _cache
+
+
+async def cached_search(query: str, use_cache: bool = True) -> list:
+    """Run one query through the active backend, consulting the result cache first."""
+    backend = get_search_backend()
+    cache = get_search_cache()
+
+    if use_cache:
+        cached = await asyncio.to_thread(cache.get, backend.name, query)
+        metrics.SEARCH_CACHE_LOOKUPS.inc(backend=backend.name, result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+
+    key = (backend.name, query)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_search_and_store(backend, cache, query))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def _search_and_store(backend, cache: SearchResultCache, query: str) -> list:
+    with metrics.span("search.query", backend=backend.name, query=query):
+        results = await backend.search(query)
+    await asyncio.to_thread(cache.put, backend.name, query, results)
+    return results
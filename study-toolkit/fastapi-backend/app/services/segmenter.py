@@ -0,0 +1,159 @@
+import os
+import re
+from collections import Counter
+from typing import List, Optional
+
+# Set QUESTION_SEGMENTER=off to send whole exams to Gemini for extraction
+QUESTION_SEGMENTER = os.getenv("QUESTION_SEGMENTER", "on").lower() not in ("0", "off", "false", "no")
+
+# Spans outside these lengths are not trusted as single questions
+MIN_SPAN_CHARS = 15
+MAX_SPAN_CHARS = int(os.getenv("SEGMENTER_MAX_SPAN_CHARS", "1500"))
+# A document segments cleanly if it has this many questions, mostly numbered
+# in sequence, and they cover most of its text
+MIN_QUESTIONS = 3
+MIN_SEQUENTIAL_FRACTION = 0.7
+MIN_COVERAGE = 0.5
+
+# Start of a numbered question: "1.", "12)", "Q3", "Q3.", "Question 3:", "Problem 3"
+QUESTION_NUMBER = re.compile(
+    r"^[ \t]*(?:(?:Q|Question|Problem|Exercise)\s*(\d{1,3})\s*[.):]?|(\d{1,3})\s*[.)])(?=\s|$)",
+    re.IGNORECASE,
+)
+# Point markers: "[5 marks]", "(10 points)", "[4 pts]", "6 marks"
+POINTS = re.compile(
+    r"[\[(]\s*(\d{1,3})\s*(?:marks?|points?|pts?)\s*[\])]|\b(\d{1,3})\s*(?:marks|points)\b",
+    re.IGNORECASE,
+)
+# Lines holding only a page number: "3", "- 3 -", "Page 3", "Page 3 of 10", "3/10"
+PAGE_NUMBER_LINE = re.compile(
+    r"^\s*(?:page\s*)?-?\s*\d{1,4}\s*-?(?:\s*(?:of|/)\s*\d{1,4})?\s*$",
+    re.IGNORECASE,
+)
+# How many non-blank lines at each end of a page may be a header or footer
+EDGE_LINES = 2
+
+
+def _line_signature(line: str) -> str:
+    # Page numbers and dates vary between pages; the rest of a header does not
+    return re.sub(r"\d+", "#", " ".join(line.lower().split()))
+
+
+def strip_headers_footers(pages: List[str]) -> List[str]:
+    """
+    Drop bare page numbers and lines repeated (digits ignored) at the top or
+    bottom of at least half the pages, from each page's edge lines only.
+    """
+    split = [page.splitlines() for page in pages]
+    edges = []
+    for lines in split:
+        nonblank = [i for i, line in enumerate(lines) if line.strip()]
+        edges.append(set(nonblank[:EDGE_LINES] + nonblank[-EDGE_LINES:]))
+
+    repeated = set()
+    if len(pages) >= 3:
+        counts = Counter()
+        for lines, edge in zip(split, edges):
+            counts.update({_line_signature(lines[i]) for i in edge})
+        repeated = {sig for sig, n in counts.items() if n >= max(3, len(pages) // 2)}
+
+    cleaned = []
+    for lines, edge in zip(split, edges):
+        cleaned.append("\n".join(
+            line for i, line in enumerate(lines)
+            if i not in edge or not (PAGE_NUMBER_LINE.match(line) or _line_signature(line) in repeated)
+        ))
+    return cleaned
+
+
+def _question_number(line: str, labelled_only: bool) -> Optional[int]:
+    match = QUESTION_NUMBER.match(line)
+    if not match or (labelled_only and match.group(1) is None):
+        return None
+    return int(match.group(1) or match.group(2))
+
+
+def _starts_question(previous: Optional[int], number: int) -> bool:
+    # Accept the next number (or a small skip) or a restart at 1 for a new
+    # section; anything else is a numbered list inside the current question
+    if previous is None:
+        return number <= 5
+    return number == 1 or previous < number <= previous + 3
+
+
+def _clean(text: str) -> str:
+    return " ".join(QUESTION_NUMBER.sub("", text, count=1).split())
+
+
+def _points(text: str) -> Optional[int]:
+    match = POINTS.search(text)
+    return int(match.group(1) or match.group(2)) if match else None
+
+
+def segment_pages(pages: List[str]) -> dict:
+    """
+    Deterministically split an exam's page texts into candidate question
+    spans. Returns {"spans", "confident", "sequential_fraction", "coverage"};
+    each span is {"id", "number", "text", "first_page", "last_page",
+    "points", "ambiguous"}, where ambiguous spans are too short or too long
+    to trust as one question. An unconfident result should be read whole.
+    """
+    pages = strip_headers_footers(pages)
+    lines = [
+        (page_number, line)
+        for page_number, page in enumerate(pages, 1)
+        for line in page.splitlines() if line.strip()
+    ]
+    # Exams that label questions ("Q3", "Question 3") use bare numbers for
+    # instructions and sub-steps, so only labelled lines start questions there
+    labelled = sum(1 for _, line in lines if (m := QUESTION_NUMBER.match(line)) and m.group(1) is not None)
+    labelled_only = labelled >= MIN_QUESTIONS
+
+    raw_spans = []
+    current = None
+    total_chars = 0
+    for page_number, line in lines:
+        total_chars += len(line.strip())
+        number = _question_number(line, labelled_only)
+        indent = len(line) - len(line.lstrip())
+        # A numbered line indented deeper than the current question is one of its sub-steps
+        nested = current is not None and indent > current["indent"]
+        if number is not None and not nested and _starts_question(current and current["number"], number):
+            current = {
+                "number": number, "indent": indent, "lines": [line],
+                "first_page": page_number, "last_page": page_number,
+            }
+            raw_spans.append(current)
+        elif current is not None:
+            current["lines"].append(line)
+            current["last_page"] = page_number
+
+    spans = []
+    for i, raw in enumerate(raw_spans):
+        text = _clean("\n".join(raw["lines"]))
+        spans.append({
+            "id": i + 1,
+            "number": raw["number"],
+            "text": text,
+            "first_page": raw["first_page"],
+            "last_page": raw["last_page"],
+            "points": _points(text),
+            "ambiguous": not MIN_SPAN_CHARS <= len(text) <= MAX_SPAN_CHARS,
+        })
+
+    transitions = list(zip(spans, spans[1:]))
+    sequential = sum(b["number"] == a["number"] + 1 for a, b in transitions)
+    sequential_fraction = sequential / len(transitions) if transitions else 0.0
+    covered = sum(len(span["text"]) for span in spans)
+    coverage = covered / total_chars if total_chars else 0.0
+
+    return {
+        "spans": spans,
+        "confident": (
+            len(spans) >= MIN_QUESTIONS
+            and sequential_fraction >= MIN_SEQUENTIAL_FRACTION
+            and coverage >= MIN_COVERAGE
+        ),
+        "sequential_fraction": round(sequential_fraction, 3),
+        "coverage": round(coverage, 3),
+    }
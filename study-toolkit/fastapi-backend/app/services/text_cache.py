@@ -0,0 +1,151 @@
+import hashlib
+import os
+import sqlite3
+import time
+import zlib
+from typing import List, Tuple
+
+from . import database
+
+PDF_TEXT_CACHE_MAX_BYTES = int(os.getenv("PDF_TEXT_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PDFTextCache:
+    """
+    Per-page extracted text, zlib-compressed, keyed by the SHA-256 of the PDF.
+
+    A document may be cached partially (when extraction stopped at a character
+    budget); `complete` records whether every page has been stored. Once the
+    compressed text exceeds `max_bytes`, least recently used documents are
+    evicted.
+    """
+
+    def __init__(self, max_bytes: int = PDF_TEXT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_pages(self, sha256: str) -> Tuple[List[str], bool]:
+        """Return (cached pages in order, whether the document is complete)."""
+        with database.connection() as conn:
+            doc = conn.execute(
+                "SELECT complete FROM pdf_text_documents WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+            if doc is None:
+                return [], False
+
+            rows = conn.execute(
+                "SELECT text FROM pdf_text_pages WHERE sha256 = ? ORDER BY page_no",
+                (sha256,),
+            ).fetchall()
+            conn.execute(
+                "UPDATE pdf_text_documents SET last_accessed = ? WHERE sha256 = ?",
+                (time.time(), sha256),
+            )
+
+        pages = [zlib.decompress(row[0]).decode("utf-8") for row in rows]
+        return pages, bool(doc[0])
+
+    def put_pages(self, sha256: str, start_page: int, pages: List[str], complete: bool):
+        """Store pages[i] as page start_page + i and update the document row."""
+        now = time.time()
+        encoded = [page.encode("utf-8") for page in pages]
+        compressed = [zlib.compress(data) for data in encoded]
+
+        with database.transaction() as conn:
+            conn.execute("""
+                INSERT OR IGNORE INTO pdf_text_documents (sha256, created_at, last_accessed)
+                VALUES (?, ?, ?)
+            """, (sha256, now, now))
+            conn.executemany("""
+                INSERT OR REPLACE INTO pdf_text_pages (sha256, page_no, text)
+                VALUES (?, ?, ?)
+            """, [(sha256, start_page + i, blob) for i, blob in enumerate(compressed)])
+            conn.execute("""
+                UPDATE pdf_text_documents SET
+                    page_count = MAX(page_count, ?),
+                    complete = MAX(complete, ?),
+                    raw_bytes = raw_bytes + ?,
+                    compressed_bytes = compressed_bytes + ?,
+                    last_accessed = ?
+                WHERE sha256 = ?
+            """, (
+                start_page + len(pages),
+                int(complete),
+                sum(len(data) for data in encoded),
+                sum(len(blob) for blob in compressed),
+                now,
+                sha256,
+            ))
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        victims = [row[0] for row in conn.execute("""
+            SELECT sha256 FROM (
+                SELECT sha256, SUM(compressed_bytes) OVER (
+                    ORDER BY last_accessed DESC, sha256
+                ) AS running_bytes
+                FROM pdf_text_documents
+            )
+            WHERE running_bytes > ?
+        """, (self.max_bytes,))]
+
+        for sha256 in victims:
+            conn.execute("DELETE FROM pdf_text_pages WHERE sha256 = ?", (sha256,))
+            conn.execute("DELETE FROM pdf_text_documents WHERE sha256 = ?", (sha256,))
+        self.evictions += len(victims)
+
+    def record_lookup(self, parsed_pages: int, cached_pages: int):
+        if parsed_pages == 0:
+            self.hits += 1
+        elif cached_pages:
+            self.partial_hits += 1
+        else:
+            self.misses += 1
+
+    def stats(self) -> dict:
+        with database.connection() as conn:
+            documents, complete, raw_bytes, compressed_bytes = conn.execute("""
+                SELECT COUNT(*), COALESCE(SUM(complete), 0),
+                       COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(compressed_bytes), 0)
+                FROM pdf_text_documents
+            """).fetchone()
+            pages = conn.execute("SELECT COUNT(*) FROM pdf_text_pages").fetchone()[0]
+
+        lookups = self.hits + self.partial_hits + self.misses
+        return {
+            "documents": documents,
+            "complete_documents": complete,
+            "pages": pages,
+            "raw_bytes": raw_bytes,
+            "compressed_bytes": compressed_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_cache = None
+
+
+def get_text_cache() -> PDFTextCache:
+    """Return the process-wide extracted-text cache."""
+    global _cache
+    if _cache is None:
+        _cache = PDFTextCache()
+    return _cache
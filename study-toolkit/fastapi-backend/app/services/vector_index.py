@@ -0,0 +1,412 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import database
+
+# Where the fitted projection, question vectors and their ids are kept (one directory per bank)
+VECTOR_INDEX_DIR = Path(os.getenv("VECTOR_INDEX_DIR", str(database.DB_PATH.with_suffix(".vectors"))))
+# Hashed character n-gram features, and the dimensions SVD reduces them to
+VECTOR_HASH_FEATURES = 2 ** 16
+VECTOR_DIMENSIONS = int(os.getenv("VECTOR_DIMENSIONS", "64"))
+# Questions the projection is fitted on (a random sample), and the fewest worth fitting on
+VECTOR_FIT_SAMPLE = int(os.getenv("VECTOR_FIT_SAMPLE", "20000"))
+VECTOR_MIN_DOCS = 100
+# Most new questions embedded while answering a request; warm-up catches up the rest
+VECTOR_INLINE_REFRESH = int(os.getenv("VECTOR_INLINE_REFRESH", "2000"))
+# Nearest neighbours kept per requested topic, and the cosine similarity they need
+SEMANTIC_TOPIC_K = int(os.getenv("SEMANTIC_TOPIC_K", "200"))
+SEMANTIC_TOPIC_MIN_SCORE = float(os.getenv("SEMANTIC_TOPIC_MIN_SCORE", "0.7"))
+
+REFRESH_BATCH_SIZE = 5000
+TOPIC_VECTOR_CACHE_SIZE = 10000
+
+
+def _document(topics: Optional[str], question_text: str) -> str:
+    return f"{topics or ''}\n{question_text}"
+
+
+def nearest(matrix: np.ndarray, query: np.ndarray, k: int, min_score: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions and scores of the (at most) k rows of matrix closest to query, best first."""
+    if len(matrix) == 0 or k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    scores = matrix @ query
+    if k < len(scores):
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    top = top[scores[top] >= min_score]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return top, scores[top]
+
+
+class VectorIndex:
+    """
+    Dense vectors of every question for semantic topic retrieval, on CPU
+    with no external service.
+
+    Questions ("topics\\nquestion text") are turned into hashed character
+    n-gram TF-IDF rows and projected by a truncated SVD fitted once on a
+    sample of the bank, giving L2-normalized float32 vectors where
+    "Eigenvalues" lands near "Eigen decomposition". The vectors are appended
+    to a flat file read back as a memory map, next to the ids they belong to
+    (ascending, so ids map to rows by binary search). Like the keyword model,
+    the index catches up with questions inserted since the last refresh by
+    id; deleted questions keep their row but are never candidates. Refitting
+    (rebuild(), or load() once the bank has far outgrown the fit sample)
+    re-embeds everything.
+    """
+
+    def __init__(self, directory: Path = VECTOR_INDEX_DIR):
+        self.directory = Path(directory)
+        self._lock = threading.RLock()
+        self._hasher = None
+        self._idf = None
+        self._projection = None
+        self.dim = 0
+        self.fit_docs = 0
+        self.fit_id = None
+        self.n_rows = 0
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._topic_vectors = OrderedDict()
+        self._opened = False
+        self._loader = None
+        self._load_failed = False
+
+    @property
+    def hasher(self):
+        if self._hasher is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+            self._hasher = HashingVectorizer(
+                analyzer="char_wb", ngram_range=(3, 5), n_features=VECTOR_HASH_FEATURES,
+                alternate_sign=False, norm=None, dtype=np.float32,
+            )
+        return self._hasher
+
+    @property
+    def ready(self) -> bool:
+        return self._projection is not None
+
+    @property
+    def last_question_id(self) -> int:
+        return int(self._ids[-1]) if self.n_rows else 0
+
+    # --- files ---
+
+    # Every fit writes its own vectors, ids and row-count files, named by its
+    # fit id, so files still memory-mapped by a query are never truncated or
+    # replaced (which Windows refuses); earlier fits' files are removed once
+    # nothing maps them.
+
+    @property
+    def _model_path(self) -> Path:
+        return self.directory / "model.npz"
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.directory / f"vectors-{self.fit_id}.f32"
+
+    @property
+    def _ids_path(self) -> Path:
+        return self.directory / f"ids-{self.fit_id}.i64"
+
+    @property
+    def _rows_path(self) -> Path:
+        return self.directory / f"rows-{self.fit_id}.txt"
+
+    def _commit_rows(self, n_rows: int):
+        part_path = self._rows_path.with_suffix(".part")
+        part_path.write_text(str(n_rows))
+        os.replace(part_path, self._rows_path)
+
+    def _map_rows(self):
+        # Only committed rows are read; bytes past them (left by a refresh that
+        # crashed midway) are overwritten by the next refresh
+        try:
+            n_rows = int(self._rows_path.read_text())
+        except (FileNotFoundError, ValueError):
+            n_rows = 0
+
+        self.n_rows = n_rows
+        if n_rows:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(n_rows, self.dim))
+            self._ids = np.memmap(self._ids_path, dtype=np.int64, mode="r", shape=(n_rows,))
+        else:
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+            self._ids = np.zeros(0, dtype=np.int64)
+
+    def _remove_stale_files(self):
+        keep = {self._model_path, self._vectors_path, self._ids_path, self._rows_path}
+        for path in self.directory.iterdir():
+            if path not in keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass  # still mapped by a query (Windows); retried on the next open
+
+    def _open(self):
+        """Read the stored projection and map the vectors; no fitting or catching up."""
+        with self._lock:
+            self._projection = None
+            self._topic_vectors.clear()
+            self.fit_id = None
+            if self._model_path.exists():
+                with np.load(self._model_path) as model:
+                    if "fit_id" in model.files:
+                        self._idf = model["idf"]
+                        self._projection = np.ascontiguousarray(model["components"].T)
+                        self.fit_docs = int(model["fit_docs"])
+                        self.fit_id = str(model["fit_id"])
+            if self.ready:
+                self.dim = self._projection.shape[1]
+                self._map_rows()
+                self._remove_stale_files()
+            else:
+                self.n_rows = 0
+                self._vectors = np.zeros((0, 0), dtype=np.float32)
+                self._ids = np.zeros(0, dtype=np.int64)
+            self._opened = True
+
+    def load(self):
+        """Open the index, fitting it first if it is missing or outgrown, then catch up with the bank."""
+        with self._lock:
+            self._open()
+            with database.connection() as conn:
+                n_questions = conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+            wanted = min(n_questions, VECTOR_FIT_SAMPLE)
+            if wanted >= VECTOR_MIN_DOCS and (not self.ready or self.fit_docs * 4 < wanted):
+                self._fit()
+            self.refresh()
+
+    def _fittable(self, conn) -> bool:
+        return conn.execute(
+            "SELECT COUNT(*) FROM (SELECT 1 FROM questions LIMIT ?)", (VECTOR_MIN_DOCS,)
+        ).fetchone()[0] >= VECTOR_MIN_DOCS
+
+    def _load_in_background(self):
+        # For a bank that grew past VECTOR_MIN_DOCS after warm-up
+        if self._loader is not None and self._loader.is_alive():
+            return
+
+        def run():
+            try:
+                self.load()
+            except Exception as e:
+                self._load_failed = True
+                print(f"Vector index load failed: {e}")
+
+        self._loader = threading.Thread(target=run, name="vector-index-load", daemon=True)
+        self._loader.start()
+
+    def rebuild(self):
+        """Refit the projection on the current bank and re-embed every question."""
+        with self._lock:
+            self._open()
+            self._fit()
+            self.refresh()
+
+    # --- fitting ---
+
+    def _tfidf(self, texts: List[str]):
+        from sklearn.preprocessing import normalize
+
+        matrix = self.hasher.transform(texts)
+        np.log1p(matrix.data, out=matrix.data)
+        matrix.data *= self._idf[matrix.indices]
+        return normalize(matrix, copy=False)
+
+    def _fit(self):
+        from sklearn.decomposition import TruncatedSVD
+
+        with database.connection() as conn:
+            docs = [_document(row[0], row[1]) for row in conn.execute(
+                "SELECT topics, question_text FROM questions ORDER BY random() LIMIT ?", (VECTOR_FIT_SAMPLE,)
+            )]
+            docs += [row[0] for row in conn.execute("SELECT DISTINCT topic FROM topic_index")]
+        if len(docs) < VECTOR_MIN_DOCS:
+            return
+
+        counts = self.hasher.transform(docs)
+        df = np.bincount(counts.indices, minlength=VECTOR_HASH_FEATURES)
+        self._idf = (np.log((1 + len(docs)) / (1 + df)) + 1.0).astype(np.float32)
+        svd = TruncatedSVD(n_components=min(VECTOR_DIMENSIONS, len(docs) - 1), random_state=0)
+        svd.fit(self._tfidf(docs))
+        components = svd.components_.astype(np.float32)
+
+        # The new fit starts with no vectors; the old fit's files go once unmapped
+        self.directory.mkdir(parents=True, exist_ok=True)
+        part_path = self.directory / "model.part.npz"
+        np.savez(
+            part_path, idf=self._idf, components=components, fit_docs=np.int64(len(docs)),
+            fit_id=np.array(uuid.uuid4().hex),
+        )
+        os.replace(part_path, self._model_path)
+        self._open()
+        print(f"Fitted the vector index on {len(docs)} documents ({self.dim} dimensions)")
+
+    # --- incremental updates ---
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """L2-normalized float32 vectors (one row per text) in the index's space."""
+        vectors = np.asarray(self._tfidf(texts) @ self._projection, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def refresh(self, max_rows: Optional[int] = None) -> int:
+        """Embed questions inserted since the last refresh (at most max_rows). Returns how many."""
+        with self._lock:
+            if not self._opened:
+                self._open()
+            if not self.ready:
+                return 0
+
+            applied = 0
+            last_id = self.last_question_id
+            with database.connection() as conn:
+                while max_rows is None or applied < max_rows:
+                    limit = REFRESH_BATCH_SIZE if max_rows is None else min(REFRESH_BATCH_SIZE, max_rows - applied)
+                    rows = conn.execute("""
+                        SELECT id, topics, question_text FROM questions
+                        WHERE id > ? ORDER BY id LIMIT ?
+                    """, (last_id, limit)).fetchall()
+                    if not rows:
+                        break
+                    vectors = self.embed([_document(row[1], row[2]) for row in rows])
+                    ids = np.array([row[0] for row in rows], dtype=np.int64)
+                    # Written past the committed rows, then committed; mapped rows are never touched
+                    position = self.n_rows + applied
+                    for path, values in ((self._vectors_path, vectors), (self._ids_path, ids)):
+                        with open(path, "r+b" if path.exists() else "wb") as f:
+                            f.seek(position * values[0].nbytes)
+                            values.tofile(f)
+                    applied += len(rows)
+                    self._commit_rows(position + len(rows))
+                    last_id = rows[-1][0]
+
+            if applied:
+                self._map_rows()
+            return applied
+
+    # --- queries ---
+
+    def _topic_matrix(self, topics: List[str]) -> np.ndarray:
+        # Topic names are few and repeat across requests: embed each once
+        with self._lock:
+            missing = [t for t in dict.fromkeys(topics) if t not in self._topic_vectors]
+            if missing:
+                self._topic_vectors.update(zip(missing, self.embed(missing)))
+                while len(self._topic_vectors) > TOPIC_VECTOR_CACHE_SIZE:
+                    self._topic_vectors.popitem(last=False)
+            return np.array([self._topic_vectors[t] for t in topics], dtype=np.float32).reshape(-1, self.dim)
+
+    @staticmethod
+    def _nearest_ids(vectors, ids, query, k, min_score, candidate_ids=None) -> List[Tuple[int, float]]:
+        if candidate_ids is None:
+            positions, scores = nearest(vectors, query, k, min_score)
+            return list(zip(ids[positions].tolist(), scores.tolist()))
+
+        # Candidates without a vector (not embedded yet) are left out
+        candidate_ids = np.asarray(candidate_ids, dtype=np.int64)
+        rows = np.searchsorted(ids, candidate_ids)
+        inside = rows < len(ids)
+        rows = rows[inside]
+        rows = rows[ids[rows] == candidate_ids[inside]]
+        positions, scores = nearest(vectors[rows], query, k, min_score)
+        return list(zip(ids[rows[positions]].tolist(), scores.tolist()))
+
+    def search(
+        self, text: str, k: int = SEMANTIC_TOPIC_K, candidate_ids: Optional[np.ndarray] = None,
+        min_score: float = SEMANTIC_TOPIC_MIN_SCORE,
+    ) -> List[Tuple[int, float]]:
+        """(question id, cosine similarity) of the k questions nearest to text, optionally among candidate_ids."""
+        with self._lock:
+            self.refresh(VECTOR_INLINE_REFRESH)
+            if not self.ready:
+                return []
+            query = self.embed([text])[0]
+            vectors, ids = self._vectors, self._ids
+        return self._nearest_ids(vectors, ids, query, k, min_score, candidate_ids)
+
+    def related(self, conn, courses: List[str], topics: List[str]) -> Optional[Dict[str, dict]]:
+        """
+        Per requested topic, the topic names of `courses` and the questions of
+        `courses` semantically close to it: {topic: {"topics", "ids"}}. {} when
+        the bank is too small to fit the index on; None while a fit is pending
+        or the index is busy loading (pools built then should not be cached).
+        """
+        placeholders = ", ".join("?" * len(courses))
+        course_topics = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT topic FROM topic_index WHERE course IN ({placeholders})", courses
+        )]
+
+        # Never make an exam request wait for a background load
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            if not self._opened:
+                self._open()
+            if not self.ready:
+                # A bank too small to fit on (or a failed fit) has no semantic matches
+                # to wait for; otherwise the fit is pending and started here if needed
+                if self._load_failed or not self._fittable(conn):
+                    return {}
+                self._load_in_background()
+                return None
+            self.refresh(VECTOR_INLINE_REFRESH)
+            topic_matrix = self._topic_matrix(course_topics)
+            queries = self._topic_matrix(topics)
+            vectors, ids = self._vectors, self._ids
+        finally:
+            self._lock.release()
+
+        # Straight from the cursor into an array; no per-row Python list
+        candidate_ids = np.fromiter((row[0] for row in conn.execute(
+            f"SELECT id FROM questions WHERE course IN ({placeholders}) ORDER BY id", courses
+        )), dtype=np.int64)
+
+        related = {}
+        for topic, query in zip(topics, queries):
+            positions, _ = nearest(topic_matrix, query, SEMANTIC_TOPIC_K, SEMANTIC_TOPIC_MIN_SCORE)
+            close_ids = self._nearest_ids(
+                vectors, ids, query, SEMANTIC_TOPIC_K, SEMANTIC_TOPIC_MIN_SCORE, candidate_ids
+            )
+            related[topic] = {
+                "topics": [course_topics[i] for i in positions],
+                "ids": [question_id for question_id, _ in close_ids],
+            }
+        return related
+
+    def stats(self) -> dict:
+        with self._lock:
+            if not self._opened:
+                self._open()
+            disk_bytes = sum(p.stat().st_size for p in self.directory.glob("*") if p.is_file()) \
+                if self.directory.exists() else 0
+            return {
+                "ready": self.ready,
+                "vectors": self.n_rows,
+                "dimensions": self.dim,
+                "fit_documents": self.fit_docs,
+                "last_question_id": self.last_question_id,
+                "disk_bytes": disk_bytes,
+            }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index() -> VectorIndex:
+    """Return the process-wide vector index (opened lazily, fitted by load())."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = VectorIndex()
+    return _index
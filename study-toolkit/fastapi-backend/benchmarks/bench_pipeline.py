@@ -0,0 +1,237 @@
+import argparse
+import contextlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import peak_rss_mb, print_table, summarize, write_report
+from .stubs import FakeLLMServer, FakePDFServer, FakeSearchServer, make_pdf
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="End-to-end benchmark of /api/process-syllabus-pipeline/ against local stand-ins."
+    )
+    parser.add_argument("--runs", type=int, default=3, help="pipelines to run")
+    parser.add_argument("--concurrency", type=int, default=1, help="pipelines in flight at once")
+    parser.add_argument("--batch", action="store_true",
+                        help="submit every syllabus in one request to the batch endpoint instead")
+    parser.add_argument("--warm", action="store_true",
+                        help="reuse one syllabus for every run, so runs after the first hit the caches")
+    parser.add_argument("--force-refresh", action="store_true",
+                        help="ask the pipeline to re-analyze and re-mine even known syllabi and sources")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per fake Gemini call")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="+/- fraction of the latency")
+    parser.add_argument("--questions-per-exam", type=int, default=15)
+    parser.add_argument("--search-latency", type=float, default=0.2, help="seconds per fake search")
+    parser.add_argument("--results-per-query", type=int, default=10)
+    parser.add_argument("--shared-results", type=int, default=0,
+                        help="results per query that link to the same PDFs for every course")
+    parser.add_argument("--pages", default="2,10,40",
+                        help="comma-separated page counts cycled over the served exam PDFs")
+    parser.add_argument("--bandwidth", type=float, default=0, help="PDF server bytes/s (0 = unlimited)")
+    parser.add_argument("--workdir", help="directory for the bench database and exam store (default: temp)")
+    parser.add_argument("--output", help="also write the JSON report here")
+    return parser.parse_args()
+
+
+def start_stubs(args):
+    pdfs = FakePDFServer(bandwidth=args.bandwidth).start()
+    search = FakeSearchServer(
+        pdfs.url,
+        results_per_query=args.results_per_query,
+        page_counts=[int(p) for p in args.pages.split(",")],
+        latency=args.search_latency,
+        shared_results=args.shared_results,
+    ).start()
+    llm = FakeLLMServer(
+        latency=args.llm_latency,
+        jitter=args.llm_jitter,
+        questions_per_exam=args.questions_per_exam,
+    ).start()
+    return llm, search, pdfs
+
+
+def configure_environment(workdir: str, llm, search):
+    # Must run before anything under app/ is imported: settings are read at import
+    os.environ["QUESTION_BANK_DB"] = os.path.join(workdir, "question_bank.sqlite")
+    os.environ["EXAM_STORE_DIR"] = os.path.join(workdir, "exams")
+    os.environ["GEMINI_BASE_URL"] = llm.url
+    os.environ["GEMINI_API_KEY"] = "benchmark"
+    os.environ["SERPAPI_URL"] = f"{search.url}/search"
+    os.environ["SERPAPI_API_KEY"] = "benchmark"
+    # The stand-in has no quota; only LLM_MAX_CONCURRENCY should limit calls
+    os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "100000")
+
+
+def start_backend():
+    """Serve app.main:app with uvicorn on an ephemeral port in a background thread."""
+    import uvicorn
+    from app.main import app
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Backend failed to start")
+        time.sleep(0.05)
+    host, port = sock.getsockname()
+    return server, thread, f"http://{host}:{port}"
+
+
+def run_pipeline(client, token: str, force_refresh: bool = False) -> dict:
+    """Submit one syllabus and follow its job events until it finishes."""
+    syllabus = make_pdf(2, seed=f"syllabus-{token}", title=f"Benchmark Course {token}")
+    started = time.time()
+    response = client.post(
+        "/api/process-syllabus-pipeline/",
+        files={"syllabus": (f"{token}.pdf", syllabus, "application/pdf")},
+        params={"force_refresh": force_refresh},
+    )
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+
+    # Wait for the job on its event stream; stage timings come from the job itself
+    with client.stream("GET", f"/api/jobs/{job_id}/events", timeout=None) as events:
+        for line in events.iter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            if event["status"] in ("completed", "failed"):
+                break
+    total = time.time() - started
+
+    job = client.get(f"/api/jobs/{job_id}").json()
+    return run_summary(job, total)
+
+
+def run_batch(client, tokens: list, force_refresh: bool = False) -> list:
+    """Submit every syllabus in one batch request and read its NDJSON results."""
+    files = [
+        ("syllabi", (f"{token}.pdf", make_pdf(2, seed=f"syllabus-{token}", title=f"Benchmark Course {token}"),
+                     "application/pdf"))
+        for token in tokens
+    ]
+    started = time.time()
+    runs = []
+    with client.stream(
+        "POST", "/api/process-syllabus-pipeline/batch",
+        files=files, params={"force_refresh": force_refresh}, timeout=None,
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            event = json.loads(line)
+            if event["event"] in ("job_completed", "job_failed"):
+                # Each job's total is the time until its line arrived
+                runs.append(run_summary(event, time.time() - started))
+    return runs
+
+
+def run_summary(job: dict, total: float) -> dict:
+    results = (job.get("result") or {}).get("results", {})
+    downloaded = results.get("downloaded_pdfs", [])
+    stored = results.get("stored_questions", {})
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "error": job.get("error"),
+        "total_seconds": round(total, 4),
+        "stages": job.get("stage_seconds", {}),
+        "peak_rss_mb": peak_rss_mb(),
+        "pdfs": len(downloaded),
+        "pdf_bytes": sum(f.get("size_bytes") or 0 for f in downloaded),
+        "questions": stored.get("total_questions", 0),
+        "inserted": stored.get("inserted"),
+        "skipped_sources": stored.get("skipped_sources", 0),
+    }
+
+
+def main():
+    args = parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix="learnio-bench-")
+    os.makedirs(workdir, exist_ok=True)
+
+    llm, search, pdfs = start_stubs(args)
+    configure_environment(workdir, llm, search)
+
+    import httpx
+    from app.services.pipeline import PIPELINE_STAGES
+
+    rss_baseline = peak_rss_mb()
+    server, thread, base_url = start_backend()
+    print(f"Backend on {base_url}, working directory {workdir}", file=sys.stderr)
+
+    session = uuid.uuid4().hex[:8]
+    tokens = [session if args.warm else f"{session}-{i}" for i in range(args.runs)]
+
+    wall_start = time.perf_counter()
+    # The pipeline logs with print(); keep stdout for the JSON report
+    with contextlib.redirect_stdout(sys.stderr), httpx.Client(base_url=base_url, timeout=60) as client:
+        if args.warm:
+            # Prime the caches, then measure every run against them
+            print("Priming caches...", file=sys.stderr)
+            run_pipeline(client, tokens[0])
+            wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            if args.batch:
+                runs = run_batch(client, tokens, args.force_refresh)
+            else:
+                runs = list(pool.map(lambda token: run_pipeline(client, token, args.force_refresh), tokens))
+    wall = time.perf_counter() - wall_start
+
+    server.should_exit = True
+    thread.join(timeout=30)
+    for stub in (llm, search, pdfs):
+        stub.stop()
+
+    stage_names = [name for name, _ in PIPELINE_STAGES]
+    stage_summary = {
+        name: summarize([run["stages"][name] for run in runs if name in run["stages"]])
+        for name in stage_names
+    }
+    total_questions = sum(run["questions"] for run in runs)
+    report = {
+        "config": vars(args),
+        "workdir": workdir,
+        "wall_seconds": round(wall, 3),
+        "throughput": {
+            "pipelines_per_minute": round(len(runs) / wall * 60, 2),
+            "questions_per_second": round(total_questions / wall, 2),
+            "pdf_mb_per_second": round(sum(run["pdf_bytes"] for run in runs) / wall / 1e6, 3),
+        },
+        "latency": {
+            "total": summarize([run["total_seconds"] for run in runs]),
+            "stages": stage_summary,
+        },
+        "stub_requests": {"llm": llm.requests, "search": search.requests, "pdf": pdfs.requests},
+        "llm_tokens": {"prompt": llm.prompt_tokens, "answer": llm.answer_tokens},
+        "peak_rss_mb": {"baseline": rss_baseline, "end": peak_rss_mb()},
+        "failed_runs": sum(run["status"] != "completed" for run in runs),
+        "runs": runs,
+    }
+
+    print_table(
+        "Per-stage latency (seconds)",
+        ["stage", "mean", "p50", "p95", "max"],
+        [[name, s.get("mean"), s.get("p50"), s.get("p95"), s.get("max")] for name, s in stage_summary.items()],
+    )
+    print_table(
+        "Runs",
+        ["job", "status", "total_s", "pdfs", "skipped", "questions", "peak_rss_mb"],
+        [[r["job_id"][:8], r["status"], r["total_seconds"], r["pdfs"], r["skipped_sources"], r["questions"],
+          r["peak_rss_mb"]] for r in runs],
+    )
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from .common import peak_rss_mb, print_table, summarize, write_report
+from .synthetic import course_name, synthetic_questions
+
+CACHE_DIR = Path(__file__).resolve().parent / ".cache"
+
+SCENARIOS = {
+    "course": {},
+    "topics": {"topics": ["Eigenvalues", "Sorting"]},
+    # Names no question is tagged with; only the vector index relates them to the above
+    "semantic_topics": {"topics": ["Eigen decomposition", "Sorting algorithms"]},
+    "difficulty_mix": {"difficulty_mix": {"hard": 0.3, "easy": 0.3}},
+    "balanced_topics": {"balance_topics": True},
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark /create-practice-exam/ on synthetic question banks."
+    )
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated bank sizes (up to 1000000)")
+    parser.add_argument("--requests", type=int, default=50, help="timed requests per scenario")
+    parser.add_argument("--num-questions", type=int, default=20)
+    parser.add_argument("--courses", type=int, default=20, help="courses in each synthetic bank")
+    parser.add_argument("--cache-dir", default=str(CACHE_DIR), help="where generated banks are kept")
+    parser.add_argument("--rebuild", action="store_true", help="regenerate banks even if cached")
+    parser.add_argument("--output", help="also write the JSON report here")
+    # Internal: measure one bank in a fresh process (settings are read at import)
+    parser.add_argument("--child-size", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def build_bank(size: int, n_courses: int) -> dict:
+    from app.services import near_duplicates
+    from app.services.ingest import ingest_questions
+    from app.services.keywords import get_keyword_model
+
+    start = time.perf_counter()
+    counts = ingest_questions(
+        synthetic_questions(size, n_courses), chunk_size=10000, near_duplicates="off"
+    )
+    ingest_seconds = time.perf_counter() - start
+
+    # One-time index builds the app would otherwise do at startup
+    start = time.perf_counter()
+    near_duplicates.backfill()
+    minhash_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    get_keyword_model().load()
+    keyword_seconds = time.perf_counter() - start
+
+    return {
+        "inserted": counts["inserted"],
+        "ingest_seconds": round(ingest_seconds, 3),
+        "ingest_rows_per_second": round(counts["inserted"] / ingest_seconds, 1),
+        "minhash_backfill_seconds": round(minhash_seconds, 3),
+        "keyword_model_seconds": round(keyword_seconds, 3),
+    }
+
+
+def measure(args) -> dict:
+    """Runs in the child process with QUESTION_BANK_DB pointing at the bank."""
+    from app.services import database
+
+    with database.connection() as conn:
+        existing = conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+
+    build = None
+    if existing < args.child_size:
+        with contextlib.redirect_stdout(sys.stderr):
+            build = build_bank(args.child_size - existing, args.courses)
+
+    # Fitted (first run on a bank) or caught up before timing, as warm-up would
+    from app.services.vector_index import get_vector_index
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        get_vector_index().load()
+    vector_index_seconds = round(time.perf_counter() - start, 3)
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    rss_before = peak_rss_mb()
+    results = {}
+    with contextlib.redirect_stdout(open(os.devnull, "w")), TestClient(app) as client:
+        for name, extra in SCENARIOS.items():
+            latencies = []
+            for i in range(args.requests + 3):
+                body = {
+                    "course": course_name(i % args.courses),
+                    "num_questions": args.num_questions,
+                    **extra,
+                }
+                start = time.perf_counter()
+                response = client.post("/create-practice-exam/", json=body)
+                elapsed = time.perf_counter() - start
+                response.raise_for_status()
+                if i >= 3:  # first requests warm the page cache
+                    latencies.append(elapsed)
+
+            summary = summarize(latencies)
+            summary["requests_per_second"] = round(len(latencies) / sum(latencies), 1)
+            results[name] = summary
+
+    return {
+        "size": args.child_size,
+        "build": build,
+        "vector_index_seconds": vector_index_seconds,
+        "vector_index": get_vector_index().stats(),
+        "scenarios": results,
+        "peak_rss_mb": {"before_requests": rss_before, "end": peak_rss_mb()},
+    }
+
+
+def main():
+    args = parse_args()
+    if args.child_size:
+        print(json.dumps(measure(args)))
+        return
+
+    cache_dir = Path(args.cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    backend_dir = Path(__file__).resolve().parents[1]
+
+    reports = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        bank = cache_dir / f"bank-{size}-{args.courses}.sqlite"
+        if args.rebuild:
+            for suffix in ("", "-wal", "-shm"):
+                Path(f"{bank}{suffix}").unlink(missing_ok=True)
+            shutil.rmtree(bank.with_suffix(".vectors"), ignore_errors=True)
+
+        print(f"Bank of {size} questions ({bank})...", file=sys.stderr)
+        env = {**os.environ, "QUESTION_BANK_DB": str(bank)}
+        child = subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.bench_practice_exam",
+                "--child-size", str(size),
+                "--requests", str(args.requests),
+                "--num-questions", str(args.num_questions),
+                "--courses", str(args.courses),
+            ],
+            cwd=backend_dir, env=env, stdout=subprocess.PIPE, check=True,
+        )
+        reports.append(json.loads(child.stdout))
+
+    rows = []
+    for report in reports:
+        for name, s in report["scenarios"].items():
+            rows.append([report["size"], name, s["p50"], s["p95"], s["requests_per_second"],
+                         report["peak_rss_mb"]["end"]])
+    print_table("Practice exam latency (seconds)", ["bank", "scenario", "p50", "p95", "req/s", "peak_rss_mb"], rows)
+    write_report({"config": vars(args), "banks": reports}, args.output)
+
+
+if __name__ == "__main__":
+    main()
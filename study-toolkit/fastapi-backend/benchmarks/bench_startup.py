@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from .common import print_table, summarize, write_report
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Modules whose import cost is measured in a fresh interpreter
+MODULES = ["app.main", "app.api.syllabus_processing"]
+
+# Heavy dependencies that should stay out of the startup path
+HEAVY_MODULES = ["google.genai", "sklearn", "scipy", "PyPDF2", "requests"]
+
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Measure backend cold start: module import time and time until uvicorn answers."
+    )
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--db", help="question bank to open (default: an empty one in a temp dir)")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list from -X importtime")
+    parser.add_argument("--ready-timeout", type=float, default=60)
+    parser.add_argument("--output", help="also write the JSON report here")
+    return parser.parse_args()
+
+
+def child_env(db_path: str) -> dict:
+    env = {**os.environ, "QUESTION_BANK_DB": db_path}
+    # Startup must not depend on API keys being present
+    env.pop("SERPAPI_API_KEY", None)
+    env.pop("GEMINI_API_KEY", None)
+    return env
+
+
+def measure_import(module: str, env: dict) -> dict:
+    snippet = IMPORT_SNIPPET.format(module=module, heavy=HEAVY_MODULES)
+    child = subprocess.run(
+        [sys.executable, "-c", snippet], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True,
+    )
+    return json.loads(child.stdout.splitlines()[-1])
+
+
+def slowest_imports(module: str, env: dict, top: int) -> list:
+    """Largest cumulative entries of `python -X importtime -c 'import module'`."""
+    child = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+    )
+    entries = []
+    for line in child.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        # Only top-level packages, so nested entries do not repeat their parents
+        if "." in name and not name.startswith("app."):
+            continue
+        entries.append((int(parts[1]) / 1e6, name))
+    return [{"module": name, "seconds": round(s, 4)} for s, name in sorted(entries, reverse=True)[:top]]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_ready(env: dict, timeout: float) -> float:
+    """Seconds from spawning `uvicorn app.main:app` until GET / answers 200."""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Backend exited with code {server.returncode}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f"Backend not ready after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    args = parse_args()
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="learnio-bench-"), "question_bank.sqlite")
+    env = child_env(db_path)
+
+    imports = {}
+    for module in MODULES:
+        print(f"Importing {module}...", file=sys.stderr)
+        runs = [measure_import(module, env) for _ in range(args.repeats)]
+        imports[module] = {
+            **summarize([run["seconds"] for run in runs]),
+            "heavy_modules_loaded": runs[-1]["loaded"],
+            "slowest": slowest_imports(module, env, args.top),
+        }
+
+    print("Starting uvicorn...", file=sys.stderr)
+    ready = summarize([measure_ready(env, args.ready_timeout) for _ in range(args.repeats)])
+
+    print_table(
+        "Cold start (seconds)",
+        ["measurement", "mean", "p50", "max", "heavy modules loaded"],
+        [[f"import {m}", s["mean"], s["p50"], s["max"], ", ".join(s["heavy_modules_loaded"]) or "-"]
+         for m, s in imports.items()]
+        + [["uvicorn ready", ready["mean"], ready["p50"], ready["max"], ""]],
+    )
+    write_report({"config": vars(args), "db": db_path, "imports": imports, "ready": ready}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import json
+import statistics
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    """High-water resident set size of this process in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values: list) -> dict:
+    """mean / p50 / p95 / max of a list of seconds, rounded to milliseconds."""
+    if not values:
+        return {"n": 0}
+    return {
+        "n": len(values),
+        "mean": round(statistics.fmean(values), 4),
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def print_table(title: str, columns: list, rows: list):
+    """Plain-text table on stderr (stdout is reserved for the JSON report)."""
+    widths = [
+        max(len(str(col)), *(len(_fmt(row[i])) for row in rows)) if rows else len(str(col))
+        for i, col in enumerate(columns)
+    ]
+    print(f"\n{title}", file=sys.stderr)
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)), file=sys.stderr)
+    print("  ".join("-" * w for w in widths), file=sys.stderr)
+    for row in rows:
+        print("  ".join(_fmt(v).ljust(w) for v, w in zip(row, widths)), file=sys.stderr)
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+
+def write_report(report: dict, output: str = None):
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+        print(f"\nReport written to {output}", file=sys.stderr)
+    print(text)
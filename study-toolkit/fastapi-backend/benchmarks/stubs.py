@@ -0,0 +1,302 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-ins for Gemini, SerpAPI and the sites hosting exam PDFs, so the
+# pipeline can be measured without network access or API keys.
+
+WORDS = (
+    "matrix vector eigenvalue determinant integral derivative limit series graph tree "
+    "sorting hashing protein enzyme cell membrane reaction equilibrium entropy energy "
+    "probability distribution variance regression theorem proof lemma algorithm network "
+    "function recursion complexity pointer memory process thread kernel signal circuit"
+).split()
+
+TOPICS = [
+    "Linear Systems", "Eigenvalues", "Determinants", "Vector Spaces", "Integration",
+    "Sequences", "Graph Theory", "Sorting", "Probability", "Regression",
+    "Thermodynamics", "Cell Biology",
+]
+
+
+def sentence(rng: random.Random, n_words: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "?"
+
+
+# --- Synthetic PDFs ---
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: int, seed: str = "", lines_per_page: int = 45, title: str = None) -> bytes:
+    """
+    A valid multi-page text PDF (Helvetica, no dependencies) readable by
+    PyPDF2. `title`, if given, replaces the first line of the first page.
+    """
+    rng = random.Random(seed)
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # filled in once the page tree exists
+    page_tree = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page_no in range(pages):
+        lines = [title if title and page_no == 0 else f"{seed} Exam page {page_no + 1}"]
+        lines += [f"Q{page_no * lines_per_page + i + 1}. {sentence(rng)}" for i in range(lines_per_page - 1)]
+        stream = "BT /F1 10 Tf 12 TL 50 780 Td " + " ".join(
+            f"({_pdf_escape(line)}) '" for line in lines
+        ) + " ET"
+        content = add(
+            f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode("latin-1")
+        )
+        page_ids.append(add(
+            f"<< /Type /Page /Parent {page_tree} 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> /Contents {content} 0 R >>".encode()
+        ))
+
+    objects[catalog - 1] = f"<< /Type /Catalog /Pages {page_tree} 0 R >>".encode()
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects[page_tree - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+# --- Servers ---
+
+class StubServer:
+    """A ThreadingHTTPServer on an ephemeral localhost port, run in a daemon thread."""
+
+    def __init__(self, handler_class):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _LLMHandler(_QuietHandler):
+    # Speaks just enough of the Gemini generateContent REST shape
+
+    def do_POST(self):
+        stub = self.server.stub
+        stub.count()
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = "".join(
+            part.get("text", "")
+            for content in body.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        time.sleep(stub.latency * (1 + stub.jitter * (2 * random.random() - 1)))
+
+        if "Classify these candidate questions" in prompt:
+            answer = stub.classification_answer(prompt)
+        elif "Analyze this past exam" in prompt:
+            answer = stub.exam_answer(prompt)
+        else:
+            answer = stub.syllabus_answer(prompt)
+
+        text = json.dumps(answer)
+        prompt_tokens, answer_tokens = len(prompt) // 4, len(text) // 4
+        stub.count_tokens(prompt_tokens, answer_tokens)
+        self.send_json({
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+            }],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": answer_tokens},
+        })
+
+
+class FakeLLMServer(StubServer):
+    """
+    Gemini stand-in. Syllabus prompts get a course named after the first
+    line of the syllabus text; exam prompts get `questions_per_exam`
+    questions; classification prompts get every candidate id back. Every
+    response is delayed by `latency` seconds (+/- jitter). Tokens are
+    counted at 4 characters each.
+    """
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.2, questions_per_exam: int = 15):
+        super().__init__(_LLMHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.questions_per_exam = questions_per_exam
+        self.prompt_tokens = 0
+        self.answer_tokens = 0
+
+    def count_tokens(self, prompt_tokens: int, answer_tokens: int):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.answer_tokens += answer_tokens
+
+    def syllabus_answer(self, prompt: str) -> dict:
+        match = re.search(r"Syllabus text:\s*(.+)", prompt)
+        title = match.group(1).strip() if match else "Synthetic Course"
+        return {"course_name": title[:60], "topics": TOPICS[:8]}
+
+    def classification_answer(self, prompt: str) -> dict:
+        rng = random.Random(hashlib.sha256(prompt.encode()).hexdigest())
+        return {"questions": [
+            {
+                "id": int(candidate_id),
+                "difficulty": rng.choice(["easy", "medium", "hard"]),
+                "topic": rng.choice(TOPICS[:8]),
+            }
+            for candidate_id in re.findall(r"^\[(\d+)\]", prompt, re.MULTILINE)
+        ], "not_questions": []}
+
+    def exam_answer(self, prompt: str) -> dict:
+        match = re.search(r'for the course "([^"]*)"', prompt)
+        course = match.group(1) if match else "Synthetic Course"
+        rng = random.Random(hashlib.sha256(prompt.encode()).hexdigest())
+        return {"questions": [
+            {
+                "question": sentence(rng, 16),
+                "course": course,
+                "difficulty": rng.choice(["easy", "medium", "hard"]),
+                "topic": rng.choice(TOPICS[:8]),
+            }
+            for _ in range(self.questions_per_exam)
+        ]}
+
+
+class _SearchHandler(_QuietHandler):
+    # SerpAPI shape: {"organic_results": [{"title", "link", "snippet"}, ...]}
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.count()
+        query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        time.sleep(stub.latency)
+
+        slug = hashlib.sha1(query.encode()).hexdigest()[:12]
+        results = []
+        for i in range(stub.results_per_query):
+            pages = stub.page_counts[i % len(stub.page_counts)]
+            # The last `shared_results` links are the same for every query
+            name = "shared" if i >= stub.results_per_query - stub.shared_results else slug
+            results.append({
+                "title": f"{query} #{i + 1}",
+                "link": f"{stub.pdf_base_url}/{name}-{i}-p{pages}.pdf",
+                "snippet": "Synthetic search result",
+            })
+        self.send_json({"organic_results": results})
+
+
+class FakeSearchServer(StubServer):
+    """SerpAPI stand-in whose results link to PDFs on a FakePDFServer."""
+
+    def __init__(self, pdf_base_url: str, results_per_query: int = 10, page_counts=(5,), latency: float = 0.2,
+                 shared_results: int = 0):
+        super().__init__(_SearchHandler)
+        self.pdf_base_url = pdf_base_url
+        self.results_per_query = results_per_query
+        self.shared_results = shared_results
+        self.page_counts = list(page_counts)
+        self.latency = latency
+
+
+class _PDFHandler(_QuietHandler):
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.count()
+        name = urlparse(self.path).path.rsplit("/", 1)[-1]
+        match = re.fullmatch(r"(.+)-p(\d+)\.pdf", name)
+        if not match:
+            self.send_json({"error": "not found"}, status=404)
+            return
+
+        body = stub.pdf(match.group(1), int(match.group(2)))
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        # Write in chunks so the client sees a streamed body at `bandwidth`
+        chunk = 64 * 1024
+        for start in range(0, len(body), chunk):
+            self.wfile.write(body[start:start + chunk])
+            if stub.bandwidth:
+                time.sleep(chunk / stub.bandwidth)
+
+
+class FakePDFServer(StubServer):
+    """
+    Serves synthetic exam PDFs at /<name>-p<pages>.pdf, generated once per
+    URL. `bandwidth` (bytes/s, 0 = unlimited) throttles the transfer.
+    """
+
+    def __init__(self, bandwidth: float = 0):
+        super().__init__(_PDFHandler)
+        self.bandwidth = bandwidth
+        self._pdfs = {}
+        self._pdf_lock = threading.Lock()
+
+    def pdf(self, name: str, pages: int) -> bytes:
+        with self._pdf_lock:
+            key = (name, pages)
+            if key not in self._pdfs:
+                self._pdfs[key] = make_pdf(pages, seed=name)
+            return self._pdfs[key]
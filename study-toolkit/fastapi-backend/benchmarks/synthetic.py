@@ -0,0 +1,27 @@
+import random
+from typing import Iterator
+
+from .stubs import TOPICS, sentence
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+
+def course_name(index: int) -> str:
+    return f"Synthetic Course {index:03d}"
+
+
+def synthetic_questions(n: int, n_courses: int = 20, seed: int = 0) -> Iterator[dict]:
+    """
+    `n` unique question dicts spread over `n_courses` courses, each tagged
+    with one or two topics and a difficulty, generated lazily.
+    """
+    rng = random.Random(seed)
+    for i in range(n):
+        topics = rng.sample(TOPICS, rng.choice((1, 2)))
+        yield {
+            "question": f"{sentence(rng, rng.randint(8, 24))} (#{i})",
+            "course": course_name(i % n_courses),
+            "topic": ", ".join(topics),
+            "difficulty": rng.choices(DIFFICULTIES, weights=(4, 4, 2))[0],
+            "source_pdf": f"synthetic://{i // 50}",
+        }